@@ -0,0 +1,103 @@
+# adapters/http_client.py
+"""
+Shared HTTP client for the online adapter.
+- One pooled keep-alive requests.Session per process (no TCP+TLS
+  handshake per call).
+- Separate connect / read timeouts.
+- Jittered exponential backoff on 429 / 5xx and on connections that
+  never got established (refused, unresolvable, connect timeout),
+  honouring Retry-After. A connection that drops after the request went
+  out is not retried: the POST is not idempotent, so a resend could bill
+  and answer the prompt twice.
+- async_post_json() runs requests on worker threads so several can be
+  in flight from asyncio code.
+"""
+
+import time
+import random
+import asyncio
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+import engine_health
+import state_store
+
+CFG = state_store.config()
+
+CONNECT_TIMEOUT = float(CFG.get("online_connect_timeout", 3.05))
+READ_TIMEOUT = float(CFG.get("online_read_timeout", 30))
+MAX_RETRIES = int(CFG.get("online_max_retries", 3))
+BACKOFF_BASE = float(CFG.get("online_backoff_base", 0.5))
+BACKOFF_CAP = float(CFG.get("online_backoff_cap", 8.0))
+POOL_SIZE = int(CFG.get("online_pool_size", 8))
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                s = requests.Session()
+                adapter = HTTPAdapter(pool_connections=2, pool_maxsize=POOL_SIZE,
+                                      max_retries=0)
+                s.mount("https://", adapter)
+                s.mount("http://", adapter)
+                _session = s
+    return _session
+
+
+def _backoff(attempt, retry_after=None):
+    if retry_after:
+        try:
+            return min(BACKOFF_CAP, float(retry_after))
+        except ValueError:
+            pass
+    # "full jitter": spreads retries from many callers apart
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+def _nothing_sent(e):
+    if isinstance(e, requests.exceptions.ConnectTimeout):
+        return True
+    # refused / DNS failure: requests wraps urllib3's MaxRetryError
+    reason = getattr(e.args[0], "reason", None) if e.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def post_json(url, payload, headers=None, stream=False, timeout=None):
+    """POST with retries. Returns the final Response (caller checks status);
+    raises the last connection error if every attempt failed to connect."""
+    timeout = timeout or (CONNECT_TIMEOUT, READ_TIMEOUT)
+    session = get_session()
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            r = session.post(url, json=payload, headers=headers,
+                             stream=stream, timeout=timeout)
+        except requests.exceptions.ConnectionError as e:
+            # a read timeout already cost the full budget → not retried
+            if not _nothing_sent(e):
+                raise
+            if attempt == MAX_RETRIES:
+                engine_health.mark_unreachable()
+                raise
+            time.sleep(_backoff(attempt))
+            continue
+        if r.status_code in RETRY_STATUS and attempt < MAX_RETRIES:
+            delay = _backoff(attempt, r.headers.get("Retry-After"))
+            r.close()
+            print(f"[http] {r.status_code} from {url}, retry {attempt + 1} in {delay:.2f}s")
+            time.sleep(delay)
+            continue
+        return r
+
+
+async def async_post_json(url, payload, headers=None, timeout=None):
+    """asyncio variant; bounded by the session's connection pool."""
+    return await asyncio.to_thread(post_json, url, payload, headers, False, timeout)
@@ -0,0 +1,338 @@
+# adapters/llama_server.py
+"""
+Resident llama.cpp inference for the local adapter.
+- One long-lived `llama-server` per GGUF model, started on first use and
+  left running (own session) so later processes reuse the loaded model.
+- Talks to it over local HTTP (/health, /completion) using the stdlib only.
+- Stable prompt prefixes (persona + rules + instructions) are prefilled
+  once, saved as slot KV files keyed by prefix hash and restored into
+  every slot (also after a restart); only the variable suffix is
+  prefilled per request, whichever slot serves it.
+- "llama_server_url" in config points at an already-running server
+  instead (e.g. bench/fake_llama_server.py); nothing is spawned then.
+"""
+
+import os
+import json
+import time
+import fcntl
+import socket
+import hashlib
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+from pathlib import Path
+from contextlib import contextmanager
+from collections import deque
+
+import state_store
+
+# Load config
+CFG = state_store.config()
+
+SERVER_BIN = Path(os.path.expanduser(
+    CFG.get("llama_server_bin", "~/ArcheTYPE/llama.cpp/build/bin/llama-server")))
+EXTERNAL_URL = CFG.get("llama_server_url")
+BASE_PORT = int(CFG.get("llama_server_port", 8088))
+CTX_SIZE = int(CFG.get("llama_ctx", 4096))
+THREADS = int(CFG.get("llama_threads", 6))
+N_PREDICT = int(CFG.get("llama_n_predict", 200))
+START_TIMEOUT = float(CFG.get("llama_server_start_timeout", 120))
+# decoding slots per server; concurrent requests are batched together
+PARALLEL = max(1, int(CFG.get("llama_parallel", 1)))
+
+RUN_DIR = Path(os.path.expanduser("~/ArcheTYPE/run"))
+REGISTRY = RUN_DIR / "llama_servers.json"   # model path -> {"pid", "port"}
+# Slot KV dumps of stable prompt prefixes, named by prefix hash
+PROMPT_CACHE_DIR = RUN_DIR / "prompt_cache"
+
+
+# -------------------------------------------------------
+# HTTP
+# -------------------------------------------------------
+def _request(url, payload=None, timeout=5):
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    req = urllib.request.Request(
+        url, data=data, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=timeout) as r:
+        return json.loads(r.read().decode("utf-8") or "{}")
+
+
+def healthy(url, timeout=1):
+    try:
+        return _request(url + "/health", timeout=timeout).get("status") == "ok"
+    except Exception:
+        return False
+
+
+# -------------------------------------------------------
+# SERVER LIFECYCLE
+# -------------------------------------------------------
+@contextmanager
+def _registry_lock():
+    RUN_DIR.mkdir(parents=True, exist_ok=True)
+    with open(RUN_DIR / "llama_servers.lock", "w") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _read_registry():
+    try:
+        return json.load(open(REGISTRY, "r", encoding="utf-8"))
+    except:
+        return {}
+
+
+def _write_registry(reg):
+    RUN_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = REGISTRY.with_name(REGISTRY.name + ".tmp")
+    json.dump(reg, open(tmp, "w", encoding="utf-8"), indent=2)
+    os.replace(tmp, REGISTRY)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except OSError:
+        return False
+
+
+def _free_port(reg):
+    used = {v["port"] for v in reg.values()}
+    port = BASE_PORT
+    while True:
+        if port not in used:
+            with socket.socket() as s:
+                if s.connect_ex(("127.0.0.1", port)) != 0:
+                    return port
+        port += 1
+
+
+def _spawn(model_path, port):
+    PROMPT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    log = open(RUN_DIR / f"llama-server-{port}.log", "ab")
+    cmd = [
+        str(SERVER_BIN),
+        "--model", model_path,
+        "--host", "127.0.0.1",
+        "--port", str(port),
+        "--threads", str(THREADS),
+        # the context is split across slots → each keeps CTX_SIZE
+        "--ctx-size", str(CTX_SIZE * PARALLEL),
+        "--slot-save-path", str(PROMPT_CACHE_DIR),
+    ]
+    if PARALLEL > 1:
+        cmd += ["--parallel", str(PARALLEL), "--cont-batching"]
+    # own session: survives the short-lived `arche` process that started it
+    proc = subprocess.Popen(cmd, stdout=log, stderr=log,
+                            stdin=subprocess.DEVNULL, start_new_session=True)
+    return proc.pid
+
+
+def ensure_server(model_path):
+    """Base URL of a healthy server for model_path, starting one if needed."""
+    if EXTERNAL_URL:
+        url = EXTERNAL_URL.rstrip("/")
+        if not healthy(url):
+            raise RuntimeError(f"llama server at {url} not healthy")
+        return url
+
+    # registry lock: two processes must not spawn the same model twice
+    with _registry_lock():
+        reg = _read_registry()
+        entry = reg.get(model_path)
+        if not (entry and _alive(entry["pid"])):
+            if not SERVER_BIN.exists():
+                raise RuntimeError(f"llama-server missing: {SERVER_BIN}")
+            port = _free_port(reg)
+            entry = {"pid": _spawn(model_path, port), "port": port}
+            reg[model_path] = entry
+            _write_registry(reg)
+            print(f"[llama_server] started pid={entry['pid']} port={port}")
+    url = f"http://127.0.0.1:{entry['port']}"
+
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        if healthy(url):
+            return url
+        if not _alive(entry["pid"]):
+            raise RuntimeError("llama-server exited during startup")
+        time.sleep(0.25)
+    raise RuntimeError("llama-server did not become healthy in time")
+
+
+def stop_all():
+    with _registry_lock():
+        for model, entry in _read_registry().items():
+            if _alive(entry["pid"]):
+                os.kill(entry["pid"], 15)
+                print(f"[llama_server] stopped pid={entry['pid']} ({model})")
+        _write_registry({})
+
+
+# -------------------------------------------------------
+# GENERATION
+# -------------------------------------------------------
+_known = {}   # model path -> URL already verified healthy in this process
+_primed = set()   # (url, prefix hash) whose KV is already in every slot
+_prime_lock = threading.Lock()
+
+_prefill = {"requests": 0, "tokens_saved": 0, "tokens_evaluated": 0}
+_prefill_recent = deque(maxlen=64)
+
+
+def _server_url(model_path):
+    url = _known.get(model_path)
+    if url is None:
+        url = _known[model_path] = ensure_server(model_path)
+    return url
+
+
+def _forget(model_path):
+    url = _known.pop(model_path, None)
+    for key in [k for k in _primed if k[0] == url]:
+        _primed.discard(key)
+
+
+def prefix_hash(model_path, prefix):
+    # KV dumps are only valid for the model that produced them
+    key = model_path + "\0" + prefix
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def _slot_count(url):
+    try:
+        n = int(_request(url + "/props", timeout=5).get("total_slots") or 0)
+    except Exception:
+        n = 0
+    return n or PARALLEL
+
+
+def _prime_prefix(url, model_path, prefix):
+    """Put the KV state of `prefix` into every slot, so whichever slot the
+    server assigns a request already holds it: prefill slot 0 once and save
+    it to the prompt cache (unless a file exists), then restore the file
+    into the remaining slots."""
+    h = prefix_hash(model_path, prefix)
+    if (url, h) in _primed:
+        return
+    with _prime_lock:
+        if (url, h) in _primed:
+            return
+        fname = f"{h}.bin"
+        try:
+            first = 0
+            if not (PROMPT_CACHE_DIR / fname).exists():
+                _request(url + "/completion", {
+                    "prompt": prefix, "n_predict": 0,
+                    "cache_prompt": True, "id_slot": 0,
+                }, timeout=120)
+                _request(f"{url}/slots/0?action=save", {"filename": fname}, timeout=30)
+                first = 1
+            failed = []
+            for slot in range(first, _slot_count(url)):
+                try:
+                    _request(f"{url}/slots/{slot}?action=restore", {"filename": fname},
+                             timeout=30)
+                except Exception:
+                    failed.append(slot)   # busy with another request; primed by use
+            if failed:
+                print(f"[llama_server] prefix not restored into slots {failed}")
+        except Exception as e:
+            # slot API unavailable (external/older server): cache_prompt still helps
+            print(f"[llama_server] prefix cache unavailable: {e}")
+        _primed.add((url, h))
+
+
+def _record_prefill(j):
+    # tokens_cached is the slot's n_past after generation (prompt + output),
+    # not the reused prefix: saved = cache_n, else prompt tokens - prefilled
+    timings = j.get("timings") or {}
+    prompt_tokens = j.get("tokens_evaluated") or 0
+    evaluated = timings.get("prompt_n", prompt_tokens) or 0
+    saved = timings.get("cache_n")
+    if saved is None:
+        saved = max(0, prompt_tokens - evaluated)
+    _prefill["requests"] += 1
+    _prefill["tokens_saved"] += saved
+    _prefill["tokens_evaluated"] += evaluated
+    _prefill_recent.append({"ts": time.time(), "saved": saved, "evaluated": evaluated})
+
+
+def prefill_stats():
+    """Prompt tokens served from KV cache vs actually prefilled."""
+    st = dict(_prefill)
+    st["recent"] = list(_prefill_recent)
+    return st
+
+
+def _open(model_path, payload, prefix, timeout, stream=False):
+    for attempt in (0, 1):
+        try:
+            url = _server_url(model_path)
+            if prefix and payload["prompt"].startswith(prefix):
+                _prime_prefix(url, model_path, prefix)
+            if not stream:
+                return _request(url + "/completion", payload, timeout=timeout)
+            req = urllib.request.Request(
+                url + "/completion", data=json.dumps(payload).encode("utf-8"),
+                headers={"Content-Type": "application/json"})
+            return urllib.request.urlopen(req, timeout=timeout)
+        except urllib.error.URLError:
+            # server went away since we last saw it → (re)start once and retry
+            _forget(model_path)
+            if attempt:
+                raise
+
+
+def _payload(prompt, temperature, n_predict, stream=False):
+    return {
+        "prompt": prompt,
+        "n_predict": n_predict,
+        "temperature": temperature,
+        "cache_prompt": True,
+        "stream": stream,
+    }
+
+
+def complete(model_path, prompt, temperature=0.2, n_predict=N_PREDICT, timeout=300,
+             prefix=None):
+    """prefix: stable leading part of `prompt` whose KV state is cached."""
+    j = _open(model_path, _payload(prompt, temperature, n_predict), prefix, timeout)
+    _record_prefill(j)
+    return j.get("content", "").strip()
+
+
+def stream_complete(model_path, prompt, temperature=0.2, n_predict=N_PREDICT,
+                    timeout=300, prefix=None):
+    """Yield text pieces from the server's SSE stream as they are generated.
+    Closing the generator closes the connection, which stops generation."""
+    resp = _open(model_path, _payload(prompt, temperature, n_predict, stream=True),
+                 prefix, timeout, stream=True)
+    with resp:
+        for raw in resp:
+            line = raw.decode("utf-8").strip()
+            if not line.startswith("data:"):
+                continue
+            try:
+                j = json.loads(line[5:])
+            except ValueError:
+                continue
+            if j.get("content"):
+                yield j["content"]
+            if j.get("stop"):
+                _record_prefill(j)
+                break
+
+
+if __name__ == "__main__":
+    import sys
+    if sys.argv[1:] == ["stop"]:
+        stop_all()
+    else:
+        print(json.dumps(_read_registry(), indent=2))
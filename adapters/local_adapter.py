@@ -1,6 +1,6 @@
 # adapters/local_adapter.py
 """
-Local adapter for llama-run (your version).
+Local adapter for llama.cpp (resident llama-server, llama-run fallback).
 - Combined raw prompt (persona + rules + examples + user).
 - No system-prompt arguments (unsupported).
 - No chat template mode.
@@ -10,20 +10,37 @@ Local adapter for llama-run (your version).
 import os
 import json
 import shlex
+import codecs
+import signal
+import tempfile
+import threading
 import subprocess
 from pathlib import Path
 
+import state_store
+from adapters import llama_server
+
 # Load config
-CFG = json.load(open("/home/piyush/ArcheTYPE/config.json"))
+CFG = state_store.config()
+
+# "server": resident llama-server (adapters/llama_server.py)
+# "run":    one-shot llama-run per call
+BACKEND = CFG.get("local_backend", "server")
 
 # Use llama-run for raw generation
 BINARY = Path(os.path.expanduser("~/ArcheTYPE/llama.cpp/build/bin/llama-run"))
 
+# every llama-run loads the whole model → never more than one at a time
+_ONESHOT = threading.Semaphore(1)
+ONESHOT_TIMEOUT = 300
+
 
 # Distillation / retrieval files
 DISTILL_DIR = os.path.expanduser(CFG.get("distill_dir"))
+# legacy JSON text map; index_texts.bin is read by retrieval_engine
 INDEX_TEXTS_PATH = os.path.join(DISTILL_DIR, "index_texts.json")
-FAISS_INDEX_PATH = os.path.expanduser(CFG.get("faiss_index"))
+# "hybrid" | "vector" | "lexical" (per call: search_topk(mode=...) / retrieval=)
+RETRIEVAL_MODE = CFG.get("retrieval_mode", "hybrid")
 
 
 def _load_index_texts():
@@ -35,45 +52,65 @@ def _load_index_texts():
         return []
 
 
-def _faiss_search(query, k=3):
+def search_topk(query, k=3, mode=None):
+    """Few-shot examples for `query`. mode: "hybrid" | "vector" | "lexical"
+    (default: retrieval_mode in config). Degrades to lexical when the
+    vector side is unavailable, then to the newest records."""
+    mode = mode or RETRIEVAL_MODE
     try:
-        import faiss
-        from sentence_transformers import SentenceTransformer
-        texts = _load_index_texts()
-        if not texts:
-            return []
-        model = SentenceTransformer("all-MiniLM-L6-v2")
-        q = model.encode([query], convert_to_numpy=True)
-        idx = faiss.read_index(FAISS_INDEX_PATH)
-        D, I = idx.search(q, k)
-        return [texts[i] for i in I[0] if 0 <= i < len(texts)]
-    except:
-        return []
-
-
-def search_topk(query, k=3):
-    if os.path.exists(FAISS_INDEX_PATH):
-        r = _faiss_search(query, k)
-        if r:
-            return r
-    texts = _load_index_texts()
+        # Embedder, FAISS and BM25 indexes stay resident between calls.
+        from adapters import retrieval_engine
+    except Exception:
+        retrieval_engine = None
+    if retrieval_engine is not None:
+        for m in dict.fromkeys((mode, "lexical")):
+            try:
+                r = retrieval_engine.search(query, k, m)
+            except Exception:
+                r = []
+            if r:
+                return r
+        try:
+            recent = retrieval_engine.recent(k)
+        except Exception:
+            recent = []
+        if recent:
+            return recent
+    # pre-binary installs: joined "prompt -> response" strings
+    texts = [t for t in _load_index_texts() if t is not None]
     return texts[-k:][::-1] if texts else []
 
 
-def _build_combined_prompt(persona, examples, user_text):
-    """Build ONE combined prompt. Clean. Raw. No SYSTEM, no chat template."""
+STRICT = (
+    "Respond EXACTLY with:\n"
+    "DIAGNOSIS: <one-sentence diagnosis>\n"
+    "ACTION: <one timeboxed action>\n"
+    "METRIC: <one measurable metric>\n"
+    "(Total <= 60 words)\n\n"
+)
+
 
-    strict = (
-        "Respond EXACTLY with:\n"
-        "DIAGNOSIS: <one-sentence diagnosis>\n"
-        "ACTION: <one timeboxed action>\n"
-        "METRIC: <one measurable metric>\n"
-        "(Total <= 60 words)\n\n"
+def _build_prompt_prefix(persona, instructions=""):
+    """Stable head of every prompt (persona + rules + caller instructions).
+    Identical across calls, so its KV state can be cached."""
+    return (
+        persona.strip()
+        + "\n\n"
+        + STRICT
+        + (instructions.strip() + "\n\n" if instructions.strip() else "")
     )
 
+
+def _build_combined_prompt(persona, examples, user_text, instructions=""):
+    """Build ONE combined prompt. Clean. Raw. No SYSTEM, no chat template.
+    Stable prefix first, then the per-call part (examples + user)."""
+
     fs = []
     for ex in examples:
-        if " -> " in ex:
+        if isinstance(ex, (tuple, list)):
+            fs.append("EXAMPLE PROMPT: " + ex[0].strip())
+            fs.append("TEACHER: " + ex[1].strip())
+        elif " -> " in ex:
             p, r = ex.split(" -> ", 1)
             fs.append("EXAMPLE PROMPT: " + p.strip())
             fs.append("TEACHER: " + r.strip())
@@ -83,9 +120,7 @@ def _build_combined_prompt(persona, examples, user_text):
     few_shot = "\n".join(fs) if fs else ""
 
     combined = (
-        persona.strip()
-        + "\n\n"
-        + strict
+        _build_prompt_prefix(persona, instructions)
         + (few_shot + "\n\n" if few_shot else "")
         + "USER:\n"
         + user_text.strip()
@@ -94,8 +129,9 @@ def _build_combined_prompt(persona, examples, user_text):
     return combined.strip()
 
 
-def call_local_model(user_text, model_key="local_fast"):
-    model_path = CFG["models"].get(model_key)
+def _prepare(user_text, model_key, instructions, retrieval=None):
+    """(model_path, prompt, prefix), or an error string."""
+    model_path = state_store.config()["models"].get(model_key)
     if not model_path:
         return "[local adapter] Model path missing."
 
@@ -110,13 +146,82 @@ def call_local_model(user_text, model_key="local_fast"):
 
 
     # Retrieval
-    examples = search_topk(user_text, k=3)
+    examples = search_topk(user_text, k=3, mode=retrieval)
 
     # Build final combined prompt
-    prompt = _build_combined_prompt(persona, examples, user_text)
+    prompt = _build_combined_prompt(persona, examples, user_text, instructions)
+    prefix = _build_prompt_prefix(persona, instructions)
+    return model_path, prompt, prefix
+
+
+def call_local_model(user_text, model_key="local_fast", instructions="", retrieval=None):
+    """instructions: caller's fixed instruction block. It joins the cached
+    prompt prefix instead of being re-prefilled inside user_text.
+    retrieval: few-shot retrieval mode for this call (see search_topk)."""
+    prep = _prepare(user_text, model_key, instructions, retrieval)
+    if isinstance(prep, str):
+        return prep
+    model_path, prompt, prefix = prep
+
+    # Resident llama-server first; one-shot llama-run as fallback
+    if BACKEND == "server":
+        try:
+            return llama_server.complete(model_path, prompt, prefix=prefix)
+        except Exception as e:
+            print(f"[local adapter] server unavailable ({e}) → llama-run")
+
+    return _run_oneshot(model_path, prompt)
+
+
+def stream_local_model(user_text, model_key="local_fast", instructions="", retrieval=None):
+    """Generator variant of call_local_model: yields text as it is produced."""
+    prep = _prepare(user_text, model_key, instructions, retrieval)
+    if isinstance(prep, str):
+        yield prep
+        return
+    model_path, prompt, prefix = prep
+
+    if BACKEND == "server":
+        started = False
+        try:
+            for piece in llama_server.stream_complete(model_path, prompt, prefix=prefix):
+                started = True
+                yield piece
+            return
+        except Exception as e:
+            if started:
+                yield f"\n[local adapter error] {e}"
+                return
+            print(f"[local adapter] server unavailable ({e}) → llama-run")
 
-    # Run llama-run
-    cmd = (
+    yield from _stream_oneshot(model_path, prompt)
+
+
+def call_local_model_many(texts, model_key="local_fast", instructions="", concurrency=None):
+    """call_local_model over many texts; replies in input order. With the
+    server backend up to llama_parallel (at most `concurrency`) run at once
+    and the server decodes them as one batch; llama-run calls are
+    serialized anyway."""
+    texts = list(texts)
+    limit = llama_server.PARALLEL if BACKEND == "server" else 1
+    concurrency = limit if concurrency is None else min(concurrency, limit)
+
+    def one(text):
+        try:
+            return call_local_model(text, model_key, instructions)
+        except Exception as e:
+            return f"[local adapter error] {e}"
+
+    if concurrency <= 1 or len(texts) <= 1:
+        return [one(t) for t in texts]
+
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(texts))) as pool:
+        return list(pool.map(one, texts))
+
+
+def _oneshot_cmd(model_path, prompt):
+    return (
         f"{shlex.quote(str(BINARY))} "
         f"--threads 6 "
         f"--temp 0.2 "
@@ -124,10 +229,71 @@ def call_local_model(user_text, model_key="local_fast"):
         f"{shlex.quote(prompt)}"
     )
 
+
+def _run_oneshot(model_path, prompt):
+    # Run llama-run (reloads the model every call)
+    cmd = _oneshot_cmd(model_path, prompt)
+
     try:
-        proc = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=300)
+        with _ONESHOT:
+            proc = subprocess.run(cmd, shell=True, capture_output=True, text=True,
+                                  timeout=ONESHOT_TIMEOUT)
         if proc.returncode != 0:
             return f"[local adapter error] {proc.stderr}"
         return proc.stdout.strip()
     except Exception as e:
         return f"[local adapter error] {e}"
+
+
+def _reap_oneshot(proc, timeout=ONESHOT_TIMEOUT):
+    # owns the _ONESHOT slot of a streaming llama-run: released when the
+    # process exits, whatever happens to the generator reading it
+    try:
+        proc.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        _kill_oneshot(proc)
+    finally:
+        _ONESHOT.release()
+
+
+def _kill_oneshot(proc):
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        pass
+    proc.wait()
+
+
+def _stream_oneshot(model_path, prompt):
+    # llama-run writes tokens to stdout as it samples them; stderr (model
+    # load logs) goes to a temp file so it can never fill a pipe and stall
+    _ONESHOT.acquire()
+    err = tempfile.TemporaryFile()
+    try:
+        proc = subprocess.Popen(_oneshot_cmd(model_path, prompt), shell=True,
+                                stdout=subprocess.PIPE, stderr=err,
+                                start_new_session=True)
+    except Exception as e:
+        _ONESHOT.release()
+        err.close()
+        yield f"[local adapter error] {e}"
+        return
+    threading.Thread(target=_reap_oneshot, args=(proc,), daemon=True).start()
+
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    try:
+        while True:
+            chunk = proc.stdout.read1(4096)
+            if not chunk:
+                break
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+        if proc.wait() != 0:   # the reaper kills it after ONESHOT_TIMEOUT
+            err.seek(0)
+            yield f"\n[local adapter error] {err.read().decode(errors='replace')}"
+    finally:
+        # consumer stopped early → don't leave llama-run running
+        if proc.poll() is None:
+            _kill_oneshot(proc)
+        err.close()
@@ -1,13 +1,35 @@
 # adapters/online_adapter.py
-import os, json, requests
+import os, json, asyncio, requests
 
-CFG = json.load(open('/home/piyush/ArcheTYPE/config.json'))
+import state_store
+from adapters import http_client
+
+CFG = state_store.config()
+
+# overridable so a local stub server can stand in for Groq
+URL = CFG.get("online_api_url", "https://api.groq.com/openai/v1/chat/completions")
+API_ENV = CFG['online_api_env_var']
+
+# ✔ USE A STILL-SUPPORTED MODEL
+# speedy + stable
+MODEL_NAME = "llama-3.1-8b-instant"
 
-def call_online_model(user_text):
-    api_key = os.getenv(CFG['online_api_env_var'])
-    if not api_key:
-        return "[online adapter] GROQ_API_KEY missing"
 
+_headers_cache = {}   # api key -> headers
+
+
+def _headers(api_key):
+    h = _headers_cache.get(api_key)
+    if h is None:
+        _headers_cache.clear()
+        h = _headers_cache[api_key] = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+    return h
+
+
+def _build_request(api_key, user_text, stream=False):
     # Load persona
     persona = (
     "ArcheTYPE — Shadow ascetic AI. Precision. Discipline. "
@@ -30,26 +52,18 @@ def call_online_model(user_text):
         {"role": "user", "content": user_text}
     ]
 
-    # ✔ USE A STILL-SUPPORTED MODEL
-    # speedy + stable
-    model_name = "llama-3.1-8b-instant"
-
-    url = "https://api.groq.com/openai/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-
     payload = {
-        "model": model_name,
+        "model": MODEL_NAME,
         "messages": messages,
         "max_tokens": 200,
         "temperature": 0.2,
-        "stream": False
+        "stream": stream
     }
+    return _headers(api_key), payload
+
 
+def _parse_reply(r):
     try:
-        r = requests.post(url, headers=headers, json=payload, timeout=30)
         r.raise_for_status()
         j = r.json()
         return j["choices"][0]["message"]["content"]
@@ -58,3 +72,72 @@ def call_online_model(user_text):
         return f"[online adapter error] {e}\nResponse: {r.text}"
     except Exception as e:
         return f"[online adapter error] {e}"
+
+
+def call_online_model(user_text):
+    api_key = os.getenv(API_ENV)
+    if not api_key:
+        return "[online adapter] GROQ_API_KEY missing"
+
+    headers, payload = _build_request(api_key, user_text)
+
+    try:
+        r = http_client.post_json(URL, payload, headers=headers)
+    except Exception as e:
+        return f"[online adapter error] {e}"
+    return _parse_reply(r)
+
+
+async def call_online_model_async(user_text):
+    """asyncio variant of call_online_model; many may be awaited at once."""
+    api_key = os.getenv(API_ENV)
+    if not api_key:
+        return "[online adapter] GROQ_API_KEY missing"
+
+    headers, payload = _build_request(api_key, user_text)
+
+    try:
+        r = await http_client.async_post_json(URL, payload, headers=headers)
+    except Exception as e:
+        return f"[online adapter error] {e}"
+    return _parse_reply(r)
+
+
+def call_online_model_many(texts, concurrency=4):
+    """call_online_model over many texts, at most `concurrency` in flight;
+    replies in input order."""
+    async def run():
+        sem = asyncio.Semaphore(max(1, concurrency))
+
+        async def one(text):
+            async with sem:
+                return await call_online_model_async(text)
+
+        return await asyncio.gather(*(one(t) for t in texts))
+
+    return list(asyncio.run(run()))
+
+
+def stream_online_model(user_text):
+    """Yield content deltas from the SSE stream as they arrive.
+    Raises on connection/HTTP errors so the router can fall back."""
+    api_key = os.getenv(API_ENV)
+    if not api_key:
+        raise RuntimeError("GROQ_API_KEY missing")
+
+    headers, payload = _build_request(api_key, user_text, stream=True)
+
+    with http_client.post_json(URL, payload, headers=headers, stream=True) as r:
+        r.raise_for_status()
+        for line in r.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            try:
+                delta = json.loads(data)["choices"][0]["delta"].get("content")
+            except (ValueError, KeyError, IndexError):
+                continue
+            if delta:
+                yield delta
@@ -0,0 +1,135 @@
+# adapters/query_cache.py
+"""
+Bounded LRU from normalized query text → (embedding, top-k ids).
+- Embeddings stay valid until the embedder changes.
+- Top-k ids are tagged with the index generation and ignored once the
+  nightly rebuild swaps in a new one.
+- Evicted entries optionally spill to a shelve file on disk, shared by
+  every process that retrieves (daemon, CLI fallback, lock_daemon,
+  agent_core). dbm files are not safe with several processes holding
+  them open, so each access opens the shelve under an fcntl lock and
+  closes it again.
+- Hit/miss counters via stats().
+"""
+
+import re
+import fcntl
+import shelve
+import threading
+from collections import OrderedDict
+
+_ISO_TS = re.compile(r"\d{4}-\d{2}-\d{2}[t ]\d{2}:\d{2}:\d{2}(\.\d+)?")
+_NUM = re.compile(r"\d+(\.\d+)?")
+_WS = re.compile(r"\s+")
+
+
+def normalize_query(text):
+    """Fold the parts of a prompt that change every call (timestamps,
+    scores, XP) so repeated prompts share one cache key."""
+    t = text.lower()
+    t = _ISO_TS.sub("<ts>", t)
+    t = _NUM.sub("0", t)
+    return _WS.sub(" ", t).strip()
+
+
+class QueryCache:
+    def __init__(self, maxsize=1024, spill_path=None):
+        self.maxsize = maxsize
+        self._lru = OrderedDict()   # key -> {"vec", "gen", "ids": {k: [...]}}
+        self._lock = threading.Lock()
+        self._spill_path = str(spill_path) if spill_path else None
+        self._counters = {
+            "lookups": 0, "embed_hits": 0, "embed_misses": 0,
+            "ids_hits": 0, "disk_hits": 0, "evictions": 0, "spill_errors": 0,
+        }
+        self._encode_ms = 0.0   # total time spent on misses, for savings estimate
+
+    def _spill(self, fn):
+        """fn(shelf) with the spill file opened for this call only, under an
+        exclusive lock on <spill>.lock. On an error (e.g. a file damaged
+        before locking was used) it is started afresh once."""
+        for fresh in (False, True):
+            try:
+                with open(self._spill_path + ".lock", "a") as lock:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                    with shelve.open(self._spill_path, flag="n" if fresh else "c") as db:
+                        return fn(db)
+            except Exception as e:
+                self._counters["spill_errors"] += 1
+                print(f"[query_cache] spill {'reset failed' if fresh else 'error, resetting'}: {e}")
+        return None
+
+    def _entry(self, key):
+        e = self._lru.get(key)
+        if e is not None:
+            self._lru.move_to_end(key)
+            return e
+        if self._spill_path is not None:
+            e = self._spill(lambda db: db.get(key))
+            if e is not None:
+                self._counters["disk_hits"] += 1
+                self._insert(key, e)
+        return e
+
+    def _insert(self, key, entry):
+        self._lru[key] = entry
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.maxsize:
+            old_key, old = self._lru.popitem(last=False)
+            self._counters["evictions"] += 1
+            if self._spill_path is not None:
+                self._spill(lambda db: db.__setitem__(old_key, old))
+
+    # ---- lookups ----
+    def get_ids(self, key, gen, k):
+        with self._lock:
+            self._counters["lookups"] += 1
+            e = self._entry(key)
+            if e is None or e["gen"] != gen or k not in e["ids"]:
+                return None
+            self._counters["ids_hits"] += 1
+            return e["ids"][k]
+
+    def get_embedding(self, key):
+        with self._lock:
+            e = self._entry(key)
+            if e is None:
+                self._counters["embed_misses"] += 1
+                return None
+            self._counters["embed_hits"] += 1
+            return e["vec"]
+
+    # ---- stores ----
+    def put_embedding(self, key, vec, encode_ms=0.0):
+        with self._lock:
+            self._encode_ms += encode_ms
+            self._insert(key, {"vec": vec, "gen": None, "ids": {}})
+
+    def put_ids(self, key, gen, k, ids):
+        with self._lock:
+            e = self._lru.get(key)
+            if e is None:
+                return
+            if e["gen"] != gen:
+                e["gen"], e["ids"] = gen, {}
+            e["ids"][k] = list(ids)
+
+    # ---- reporting ----
+    def stats(self):
+        with self._lock:
+            c = dict(self._counters)
+            c["size"] = len(self._lru)
+            c["maxsize"] = self.maxsize
+        hits = c["ids_hits"] + c["embed_hits"]
+        c["hit_rate"] = hits / c["lookups"] if c["lookups"] else 0.0
+        misses = c["embed_misses"]
+        avg = self._encode_ms / misses if misses else 0.0
+        c["avg_encode_ms"] = avg
+        c["encode_ms_saved"] = avg * hits
+        return c
+
+    def close(self):
+        if self._spill_path is not None:
+            with self._lock:
+                self._spill(lambda db: db.update(self._lru))
+                self._spill_path = None
@@ -0,0 +1,344 @@
+# adapters/retrieval_engine.py
+"""
+Resident retrieval engine for the local adapter.
+- Embedder, FAISS index and text map are loaded ONCE per process.
+- Index + text map are read from the published generation (index_gen.py)
+  and hot-swapped together when `current` moves to a new one. Installs
+  without generations fall back to faiss_index + index_texts.bin
+  (mtime/size signature).
+- Load / query / reload timings exposed through retrieval_stats().
+- Repeated queries skip the embedder (and the search) via query_cache.
+- search(mode=): "vector" (FAISS), "lexical" (BM25, no embedder, no
+  faiss needed) or "hybrid" (both, reciprocal-rank fusion). Hybrid falls
+  back to lexical when the vector side is unavailable.
+"""
+
+import os
+import json
+import time
+import atexit
+import threading
+from collections import deque
+
+import index_gen
+import state_store
+from text_store import TextStore
+from bm25_index import BM25Index, rrf
+from adapters.query_cache import QueryCache, normalize_query
+
+# Load config
+CFG = state_store.config()
+
+DISTILL_DIR = os.path.expanduser(CFG.get("distill_dir"))
+# pre-generation layout
+INDEX_TEXTS_PATH = os.path.join(DISTILL_DIR, "index_texts.bin")
+FAISS_INDEX_PATH = os.path.expanduser(CFG.get("faiss_index"))
+INDEX_META_PATH = FAISS_INDEX_PATH + ".meta.json"
+
+EMBED_MODEL = "all-MiniLM-L6-v2"
+
+# How often (seconds) a query is allowed to stat() the index files.
+RELOAD_CHECK_INTERVAL = float(CFG.get("retrieval_reload_check_s", 5))
+# Legacy layout only: files younger than this may still be being written.
+SETTLE_SECONDS = 2.0
+
+# Query-embedding LRU; "query_cache_spill": true keeps evicted entries on disk
+_cache = QueryCache(
+    maxsize=int(CFG.get("query_cache_size", 1024)),
+    spill_path=os.path.join(DISTILL_DIR, "query_cache.db")
+    if CFG.get("query_cache_spill") else None,
+)
+atexit.register(_cache.close)
+
+_model = None
+_model_lock = threading.Lock()
+
+# Current generation: {"sig", "index", "meta", "texts", "bm25", "vectors", "loaded_at"}.
+# index is None when faiss is not importable (lexical-only).
+# Replaced as a whole, never mutated, so readers always see a matching
+# index/text pair.
+_gen = None
+_reload_lock = threading.Lock()
+_last_check = 0.0
+
+_stats = {
+    "model_load_ms": None,
+    "index_load_ms": None,
+    "reloads": 0,
+    "reload_failures": 0,
+    "last_reload_ms": None,
+    "queries": 0,
+    "lexical_queries": 0,
+    "hybrid_queries": 0,
+    "degraded": 0,
+}
+_query_ms = deque(maxlen=512)
+
+
+# -------------------------------------------------------
+# LOADING
+# -------------------------------------------------------
+def _file_signature():
+    """(generation dir or None, ...). Generations never change once
+    published, so their directory alone identifies the contents."""
+    gen = index_gen.current()
+    if gen is not None:
+        return (str(gen),)
+    try:
+        a = os.stat(FAISS_INDEX_PATH)
+        b = os.stat(INDEX_TEXTS_PATH)
+    except OSError:
+        return None
+    return (None, a.st_mtime_ns, a.st_size, b.st_mtime_ns, b.st_size)
+
+
+def _paths(sig):
+    if sig[0] is None:
+        return FAISS_INDEX_PATH, INDEX_META_PATH, INDEX_TEXTS_PATH
+    return (os.path.join(sig[0], index_gen.FAISS_NAME),
+            os.path.join(sig[0], index_gen.META_NAME),
+            os.path.join(sig[0], index_gen.TEXTS_NAME))
+
+
+def _rerank_vectors(sig, meta, ntotal):
+    """fp32 rows for exact re-rank, memory-mapped read-only (page cache is
+    shared by every process), or None when the generation has none."""
+    if sig[0] is None or not meta.get("rerank"):
+        return None
+    path = os.path.join(sig[0], index_gen.VECTORS_NAME)
+    if not os.path.exists(path) or not ntotal:
+        return None
+    import numpy as np
+    rows = np.memmap(path, dtype="float32", mode="r").reshape(-1, meta["dim"])
+    return rows[:ntotal]
+
+
+def _settled(sig):
+    if sig[0] is not None:
+        return True
+    newest = max(sig[1], sig[3]) / 1e9
+    return time.time() - newest >= SETTLE_SECONDS
+
+
+def get_embedder():
+    global _model
+    if _model is not None:
+        return _model
+    with _model_lock:
+        if _model is None:
+            from sentence_transformers import SentenceTransformer
+            t0 = time.perf_counter()
+            _model = SentenceTransformer(EMBED_MODEL)
+            _stats["model_load_ms"] = (time.perf_counter() - t0) * 1000
+    return _model
+
+
+def set_embedder(model):
+    """Use `model` (anything with SentenceTransformer's encode()) instead of
+    loading EMBED_MODEL, e.g. a stub in benchmarks."""
+    global _model
+    with _model_lock:
+        _model = model
+
+
+def _load_bm25(sig, n):
+    if sig[0] is None:
+        return None
+    path = os.path.join(sig[0], index_gen.BM25_NAME)
+    if not os.path.exists(path):
+        return None
+    bm25 = BM25Index(path)
+    if bm25.docs != n:
+        raise ValueError(f"BM25 index has {bm25.docs} docs, text map {n}")
+    return bm25
+
+
+def _load_generation(sig):
+    index_path, meta_path, texts_path = _paths(sig)
+    t0 = time.perf_counter()
+    try:
+        meta = json.load(open(meta_path, "r", encoding="utf-8"))
+    except:
+        meta = {"type": "flat", "params": {}}
+    texts = TextStore(texts_path)
+    bm25 = _load_bm25(sig, len(texts))
+    try:
+        import faiss
+    except ImportError:
+        if bm25 is None:
+            raise
+        index = None   # lexical-only until faiss is installed
+    else:
+        import ann_index
+        index = faiss.read_index(index_path)
+        ann_index.apply_search_params(index, meta)
+        if index.ntotal != len(texts):
+            # index and text map from different builds → keep the old pair
+            raise ValueError(f"index has {index.ntotal} vectors, text map {len(texts)}")
+    vectors = _rerank_vectors(sig, meta, len(texts)) if index is not None else None
+    ms = (time.perf_counter() - t0) * 1000
+    return {"sig": sig, "index": index, "meta": meta, "texts": texts, "bm25": bm25,
+            "vectors": vectors, "loaded_at": time.time()}, ms
+
+
+def _current():
+    """Return the live generation, swapping in a new one if files changed."""
+    global _gen, _last_check
+
+    now = time.monotonic()
+    if _last_check and now - _last_check < RELOAD_CHECK_INTERVAL:
+        return _gen
+
+    # Only one thread reloads; the rest keep serving the old generation.
+    if not _reload_lock.acquire(blocking=_gen is None):
+        return _gen
+    try:
+        _last_check = time.monotonic()
+        sig = _file_signature()
+        if sig is None or (_gen is not None and sig == _gen["sig"]):
+            return _gen
+        if _gen is not None and not _settled(sig):
+            return _gen
+        try:
+            new, ms = _load_generation(sig)
+        except Exception as e:
+            _stats["reload_failures"] += 1
+            print(f"[retrieval] reload skipped: {e}")
+            return _gen
+        if _gen is None:
+            _stats["index_load_ms"] = ms
+        else:
+            _stats["reloads"] += 1
+            _stats["last_reload_ms"] = ms
+        _gen = new
+        return _gen
+    finally:
+        _reload_lock.release()
+
+
+# -------------------------------------------------------
+# PUBLIC API
+# -------------------------------------------------------
+def warm():
+    """Load embedder + index up front (daemons call this at startup)."""
+    get_embedder()
+    return _current() is not None
+
+
+def recent(k):
+    """Newest k (prompt, response) records — retrieval-less fallback."""
+    gen = _current()
+    return gen["texts"].recent(k) if gen else []
+
+
+def _vector_ids(gen, text, k):
+    """FAISS ids for the k nearest records (tombstones included)."""
+    texts = gen["texts"]
+    key = normalize_query(text)
+    ids = _cache.get_ids(key, gen["sig"], k)
+    if ids is None:
+        q = _cache.get_embedding(key)
+        if q is None:
+            model = get_embedder()
+            t1 = time.perf_counter()
+            q = model.encode([text], convert_to_numpy=True)
+            _cache.put_embedding(key, q, (time.perf_counter() - t1) * 1000)
+        # Over-fetch by the tombstone count so k live hits survive filtering
+        fetch = k + texts.dead
+        vectors = gen["vectors"]
+        if vectors is not None:
+            fetch *= gen["meta"].get("rerank_factor", 4)
+        D, I = gen["index"].search(q, min(fetch, len(texts)))
+        ids = [int(i) for i in I[0]]
+        if vectors is not None:
+            import ann_index
+            ids = ann_index.rerank(vectors, q, ids)
+        _cache.put_ids(key, gen["sig"], k, ids)
+    return ids
+
+
+def _lexical_ids(gen, text, k):
+    return [i for i, _ in gen["bm25"].search(text, k)] if gen["bm25"] is not None else []
+
+
+def _finish(gen, ids, k, t0, counter=None):
+    out = gen["texts"].lookup(ids)[:k]
+    _query_ms.append((time.perf_counter() - t0) * 1000)
+    _stats["queries"] += 1
+    if counter:
+        _stats[counter] += 1
+    return out
+
+
+def query(text, k=3):
+    """Vector search only."""
+    gen = _current()
+    if gen is None or gen["index"] is None or not len(gen["texts"]):
+        return []
+    t0 = time.perf_counter()
+    return _finish(gen, _vector_ids(gen, text, k), k, t0)
+
+
+def lexical(text, k=3):
+    """BM25 only: no embedder, no faiss."""
+    gen = _current()
+    if gen is None or gen["bm25"] is None:
+        return []
+    t0 = time.perf_counter()
+    return _finish(gen, _lexical_ids(gen, text, k), k, t0, "lexical_queries")
+
+
+def hybrid(text, k=3):
+    """Vector + BM25 rankings fused by reciprocal rank. Lexical alone if
+    the vector side cannot run (no faiss, no embedder)."""
+    gen = _current()
+    if gen is None or not len(gen["texts"]):
+        return []
+    t0 = time.perf_counter()
+    depth = max(4 * k, 10)
+    lex = _lexical_ids(gen, text, depth)
+    vec = []
+    if gen["index"] is not None:
+        try:
+            vec = [i for i in _vector_ids(gen, text, depth) if i >= 0]
+        except Exception as e:
+            print(f"[retrieval] vector search unavailable ({e}); lexical only")
+    if not vec:
+        _stats["degraded"] += 1
+        return _finish(gen, lex, k, t0, "lexical_queries")
+    return _finish(gen, rrf([vec, lex], depth), k, t0, "hybrid_queries")
+
+
+MODES = {"vector": query, "lexical": lexical, "hybrid": hybrid}
+
+
+def search(text, k=3, mode="hybrid"):
+    if mode not in MODES:
+        raise ValueError(f"unknown retrieval mode {mode!r} (one of {', '.join(MODES)})")
+    return MODES[mode](text, k)
+
+
+def _percentile(vals, p):
+    if not vals:
+        return None
+    s = sorted(vals)
+    return s[min(len(s) - 1, int(round(p / 100 * (len(s) - 1))))]
+
+
+def retrieval_stats():
+    st = dict(_stats)
+    q = list(_query_ms)
+    st["query_ms_last"] = q[-1] if q else None
+    st["query_ms_p50"] = _percentile(q, 50)
+    st["query_ms_p99"] = _percentile(q, 99)
+    gen = _gen
+    st["entries"] = len(gen["texts"]) - gen["texts"].dead if gen else 0
+    st["index_type"] = gen["meta"].get("type") if gen else None
+    st["vector_storage"] = gen["meta"].get("storage", "fp32") if gen else None
+    st["rerank"] = gen is not None and gen["vectors"] is not None
+    st["lexical_index"] = gen is not None and gen["bm25"] is not None
+    st["vector_index"] = gen is not None and gen["index"] is not None
+    st["query_cache"] = _cache.stats()
+    st["generation_loaded_at"] = gen["loaded_at"] if gen else None
+    st["generation"] = os.path.basename(gen["sig"][0]) if gen and gen["sig"][0] else None
+    return st
@@ -24,25 +24,20 @@ ROOT = Path(os.path.expanduser("~/ArcheTYPE"))
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-from router import archetype_respond      # LLM responder (router handles online/local)
-try:
-    from engine.comand_mode import try_parse_command
-except Exception:
-    # best-effort import; if your intent engine differs adjust path
-    try:
-        from engine.comand_mode import try_parse_command
-    except Exception:
-        def try_parse_command(t): return None
+import state_store
+# LLM responder: resident daemon if running, else the router in-process
+from archetype_client import respond as archetype_respond
 
 STATE_DIR = ROOT / "agent_state"
 MEMORY_FILE = STATE_DIR / "memory.jsonl"
 LOG_FILE = STATE_DIR / "agent.log"
-CONFIG = json.load(open(ROOT / "config.json"))
+CONFIG = state_store.config()
 
 # Safety and behaviour
 ALLOW_AUTONOMY = bool(CONFIG.get("allow_autonomy", False))
 SENSE_INTERVAL = int(CONFIG.get("agent_sense_interval", 15))  # seconds between loops
 MAX_ACTIONS_PER_CYCLE = int(CONFIG.get("agent_max_actions", 2))
+CACHE_TTL = float(CONFIG.get("agent_cache_ttl", 120))  # reuse replies for repeat situations
 
 # Helper I/O
 STATE_DIR.mkdir(parents=True, exist_ok=True)
@@ -101,11 +96,8 @@ def get_process_snapshot(limit=80):
         return []
 
 def read_flow_lock_state():
-    try:
-        s = json.load(open(ROOT / "flow_lock" / "state.json"))
-        return s
-    except Exception:
-        return {}
+    # shared with router; re-parsed only when the daemon rewrites it
+    return state_store.load_json(ROOT / "flow_lock" / "state.json", {})
 
 def recent_events(n=20):
     # read last n memory entries for context
@@ -236,7 +228,7 @@ def single_cycle():
     # 2) think (ask archetype_respond for diagnosis+plan)
     prompt = build_reason_prompt(obs, history)
     # force local to avoid network surprises in daemon
-    response = archetype_respond(prompt, force_offline=True)
+    response = archetype_respond(prompt, force_offline=True, cache_ttl=CACHE_TTL)
     append_memory({"type": "reason", "note": response})
     log("Reasoner output: " + (response.splitlines()[0] if response else "empty"))
 
@@ -270,7 +262,7 @@ def single_cycle():
 
     # 5) Evaluate (ask reasoner to score outcome)
     eval_prompt = "SYSTEM: Evaluate the outcome of recent actions. Provide a 1-line verdict and whether to persist any policy change.\n\nRECENT_ACTIONS:\n" + json.dumps(actions_taken, ensure_ascii=False, indent=2)
-    eval_resp = archetype_respond(eval_prompt, force_offline=True)
+    eval_resp = archetype_respond(eval_prompt, force_offline=True, cache_ttl=CACHE_TTL)
     append_memory({"type": "eval", "note": eval_resp, "actions": actions_taken})
     log("Eval: " + (eval_resp.splitlines()[0] if eval_resp else "no-eval"))
 
@@ -0,0 +1,197 @@
+# ann_index.py
+"""
+FAISS index factory for the distilled corpus.
+- flat      exact brute-force scan (IndexFlatL2)
+- ivf_flat  inverted lists, exact vectors
+- ivf_pq    inverted lists, product-quantized vectors
+- hnsw      graph index, no training
+"auto" picks a type from corpus size. Training/search parameters are
+recorded in index metadata so readers can apply the same settings.
+
+Vector storage (faiss_vector_storage) is orthogonal to the type:
+- fp32  full floats (384-d MiniLM: 1536 B/vector)
+- fp16  half floats (768 B), recall ~unchanged
+- int8  8-bit scalar quantizer, trained per-dimension ranges (384 B)
+- pq    product quantizer, m bytes per vector (48 B at m=48)
+ivf_pq is always pq. Lossy storage can be paired with an exact re-rank
+of the top candidates against the fp32 vectors (rerank()); pq codes
+alone lose too much recall, so pq storage always gets it.
+A type or storage that cannot be trained on the corpus falls back with a
+printed notice: ivf_pq → ivf_flat → flat, pq → int8.
+"""
+
+import math
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+STORAGE_TYPES = ("fp32", "fp16", "int8", "pq")
+
+# auto-selection thresholds (number of vectors)
+FLAT_MAX = 50_000
+IVF_FLAT_MAX = 500_000
+
+# IVF needs ~40 points per centroid to train; retrain once the corpus
+# outgrows the training snapshot by this factor.
+MIN_POINTS_PER_LIST = 39
+RETRAIN_FACTOR = 4
+# 8-bit PQ codebooks have 256 centroids per sub-quantizer
+PQ_MIN_POINTS = MIN_POINTS_PER_LIST * 256
+
+
+def choose_index_type(n, requested="auto"):
+    if requested in INDEX_TYPES:
+        kind = requested
+    elif n <= FLAT_MAX:
+        kind = "flat"
+    elif n <= IVF_FLAT_MAX:
+        kind = "ivf_flat"
+    else:
+        kind = "ivf_pq"
+    if kind == "ivf_pq" and n < PQ_MIN_POINTS:
+        kind = "ivf_flat"
+    # too few points to train any IVF → flat is both exact and fast here
+    if kind.startswith("ivf") and n < MIN_POINTS_PER_LIST * 16:
+        kind = "flat"
+    return kind
+
+
+def choose_storage(kind, n, requested="fp32"):
+    if kind == "ivf_pq":
+        return "pq"
+    if requested not in STORAGE_TYPES:
+        raise ValueError(f"unknown vector storage: {requested}")
+    if requested == "pq" and n < PQ_MIN_POINTS:
+        return "int8"
+    return requested
+
+
+def _pq_m(dim):
+    # sub-vectors under 8 dims make faiss' PQ training ~10x slower
+    # (384-d: m=64 trains in 75 s, m=48 in 7 s on 20k vectors)
+    for cand in (64, 48, 32, 24, 16, 8):
+        if dim % cand == 0 and dim // cand >= 8:
+            return cand
+    return 8
+
+
+def default_params(kind, n, dim, storage="fp32"):
+    p = {}
+    if kind in ("ivf_flat", "ivf_pq"):
+        nlist = int(4 * math.sqrt(max(n, 1)))
+        nlist = max(16, min(nlist, n // MIN_POINTS_PER_LIST, 65536))
+        p = {"nlist": nlist, "nprobe": max(8, nlist // 32)}
+    elif kind == "hnsw":
+        p = {"M": 32, "efConstruction": 80, "efSearch": 64}
+    if storage == "pq":
+        p.update(m=_pq_m(dim), nbits=8)
+    return p
+
+
+def make_index(kind, dim, params, storage="fp32"):
+    import faiss
+    sq = {"fp16": faiss.ScalarQuantizer.QT_fp16,
+          "int8": faiss.ScalarQuantizer.QT_8bit}.get(storage)
+    if kind == "flat":
+        if sq is not None:
+            return faiss.IndexScalarQuantizer(dim, sq, faiss.METRIC_L2)
+        if storage == "pq":
+            return faiss.IndexPQ(dim, params["m"], params["nbits"])
+        return faiss.IndexFlatL2(dim)
+    if kind == "hnsw":
+        if sq is not None:
+            index = faiss.IndexHNSWSQ(dim, sq, params["M"])
+        elif storage == "pq":
+            index = faiss.IndexHNSWPQ(dim, params["m"], params["M"])
+        else:
+            index = faiss.IndexHNSWFlat(dim, params["M"])
+        index.hnsw.efConstruction = params["efConstruction"]
+        return index
+    quantizer = faiss.IndexFlatL2(dim)
+    if kind == "ivf_flat":
+        if sq is not None:
+            return faiss.IndexIVFScalarQuantizer(quantizer, dim, params["nlist"], sq,
+                                                 faiss.METRIC_L2)
+        if storage == "pq":
+            return faiss.IndexIVFPQ(quantizer, dim, params["nlist"], params["m"],
+                                    params["nbits"])
+        return faiss.IndexIVFFlat(quantizer, dim, params["nlist"])
+    if kind == "ivf_pq":
+        return faiss.IndexIVFPQ(quantizer, dim, params["nlist"], params["m"], params["nbits"])
+    raise ValueError(f"unknown index type: {kind}")
+
+
+def train_sample(vectors, params, seed=0):
+    """Subsample to at most 256 points per list (faiss' own guidance)."""
+    import numpy as np
+    cap = 256 * max(params.get("nlist", 1), 2 ** params.get("nbits", 0))
+    if len(vectors) <= cap:
+        return vectors
+    rng = np.random.default_rng(seed)
+    return vectors[rng.choice(len(vectors), cap, replace=False)]
+
+
+def build(vectors, requested="auto", overrides=None, storage="fp32"):
+    """Build + fill an index. Returns (index, meta)."""
+    n, dim = vectors.shape
+    kind = choose_index_type(n, requested)
+    if requested in INDEX_TYPES and kind != requested:
+        print(f"[ann_index] {requested} cannot be trained on {n} vectors, using {kind}")
+    wanted, storage = storage, choose_storage(kind, n, storage)
+    if wanted == "pq" and storage != "pq":
+        print(f"[ann_index] pq storage needs {PQ_MIN_POINTS} vectors to train, "
+              f"have {n}: using {storage}")
+    params = default_params(kind, n, dim, storage)
+    params.update((overrides or {}).get(kind, {}))
+
+    index = make_index(kind, dim, params, storage)
+    trained_on = 0
+    if not index.is_trained:
+        sample = train_sample(vectors, params)
+        index.train(sample)
+        trained_on = len(sample)
+    index.add(vectors)
+    meta = {"type": kind, "storage": storage, "dim": dim, "params": params,
+            "trained_on": trained_on, "built_with": n}
+    apply_search_params(index, meta)
+    return index, meta
+
+
+def needs_rebuild(meta, n, requested="auto", storage="fp32"):
+    """True when the stored index no longer fits the corpus it serves."""
+    if not meta:
+        return True
+    kind = choose_index_type(n, requested)
+    if kind != meta.get("type"):
+        return True
+    if choose_storage(kind, n, storage) != meta.get("storage", "fp32"):
+        return True
+    # IVF centroids, PQ codebooks and int8 ranges are trained on a snapshot
+    if kind.startswith("ivf") or meta.get("storage") in ("int8", "pq"):
+        return n > RETRAIN_FACTOR * max(meta.get("built_with", 0), 1)
+    return False
+
+
+def rerank_required(meta):
+    """pq codes are the only stored vectors → always re-rank exactly."""
+    return (meta or {}).get("storage") == "pq"
+
+
+def apply_search_params(index, meta):
+    import faiss
+    params = (meta or {}).get("params", {})
+    if "nprobe" in params:
+        faiss.extract_index_ivf(index).nprobe = params["nprobe"]
+    if "efSearch" in params:
+        index.hnsw.efSearch = params["efSearch"]
+
+
+def rerank(vectors, query, ids, k=None):
+    """Re-order candidate ids by exact L2 distance to `query` using the
+    fp32 rows in `vectors` (e.g. a read-only memmap). Returns ids."""
+    import numpy as np
+    ids = [i for i in ids if 0 <= i < len(vectors)]
+    if not ids:
+        return []
+    q = np.asarray(query, dtype="float32").reshape(-1)
+    d = ((np.asarray(vectors[ids], dtype="float32") - q) ** 2).sum(axis=1)
+    order = np.argsort(d, kind="stable")
+    return [ids[i] for i in order[:k]]
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Thin client for archetype_daemon.py.
+- Talks to the resident daemon over a Unix socket, so a CLI call costs a
+  connect + one round trip instead of interpreter, router and model start.
+- Falls back to running the router in-process when the daemon isn't
+  running (or ARCHETYPE_NO_DAEMON=1).
+- Command mode ("lock on", "lock profile X", ...) and intent actions run
+  here, never in the daemon: they start processes and print, which needs
+  the caller's session (DISPLAY, DBUS, cwd) and terminal.
+
+Protocol: each frame is a 4-byte big-endian length + UTF-8 JSON.
+  request   {"op": "respond" | "respond_many" | "respond_stream" | "intent"
+                   | "ping" | "stats", "args": {...}}
+  reply     {"ok": true, "result": ...} | {"ok": false, "error": "..."}
+  stream    {"chunk": "..."} ... then a final reply frame
+A connection may carry several requests in a row.
+
+Usage:
+  arche <text>            (→ python3 archetype_client.py <text>)
+  arche --offline <text>
+"""
+
+import os
+import sys
+import json
+import socket
+import struct
+
+import state_store
+
+CFG = state_store.config()
+
+SOCKET_PATH = os.path.expanduser(
+    CFG.get("daemon_socket", str(state_store.ROOT / "run" / "archetype.sock")))
+CONNECT_TIMEOUT = 0.5
+MAX_FRAME = 64 << 20
+
+_HEADER = struct.Struct(">I")
+
+
+class DaemonUnavailable(ConnectionError):
+    """No daemon listening; callers fall back to in-process execution."""
+
+
+# -------------------------------------------------------
+# FRAMING (shared with archetype_daemon)
+# -------------------------------------------------------
+def _recv_exact(sock, n):
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("connection closed mid-frame")
+        buf += chunk
+    return bytes(buf)
+
+
+def send_frame(sock, obj):
+    data = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def recv_frame(sock):
+    """Next frame, or None on a clean close between frames."""
+    head = sock.recv(_HEADER.size, socket.MSG_WAITALL)
+    if not head:
+        return None
+    if len(head) < _HEADER.size:
+        head += _recv_exact(sock, _HEADER.size - len(head))
+    (n,) = _HEADER.unpack(head)
+    if n > MAX_FRAME:
+        raise ConnectionError(f"frame too large ({n} bytes)")
+    return json.loads(_recv_exact(sock, n).decode("utf-8"))
+
+
+# -------------------------------------------------------
+# CLIENT
+# -------------------------------------------------------
+def _connect(timeout=None):
+    if os.environ.get("ARCHETYPE_NO_DAEMON") == "1":
+        raise DaemonUnavailable("disabled by ARCHETYPE_NO_DAEMON")
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(CONNECT_TIMEOUT)
+    try:
+        sock.connect(SOCKET_PATH)
+    except OSError as e:
+        sock.close()
+        raise DaemonUnavailable(f"{SOCKET_PATH}: {e}") from e
+    sock.settimeout(timeout)   # inference can take minutes; None = wait
+    return sock
+
+
+def _reply(frame):
+    if frame is None:
+        raise ConnectionError("daemon closed the connection")
+    if not frame.get("ok"):
+        raise RuntimeError(frame.get("error", "daemon error"))
+    return frame.get("result")
+
+
+def call(op, timeout=None, **args):
+    """One request/reply round trip. Raises DaemonUnavailable if no daemon."""
+    with _connect(timeout) as sock:
+        send_frame(sock, {"op": op, "args": args})
+        return _reply(recv_frame(sock))
+
+
+def call_stream(op, timeout=None, **args):
+    """Yields streamed chunks of one request."""
+    with _connect(timeout) as sock:
+        send_frame(sock, {"op": op, "args": args})
+        while True:
+            frame = recv_frame(sock)
+            if frame is not None and "chunk" in frame:
+                yield frame["chunk"]
+                continue
+            _reply(frame)
+            return
+
+
+def daemon_running():
+    try:
+        return call("ping", timeout=2) == "pong"
+    except (OSError, RuntimeError):
+        return False
+
+
+# -------------------------------------------------------
+# PUBLIC API (daemon first, in-process fallback)
+# -------------------------------------------------------
+def respond(user_text, force_offline=False, local_model="local_fast", cache_ttl=None,
+            hedge=None):
+    cmd = command(user_text)
+    if cmd:
+        return cmd
+    try:
+        return call("respond", text=user_text, force_offline=force_offline,
+                    local_model=local_model, cache_ttl=cache_ttl, hedge=hedge)
+    except DaemonUnavailable:
+        from router import archetype_respond
+        return archetype_respond(user_text, force_offline, local_model, cache_ttl, hedge)
+
+
+def respond_many(prompts, concurrency=4, force_offline=False, local_model="local_fast",
+                 cache_ttl=None, hedge=None):
+    prompts = list(prompts)
+    out = [command(p) or None for p in prompts]
+    rest = [p for p, cmd in zip(prompts, out) if cmd is None]
+    if rest:
+        try:
+            replies = call("respond_many", prompts=rest, concurrency=concurrency,
+                           force_offline=force_offline, local_model=local_model,
+                           cache_ttl=cache_ttl, hedge=hedge)
+        except DaemonUnavailable:
+            from router import archetype_respond_many
+            replies = archetype_respond_many(rest, concurrency, force_offline, local_model,
+                                             cache_ttl, hedge)
+        replies = iter(replies)
+        out = [next(replies) if cmd is None else cmd for cmd in out]
+    return out
+
+
+def respond_stream(user_text, force_offline=False, local_model="local_fast", cache_ttl=None):
+    cmd = command(user_text)
+    if cmd:
+        yield cmd
+        return
+    try:
+        stream = call_stream("respond_stream", text=user_text, force_offline=force_offline,
+                             local_model=local_model, cache_ttl=cache_ttl)
+        first = next(stream, None)
+    except DaemonUnavailable:
+        from router import archetype_respond_stream
+        yield from archetype_respond_stream(user_text, force_offline, local_model, cache_ttl)
+        return
+    if first is not None:
+        yield first
+        yield from stream
+
+
+def command(text):
+    """Run `text` as a command in this process; its reply, or None if
+    `text` is not a command."""
+    from engine.comand_mode import try_parse_command
+    return try_parse_command(text)
+
+
+def intent(text):
+    """Classify `text` (daemon first), then execute the intent in this
+    process. Returns the status line (also printed)."""
+    import archetype_intent
+    try:
+        name = call("intent", text=text)
+    except DaemonUnavailable:
+        name = archetype_intent.classify_intent(text)
+    return archetype_intent.execute(name)
+
+
+if __name__ == "__main__":
+    argv = sys.argv[1:]
+    offline = bool(argv) and argv[0] == "--offline"
+    if offline:
+        argv = argv[1:]
+    t = " ".join(argv) if argv else input("You: ")
+    try:
+        for piece in respond_stream(t, force_offline=offline):
+            print(piece, end="", flush=True)
+    except KeyboardInterrupt:
+        pass
+    print()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Resident ArcheTYPE service.
+- Owns one router process: warm retrieval index, embedder, HTTP pool,
+  llama-server handles, query/response caches, breaker state.
+- Serves respond / respond_many / respond_stream / intent over a Unix
+  socket (framing in archetype_client.py), one thread per connection.
+  Commands and intent actions never run here: the client handles command
+  mode before calling, and intent only classifies.
+- `arche`, archetype_intent.py, lock_daemon and agent_core talk to it via
+  archetype_client and run in-process when it isn't up.
+
+Usage:
+  python3 archetype_daemon.py          (foreground; run under systemd --user)
+  python3 archetype_daemon.py stats
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import importlib
+import threading
+import socketserver
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import archetype_client
+from archetype_client import SOCKET_PATH, send_frame, recv_frame
+
+_started = time.time()
+_stats = {"requests": 0, "errors": 0, "by_op": {}}
+_stats_lock = threading.Lock()
+
+
+def log(msg):
+    print(f"[daemon] {msg}", flush=True)
+
+
+# -------------------------------------------------------
+# OPS
+# -------------------------------------------------------
+def _respond(args):
+    from router import archetype_respond
+    return archetype_respond(args["text"], bool(args.get("force_offline")),
+                             args.get("local_model") or "local_fast",
+                             args.get("cache_ttl"), args.get("hedge"))
+
+
+def _respond_stream(args):
+    from router import archetype_respond_stream
+    return archetype_respond_stream(args["text"], bool(args.get("force_offline")),
+                                    args.get("local_model") or "local_fast",
+                                    args.get("cache_ttl"))
+
+
+def _respond_many(args):
+    from router import archetype_respond_many
+    return archetype_respond_many(args["prompts"], int(args.get("concurrency") or 4),
+                                  bool(args.get("force_offline")),
+                                  args.get("local_model") or "local_fast",
+                                  args.get("cache_ttl"), args.get("hedge"))
+
+
+def _intent(args):
+    # classification only: the caller executes the actions in its own
+    # session (DISPLAY, DBUS, cwd) and prints the status
+    from archetype_intent import classify_intent
+    return classify_intent(args["text"])
+
+
+def _daemon_stats(args):
+    import response_cache
+    st = {"pid": os.getpid(), "uptime_s": time.time() - _started,
+          "response_cache": response_cache.stats()}
+    with _stats_lock:
+        st.update(json.loads(json.dumps(_stats)))
+    if "adapters.retrieval_engine" in sys.modules:
+        st["retrieval"] = sys.modules["adapters.retrieval_engine"].retrieval_stats()
+    return st
+
+
+OPS = {
+    "ping": lambda args: "pong",
+    "respond": _respond,
+    "respond_many": _respond_many,
+    "intent": _intent,
+    "stats": _daemon_stats,
+}
+STREAM_OPS = {"respond_stream": _respond_stream}
+
+
+# -------------------------------------------------------
+# SERVER
+# -------------------------------------------------------
+class Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        sock = self.request
+        while True:
+            try:
+                req = recv_frame(sock)
+            except (OSError, ValueError) as e:
+                log(f"bad frame: {e}")
+                return
+            if req is None:
+                return
+            op = req.get("op")
+            with _stats_lock:
+                _stats["requests"] += 1
+                _stats["by_op"][op] = _stats["by_op"].get(op, 0) + 1
+            try:
+                if op in STREAM_OPS:
+                    self._stream(STREAM_OPS[op](req.get("args") or {}))
+                elif op in OPS:
+                    send_frame(sock, {"ok": True, "result": OPS[op](req.get("args") or {})})
+                else:
+                    send_frame(sock, {"ok": False, "error": f"unknown op: {op}"})
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            except Exception as e:
+                with _stats_lock:
+                    _stats["errors"] += 1
+                log(f"{op} failed: {e}")
+                try:
+                    send_frame(sock, {"ok": False, "error": str(e)})
+                except OSError:
+                    return
+
+    def _stream(self, gen):
+        try:
+            for piece in gen:
+                send_frame(self.request, {"chunk": piece})
+            send_frame(self.request, {"ok": True, "result": None})
+        finally:
+            # client went away mid-stream → stop generation (kills llama-run etc.)
+            gen.close()
+
+
+class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def _clear_stale_socket():
+    if not os.path.exists(SOCKET_PATH):
+        return
+    if archetype_client.daemon_running():
+        raise SystemExit(f"[daemon] already running on {SOCKET_PATH}")
+    os.unlink(SOCKET_PATH)
+
+
+def _warm():
+    t0 = time.perf_counter()
+    try:
+        from adapters import retrieval_engine
+        retrieval_engine.warm()
+        # module load (and the online HTTP session pool) happens now,
+        # not on the first request
+        for name in ("adapters.local_adapter", "adapters.online_adapter"):
+            importlib.import_module(name)
+    except Exception as e:
+        log(f"warm-up incomplete: {e}")
+    log(f"warm in {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+
+def serve():
+    os.makedirs(os.path.dirname(SOCKET_PATH), exist_ok=True)
+    _clear_stale_socket()
+    old_umask = os.umask(0o177)   # socket is 0600: same-user clients only
+    try:
+        server = Server(SOCKET_PATH, Handler)
+    finally:
+        os.umask(old_umask)
+    # systemd stops with SIGTERM → unwind through the finally below
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    threading.Thread(target=_warm, daemon=True).start()
+    log(f"listening on {SOCKET_PATH}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        try:
+            os.unlink(SOCKET_PATH)
+        except OSError:
+            pass
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["stats"]:
+        print(json.dumps(archetype_client.call("stats", timeout=5), indent=2))
+    else:
+        serve()
@@ -1,24 +1,35 @@
 #!/usr/bin/env python3
 import sys
 from engine.intent_loader import load_all_intents
-from engine.intent_parser import parse_intent
 from engine.intent_executor import execute_intent
 
-def run_intent(user_text):
+def classify_intent(user_text):
+    """Intent id for `user_text` (a model call), or None."""
+    from engine.intent_parser import parse_intent   # imports the router
+    return parse_intent(user_text)
+
+def execute(intent):
+    """Execute a classified intent here. Returns the status line (also printed)."""
     intents = load_all_intents()
-    intent = parse_intent(user_text)
 
     if not intent:
-        print("Could not classify intent.")
-        return
+        msg = "Could not classify intent."
+    elif intent not in intents:
+        msg = f"Intent '{intent}' not found."
+    else:
+        msg = f"[ArcheTYPE Intent] Executing: {intent}"
+        execute_intent(intents[intent])
 
-    if intent not in intents:
-        print(f"Intent '{intent}' not found.")
-        return
+    print(msg)
+    return msg
 
-    print(f"[ArcheTYPE Intent] Executing: {intent}")
-    execute_intent(intents[intent])
+def run_intent(user_text):
+    """Classify + execute, both in this process."""
+    return execute(classify_intent(user_text))
 
 if __name__ == "__main__":
+    # classified by the resident daemon when it is up (warm router);
+    # the actions run here, with this session's DISPLAY / DBUS / cwd
+    import archetype_client
     text = " ".join(sys.argv[1:]) if len(sys.argv) > 1 else input("Intent: ")
-    run_intent(text)
+    archetype_client.intent(text)
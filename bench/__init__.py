@@ -0,0 +1,4 @@
+"""
+ArcheTYPE benchmarks. Run each module directly, e.g.:
+  python3 -m bench.ann_bench --sizes 10000,100000
+"""
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+ANN index benchmark (CPU only).
+For each corpus size, builds every index type from ann_index on synthetic
+clustered MiniLM-sized vectors and reports:
+- build time
+- recall@k against the exact flat baseline (pq storage re-ranks its top
+  4 * k against the fp32 vectors, as retrieval_engine serves it)
+- p50 / p99 single-query latency (how the local adapter queries)
+
+Usage:
+  python3 -m bench.ann_bench [--sizes 10000,100000,1000000] [--k 3] [--json]
+"""
+
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import ann_index
+
+
+def synthetic_vectors(n, dim, n_clusters=256, seed=0, chunk=100_000):
+    """Unit vectors around random cluster centres — closer to sentence
+    embeddings than uniform noise, which makes every index look perfect."""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(n_clusters, dim)).astype("float32")
+    out = np.empty((n, dim), dtype="float32")
+    for start in range(0, n, chunk):
+        m = min(chunk, n - start)
+        labels = rng.integers(0, n_clusters, m)
+        block = centres[labels] + 0.6 * rng.normal(size=(m, dim)).astype("float32")
+        block /= np.linalg.norm(block, axis=1, keepdims=True)
+        out[start:start + m] = block
+    return out
+
+
+def make_queries(corpus, nq, seed=1):
+    rng = np.random.default_rng(seed)
+    q = corpus[rng.integers(0, len(corpus), nq)].copy()
+    q += 0.05 * rng.normal(size=q.shape).astype("float32")
+    q /= np.linalg.norm(q, axis=1, keepdims=True)
+    return q
+
+
+def recall_at_k(found, truth):
+    k = truth.shape[1]
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / (len(truth) * k)
+
+
+def bench_one(kind, corpus, queries, truth, k):
+    t0 = time.perf_counter()
+    index, meta = ann_index.build(corpus, kind)
+    build_s = time.perf_counter() - t0
+
+    rerank = ann_index.rerank_required(meta)
+    lat = []
+    found = []
+    for q in queries:
+        t = time.perf_counter()
+        _, I = index.search(q[None, :], k * 4 if rerank else k)
+        ids = ann_index.rerank(corpus, q, I[0].tolist(), k) if rerank else I[0]
+        lat.append((time.perf_counter() - t) * 1000)
+        found.append(ids)
+    return {
+        "type": meta["type"],
+        "storage": meta["storage"],
+        "params": meta["params"],
+        "build_s": round(build_s, 3),
+        "recall_at_k": round(recall_at_k(found, truth), 4),
+        "p50_ms": round(float(np.percentile(lat, 50)), 4),
+        "p99_ms": round(float(np.percentile(lat, 99)), 4),
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--sizes", default="10000,100000,1000000")
+    ap.add_argument("--types", default=",".join(ann_index.INDEX_TYPES))
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--k", type=int, default=3)
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("--json", action="store_true", help="emit JSON only")
+    args = ap.parse_args(argv)
+
+    import faiss
+
+    results = []
+    for n in [int(s) for s in args.sizes.split(",")]:
+        corpus = synthetic_vectors(n, args.dim)
+        queries = make_queries(corpus, args.queries)
+        exact = faiss.IndexFlatL2(args.dim)
+        exact.add(corpus)
+        _, truth = exact.search(queries, args.k)
+
+        for kind in args.types.split(","):
+            r = bench_one(kind, corpus, queries, truth, args.k)
+            r["n"] = n
+            results.append(r)
+            if not args.json:
+                print(f"n={n:>8} {kind:>9} → {r['type']:<9} build={r['build_s']:>8.2f}s "
+                      f"recall@{args.k}={r['recall_at_k']:.3f} "
+                      f"p50={r['p50_ms']:.3f}ms p99={r['p99_ms']:.3f}ms")
+        del corpus, exact
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    main()
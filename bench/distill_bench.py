@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Distillation benchmark: parse + SimHash across worker counts, and how
+much near-duplicate removal shrinks the dataset and the retrieval index.
+In a throwaway install, logs --entries router-shaped entries (2/3 online):
+--dup-share of them are templated agent/idle nudges that differ only in
+numbers and one swapped word, the rest are distinct questions. The log
+is sealed, then `distill.build_dataset(full=True)` runs once per worker
+count.
+
+Reports seconds and speedup per worker count, teacher pairs vs kept,
+compression ratio, dataset bytes and a flat fp32 index size estimate
+(--dim floats per pair) with and without dedup.
+
+Usage:
+  python3 -m bench.distill_bench [--entries 50000] [--workers 1,2,4,8]
+      [--dup-share 0.4] [--dim 384] [--json]
+"""
+
+import os
+import sys
+import json
+import random
+import argparse
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+TEMPLATES = [
+    ("Agent check: idle for {n} minutes, window is {app}.",
+     "DIAGNOSIS: {n} minutes idle on {app}.\nACTION: close {app}, return to the editor.\n"
+     "METRIC: one commit in the next 25 minutes."),
+    ("Agent check: flow score dropped to {n} during the {app} session.",
+     "DIAGNOSIS: score {n}, drift into {app}.\nACTION: lock profile coding for one block.\n"
+     "METRIC: score above {n} by the next check."),
+]
+APPS = ["youtube", "reddit", "discord", "twitter"]
+
+
+def _entry(i, rng, words, dup_share):
+    if rng.random() < dup_share:
+        user, resp = rng.choice(TEMPLATES)
+        app, n = rng.choice(APPS), rng.randint(1, 120)
+        user, resp = user.format(n=n, app=app), resp.format(n=n, app=app)
+    else:
+        user = " ".join(rng.sample(words, 14)) + "?"
+        resp = ("DIAGNOSIS: " + " ".join(rng.sample(words, 12)) + "\nACTION: "
+                + " ".join(rng.sample(words, 14)) + "\nMETRIC: " + " ".join(rng.sample(words, 8)))
+    return {"ts": 1_700_000_000 + i, "engine": "local" if i % 3 == 0 else "online",
+            "user": user, "response": resp}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--entries", type=int, default=50000)
+    ap.add_argument("--workers", default="1,2,4,8")
+    ap.add_argument("--dup-share", type=float, default=0.4)
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+
+    rng = random.Random(0)
+    words = sorted({w.strip(".,:;()*`#|").lower()
+                    for w in (ROOT / "README.md").read_text(encoding="utf-8").split()} - {""})
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "ArcheTYPE"
+        root.mkdir()
+        (root / "config.json").write_text(json.dumps(
+            {"log_dir": str(root / "logs"), "distill_dir": str(root / "distill")}))
+        os.environ["ARCHETYPE_ROOT"] = str(root)
+        import logger
+        import distill
+
+        logger.SEGMENT_BYTES = 4 << 20
+        for i in range(args.entries):
+            logger.log_interaction(_entry(i, rng, words, args.dup_share))
+        logger.flush()
+        logger.SEGMENT_BYTES = 0   # close the last segment too, so all of it is sealed
+        logger.log_interaction(_entry(args.entries, rng, words, args.dup_share))
+        logger.flush()
+
+        rows = []
+        for w in (int(x) for x in args.workers.split(",")):
+            stats = distill.build_dataset(full=True, workers=w)
+            stats["dataset_bytes"] = distill.OUT_PATH.stat().st_size
+            rows.append(stats)
+            print(f"[bench] workers={w:<3} {stats['seconds']:.2f}s", file=sys.stderr)
+
+    base = rows[0]["seconds"]
+    for r in rows:
+        r["speedup"] = base / r["seconds"] if r["seconds"] else None
+    r = rows[0]
+    index = {"dim": args.dim, "cores": os.cpu_count(),
+             "index_mb_all": r["online"] * args.dim * 4 / 1e6,
+             "index_mb_kept": r["kept"] * args.dim * 4 / 1e6}
+
+    if args.json:
+        print(json.dumps({"runs": rows, "index": index}, indent=2))
+        return
+    print(f"{'workers':>7} {'seconds':>8} {'speedup':>8}   ({index['cores']} cores)")
+    for r in rows:
+        print(f"{r['workers']:>7} {r['seconds']:>8.2f} {r['speedup']:>7.2f}x")
+    r = rows[0]
+    print(f"\n{r['entries']} entries, {r['online']} teacher pairs, kept {r['kept']} "
+          f"(compression {r['ratio']:.2f}x), dataset {r['dataset_bytes'] / 1e6:.2f} MB")
+    print(f"flat index ({args.dim}-d fp32): {index['index_mb_all']:.1f} MB -> "
+          f"{index['index_mb_kept']:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
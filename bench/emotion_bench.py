@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Emotion detection benchmark.
+Grows a synthetic agent memory.jsonl through the given sizes and, at
+each size, times:
+- full_scan   the old read-whole-file-and-lowercase heuristic
+- query       emotion_tracker after a small append (what a request pays)
+- catch_up    a fresh tracker with no saved state (first call of a process)
+
+Usage:
+  python3 -m bench.emotion_bench [--sizes-mb 1,10,100,1024] [--json]
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+from datetime import datetime, timezone
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from emotion_tracker import EmotionTracker
+
+
+NOTES = [
+    "active_window=code - router.py", "active_window=firefox",
+    "DIAGNOSIS: drift. ACTION: 25 min block. METRIC: 1 commit",
+    "feeling tired after standup", "stuck on the index rebuild",
+    "locked in, small win on retrieval", "NO_ACTION",
+]
+
+
+def _entry(rng):
+    return json.dumps({
+        "type": rng.choice(["obs", "reason", "plan"]),
+        "note": rng.choice(NOTES),
+        "obs": {"procs": [{"pid": rng.randint(1, 99999), "name": "python3"}] * 4},
+        "ts": datetime.now(timezone.utc).astimezone().isoformat(),
+    }) + "\n"
+
+
+def grow(path, target_bytes, rng):
+    """Append entries until the file reaches target_bytes."""
+    block = "".join(_entry(rng) for _ in range(2000)).encode("utf-8")
+    with open(path, "ab") as f:
+        size = f.tell()
+        while size < target_bytes:
+            f.write(block)
+            size += len(block)
+
+
+def full_scan(path):
+    mem = open(path).read().lower()
+    if "tired" in mem or "exhausted" in mem:
+        return "fatigue"
+    if "stuck" in mem:
+        return "frustration"
+    if "win" in mem or "locked in" in mem:
+        return "drive"
+    return "neutral"
+
+
+def _ms(fn, repeat=1):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, (time.perf_counter() - t0) * 1000)
+    return best
+
+
+def _query_p50(tracker, path, rng, n=50):
+    lat = []
+    for _ in range(n):
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(_entry(rng))
+        t0 = time.perf_counter()
+        tracker.current()
+        lat.append((time.perf_counter() - t0) * 1000)
+    lat.sort()
+    return lat[len(lat) // 2]
+
+
+def run(sizes_mb, skip_scan_over_mb):
+    rng = random.Random(0)
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "memory.jsonl"
+        live = EmotionTracker(path, Path(tmp) / "live_state.json")
+        for mb in sizes_mb:
+            grow(path, mb << 20, rng)
+            live.update()
+            row = {"size_mb": mb}
+            row["query_p50_ms"] = _query_p50(live, path, rng)
+            cold = Path(tmp) / "cold_state.json"
+            cold.unlink(missing_ok=True)
+            row["catch_up_ms"] = _ms(lambda: EmotionTracker(path, cold).current())
+            row["full_scan_ms"] = (_ms(lambda: full_scan(path))
+                                   if mb <= skip_scan_over_mb else None)
+            rows.append(row)
+            print(f"[bench] {mb:>5} MB  query p50 {row['query_p50_ms']:.3f} ms  "
+                  f"catch-up {row['catch_up_ms']:.1f} ms  full scan "
+                  + (f"{row['full_scan_ms']:.1f} ms" if row["full_scan_ms"] is not None
+                     else "skipped"), file=sys.stderr)
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes-mb", default="1,10,100,1024")
+    ap.add_argument("--skip-scan-over-mb", type=int, default=1024,
+                    help="don't time the old full scan above this size")
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+
+    rows = run([int(s) for s in args.sizes_mb.split(",")], args.skip_scan_over_mb)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    print(f"{'size_mb':>8} {'query_p50_ms':>13} {'catch_up_ms':>12} {'full_scan_ms':>13}")
+    for r in rows:
+        scan = f"{r['full_scan_ms']:.1f}" if r["full_scan_ms"] is not None else "-"
+        print(f"{r['size_mb']:>8} {r['query_p50_ms']:>13.3f} "
+              f"{r['catch_up_ms']:>12.1f} {scan:>13}")
+
+
+if __name__ == "__main__":
+    main()
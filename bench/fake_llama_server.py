@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Stand-in for llama.cpp's llama-server, for exercising the local adapter
+without a GGUF model. Speaks the subset the adapter uses:
+  GET  /health      → {"status": "ok"}
+  POST /completion  → {"content", "tokens_evaluated", "tokens_cached", "timings"}
+  POST /slots/<id>?action=save|restore
+Prompt "tokens" are whitespace words; the KV cache is simulated as the
+longest common word prefix with the previous prompt. As in llama-server,
+tokens_cached is n_past after generation (prompt + reply) and the reused
+prefix is timings.cache_n.
+
+Usage:
+  python3 -m bench.fake_llama_server [--port 8088] [--delay 0.05]
+then set "llama_server_url": "http://127.0.0.1:8088" in config.json.
+"""
+
+import json
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+REPLY = (
+    "DIAGNOSIS: Attention split across too many threads.\n"
+    "ACTION: Close everything except the current task for 45 minutes.\n"
+    "METRIC: One finished commit."
+)
+
+DELAY = 0.05
+_last_prompt = []
+
+
+def _common_prefix(a, b):
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+class Handler(BaseHTTPRequestHandler):
+    def _send(self, obj, code=200):
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        n = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(n) or b"{}")
+
+    def do_GET(self):
+        if self.path == "/health":
+            return self._send({"status": "ok"})
+        self._send({"error": "not found"}, 404)
+
+    def do_POST(self):
+        global _last_prompt
+        if self.path.startswith("/slots/"):
+            self._body()
+            return self._send({"ok": True})
+        if self.path != "/completion":
+            return self._send({"error": "not found"}, 404)
+        req = self._body()
+        words = req.get("prompt", "").split()
+        cached = _common_prefix(words, _last_prompt) if req.get("cache_prompt") else 0
+        _last_prompt = words
+        timings = {"prompt_n": len(words) - cached, "cache_n": cached}
+        if req.get("n_predict") == 0:
+            return self._send({"content": "", "tokens_evaluated": len(words),
+                               "tokens_cached": len(words), "timings": timings})
+        n_past = len(words) + len(REPLY.split())
+        if req.get("stream"):
+            return self._stream(words, n_past, timings)
+        time.sleep(DELAY)
+        self._send({
+            "content": REPLY,
+            "tokens_evaluated": len(words),
+            "tokens_cached": n_past,
+            "timings": timings,
+            "stop": True,
+        })
+
+    def _stream(self, words, n_past, timings):
+        # DELAY spread over the reply's tokens, SSE-framed like llama-server
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        pieces = REPLY.split(" ")
+        for i, p in enumerate(pieces):
+            time.sleep(DELAY / len(pieces))
+            chunk = {"content": p if i == 0 else " " + p, "stop": False}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        final = {"content": "", "stop": True, "tokens_evaluated": len(words),
+                 "tokens_cached": n_past, "timings": timings}
+        self.wfile.write(f"data: {json.dumps(final)}\n\n".encode("utf-8"))
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port=8088, delay=DELAY):
+    """Start in a background thread; returns the server (call .shutdown())."""
+    global DELAY
+    DELAY = delay
+    srv = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="fake llama-server")
+    ap.add_argument("--port", type=int, default=8088)
+    ap.add_argument("--delay", type=float, default=DELAY, help="seconds per completion")
+    args = ap.parse_args(argv)
+    srv = serve(args.port, args.delay)
+    print(f"fake llama-server on http://127.0.0.1:{args.port}")
+    try:
+        while True:
+            time.sleep(5)
+    except KeyboardInterrupt:
+        srv.shutdown()
+
+
+if __name__ == "__main__":
+    main()
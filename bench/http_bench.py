@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Retry / backoff / pooling checks for adapters/http_client.py against
+bench/stub_openai_server.py, in a throwaway install:
+- pool:    --requests calls, --concurrency at a time → TCP connections opened
+- 503:     every call fails → MAX_RETRIES retries, final 503 returned
+- 429:     every call fails with Retry-After → the delay is honoured
+- flaky:   --fail-rate of calls fail → share answered, mean attempts
+- refused: nothing listening → retried, then the connection error
+- dropped: connection closed after the request went out → not retried
+
+Prints one line per check and exits with status 1 if any fails.
+
+Usage:
+  python3 -m bench.http_bench [--requests 64] [--concurrency 8]
+      [--fail-rate 0.3] [--json]
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bench import stub_openai_server as stub
+
+
+def make_install(tmp):
+    root = Path(tmp) / "ArcheTYPE"
+    root.mkdir()
+    cfg = {"log_dir": str(root / "logs"), "distill_dir": str(root / "distill"),
+           "online_backoff_base": 0.02, "online_backoff_cap": 0.5}
+    (root / "config.json").write_text(json.dumps(cfg), encoding="utf-8")
+    os.environ["ARCHETYPE_ROOT"] = str(root)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Attempts:
+    """Counts post_json's retries by wrapping its backoff."""
+
+    def __init__(self, http_client):
+        self.n = 0
+        self._backoff = http_client._backoff
+        http_client._backoff = self._wrapped
+
+    def _wrapped(self, *args, **kwargs):
+        self.n += 1
+        return self._backoff(*args, **kwargs)
+
+    def take(self):
+        n, self.n = self.n, 0
+        return n
+
+
+def _reset(**opts):
+    stub.OPTS.update({"latency": 0.0, "fail_rate": 0.0, "fail_status": 503,
+                      "retry_after": None, "drop_rate": 0.0}, **opts)
+    for k in stub.COUNTS:
+        stub.COUNTS[k] = 0
+
+
+def run_checks(args):
+    from concurrent.futures import ThreadPoolExecutor
+    import requests
+    from adapters import http_client
+
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/openai/v1/chat/completions"
+    srv = stub.serve(port)
+    attempts = Attempts(http_client)
+    payload = {"messages": [{"role": "user", "content": "bench"}]}
+    retries = http_client.MAX_RETRIES
+    rows = []
+
+    def check(name, ok, detail):
+        rows.append({"check": name, "ok": bool(ok), "detail": detail})
+        print(f"[bench] {name:<8} {'ok  ' if ok else 'FAIL'} {detail}", file=sys.stderr)
+
+    def post(_=None):
+        r = http_client.post_json(url, payload)
+        r.close()
+        return r.status_code
+
+    try:
+        _reset(latency=0.01)
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            codes = list(pool.map(post, range(args.requests)))
+        conns = stub.COUNTS["connections"]
+        check("pool", all(c == 200 for c in codes) and conns <= http_client.POOL_SIZE,
+              f"{args.requests} requests over {conns} connections "
+              f"(pool {http_client.POOL_SIZE})")
+
+        _reset(fail_rate=1.0, fail_status=503)
+        code = post()
+        check("503", code == 503 and stub.COUNTS["requests"] == retries + 1,
+              f"{stub.COUNTS['requests']} attempts for max_retries={retries}, final {code}")
+
+        _reset(fail_rate=1.0, fail_status=429, retry_after=0.1)
+        t0 = time.perf_counter()
+        code = post()
+        dt = time.perf_counter() - t0
+        check("429", code == 429 and dt >= retries * 0.1,
+              f"{stub.COUNTS['requests']} attempts in {dt:.2f}s (Retry-After 0.1s)")
+
+        _reset(fail_rate=args.fail_rate)
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            codes = list(pool.map(post, range(args.requests)))
+        answered = sum(c == 200 for c in codes) / len(codes)
+        check("flaky", answered >= 1 - args.fail_rate,
+              f"{answered:.0%} answered at fail rate {args.fail_rate}, "
+              f"{stub.COUNTS['requests'] / len(codes):.2f} attempts per call")
+
+        refused = f"http://127.0.0.1:{_free_port()}/"
+        attempts.take()
+        try:
+            http_client.post_json(refused, payload)
+            err = None
+        except requests.exceptions.ConnectionError as e:
+            err = e
+        check("refused", err is not None and attempts.take() == retries,
+              f"raised {type(err).__name__} after {retries} retries")
+
+        _reset(drop_rate=1.0)
+        try:
+            post()
+            err = None
+        except requests.exceptions.ConnectionError as e:
+            err = e
+        check("dropped", err is not None and stub.COUNTS["requests"] == 1,
+              f"{stub.COUNTS['requests']} request(s) sent, raised {type(err).__name__}")
+    finally:
+        srv.shutdown()
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--requests", type=int, default=64)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--fail-rate", type=float, default=0.3)
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        make_install(tmp)
+        rows = run_checks(args)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        for r in rows:
+            print(f"{r['check']:<8} {'ok' if r['ok'] else 'FAIL':<5} {r['detail']}")
+    if not all(r["ok"] for r in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
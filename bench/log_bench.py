@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Interaction log benchmark: one-file-per-call vs segmented logger vs
+sealed (compressed, indexed) blocks.
+In a throwaway log_dir, writes --entries router-shaped entries (one per
+minute of log time) and reports:
+- per-call write cost seen by the caller (p50 / p99, µs)
+- total write time (segmented includes the final fsync)
+- nightly read time (distill-style full pass), file count, bytes on disk
+- a one-day / one-engine / substring query (sealed only)
+
+Usage:
+  python3 -m bench.log_bench [--entries 20000] [--json]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+BASE_TS = 1_700_000_000
+
+
+def _entry(i):
+    return {
+        "ts": BASE_TS + i * 60,
+        "engine": "online" if i % 3 else "local",
+        "user": f"prompt {i} about the retrieval index",
+        "adaptive_packet": {"flow_score": i % 2000, "xp": i * 7, "level": 3,
+                            "profile": "coding", "locked_in": True,
+                            "streak": "medium", "emotion": "neutral",
+                            "timestamp": "2025-01-01T10:00:00"},
+        "response": "DIAGNOSIS: drift.\nACTION: 25 minute block.\nMETRIC: one commit.",
+    }
+
+
+def _pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(len(xs) * p))]
+
+
+def bench_per_call(logdir, n):
+    lat = []
+    t0 = time.perf_counter()
+    for i in range(n):
+        t = time.perf_counter()
+        # the previous logger.log_interaction
+        with open(logdir / f"{1_700_000_000_000 + i}.jsonl", "a", encoding="utf-8") as f:
+            f.write(json.dumps(_entry(i), ensure_ascii=False) + "\n")
+        lat.append((time.perf_counter() - t) * 1e6)
+    write_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    count = 0
+    for p in sorted(logdir.glob("*.jsonl")):
+        for line in open(p, encoding="utf-8"):
+            json.loads(line)
+            count += 1
+    read_s = time.perf_counter() - t0
+    return {"p50_us": _pct(lat, 0.5), "p99_us": _pct(lat, 0.99), "write_s": write_s,
+            "read_s": read_s, "files": len(list(logdir.glob("*.jsonl"))), "entries": count,
+            "bytes": _disk(logdir.glob("*.jsonl"))}
+
+
+def _disk(paths):
+    return sum(p.stat().st_size for p in paths)
+
+
+def bench_segmented(logger, log_store, n):
+    lat = []
+    t0 = time.perf_counter()
+    for i in range(n):
+        t = time.perf_counter()
+        logger.log_interaction(_entry(i))
+        lat.append((time.perf_counter() - t) * 1e6)
+    logger.flush()
+    write_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    count = sum(1 for _ in log_store.iter_entries())
+    read_s = time.perf_counter() - t0
+    return {"p50_us": _pct(lat, 0.5), "p99_us": _pct(lat, 0.99), "write_s": write_s,
+            "read_s": read_s, "files": len(logger.segments()), "entries": count,
+            "bytes": _disk(logger.segments())}
+
+
+def bench_sealed(logger, log_store):
+    t0 = time.perf_counter()
+    log_store.seal()
+    seal_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    count = sum(1 for _ in log_store.iter_entries())
+    read_s = time.perf_counter() - t0
+
+    day = BASE_TS + 5 * 86400
+    t0 = time.perf_counter()
+    hits = log_store.query(day, day + 86400, "online", "prompt 77", limit=0)
+    query_ms = (time.perf_counter() - t0) * 1000
+    # nothing sealed (everything still fits the active segment) → no blocks dir
+    sealed = list(log_store.BLOCK_DIR.iterdir()) if log_store.BLOCK_DIR.exists() else []
+    blocks = [p for p in sealed if p.suffix == ".blk"]
+    files = sealed + logger.segments()
+    return {"seal_s": seal_s, "read_s": read_s, "files": len(files), "entries": count,
+            "bytes": _disk(files), "blocks": len(blocks), "block_bytes": _disk(blocks),
+            "query_ms": query_ms, "query_hits": len(hits)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--entries", type=int, default=20000)
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "ArcheTYPE"
+        old_dir, new_dir = Path(tmp) / "per_call", root / "logs"
+        old_dir.mkdir(parents=True)
+        root.mkdir(parents=True, exist_ok=True)
+        (root / "config.json").write_text(json.dumps({"log_dir": str(new_dir)}))
+        os.environ["ARCHETYPE_ROOT"] = str(root)
+        import logger
+        import log_store
+        # small segments so most of them are closed and can be sealed
+        logger.SEGMENT_BYTES = 1 << 20
+
+        rows = {"per_call": bench_per_call(old_dir, args.entries),
+                "segmented": bench_segmented(logger, log_store, args.entries)}
+        rows["sealed"] = bench_sealed(logger, log_store)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    print(f"{'layout':<10} {'p50_us':>8} {'p99_us':>8} {'write_s':>10} "
+          f"{'read_s':>8} {'files':>7} {'MB':>7}")
+    for name, r in rows.items():
+        if "p50_us" in r:
+            print(f"{name:<10} {r['p50_us']:>8.1f} {r['p99_us']:>8.1f} {r['write_s']:>10.2f} "
+                  f"{r['read_s']:>8.2f} {r['files']:>7} {r['bytes'] / 1e6:>7.2f}")
+        else:
+            print(f"{name:<10} {'':>8} {'':>8} {'':>10} "
+                  f"{r['read_s']:>8.2f} {r['files']:>7} {r['bytes'] / 1e6:>7.2f}")
+    s = rows["sealed"]
+    print(f"\nseal {s['seal_s']:.2f} s into {s['blocks']} blocks "
+          f"({s['block_bytes'] / 1e6:.2f} MB); one-day engine+substring query "
+          f"{s['query_ms']:.1f} ms ({s['query_hits']} hits)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Vector storage benchmark: fp32 / fp16 / int8 / pq (ann_index), fp16 and
+int8 also with exact re-rank against memory-mapped fp32 rows, the way
+retrieval_engine serves a generation with faiss_rerank on (pq: always).
+On synthetic clustered MiniLM-sized vectors, reports per mode:
+- index bytes on disk (≈ resident bytes once loaded)
+- load time (faiss.read_index, best of 3)
+- recall@k against the exact fp32 flat baseline
+- p50 single-query latency
+Re-rank rows are mmapped, so they add page cache, not per-process heap.
+
+Usage:
+  python3 -m bench.quant_bench [--n 100000] [--type flat] [--k 3]
+      [--storage fp32,fp16,int8,pq] [--rerank-factor 4] [--json]
+"""
+
+import sys
+import json
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import ann_index
+from bench.ann_bench import synthetic_vectors, make_queries, recall_at_k
+
+
+def bench_storage(storage, kind, corpus, queries, truth, k, tmp, vectors=None, factor=4):
+    import faiss
+    index, meta = ann_index.build(corpus, kind, storage=storage)
+    path = Path(tmp) / f"{kind}-{meta['storage']}.index"
+    faiss.write_index(index, str(path))
+    del index
+
+    loads = []
+    for _ in range(3):
+        t = time.perf_counter()
+        index = faiss.read_index(str(path))
+        loads.append((time.perf_counter() - t) * 1000)
+    ann_index.apply_search_params(index, meta)
+
+    lat, found = [], []
+    for q in queries:
+        t = time.perf_counter()
+        q = q[None, :]
+        _, I = index.search(q, k * factor if vectors is not None else k)
+        ids = [int(i) for i in I[0]]
+        if vectors is not None:
+            ids = ann_index.rerank(vectors, q, ids, k)
+        lat.append((time.perf_counter() - t) * 1000)
+        found.append(ids[:k])
+    return {
+        "type": meta["type"],
+        "storage": meta["storage"],
+        "rerank": vectors is not None,
+        "index_mb": round(path.stat().st_size / 1e6, 3),
+        "load_ms": round(min(loads), 2),
+        "recall_at_k": round(recall_at_k(found, truth), 4),
+        "p50_ms": round(float(np.percentile(lat, 50)), 4),
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--n", type=int, default=100_000)
+    ap.add_argument("--type", default="flat", choices=ann_index.INDEX_TYPES)
+    ap.add_argument("--storage", default=",".join(ann_index.STORAGE_TYPES))
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--k", type=int, default=3)
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("--rerank-factor", type=int, default=4)
+    ap.add_argument("--json", action="store_true", help="emit JSON only")
+    args = ap.parse_args(argv)
+
+    import faiss
+
+    corpus = synthetic_vectors(args.n, args.dim)
+    queries = make_queries(corpus, args.queries)
+    exact = faiss.IndexFlatL2(args.dim)
+    exact.add(corpus)
+    _, truth = exact.search(queries, args.k)
+    del exact
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        vec_path = Path(tmp) / "vectors.f32"
+        corpus.tofile(vec_path)
+        vectors = np.memmap(vec_path, dtype="float32", mode="r").reshape(-1, args.dim)
+
+        for storage in args.storage.split(","):
+            # pq is only ever served re-ranked (ann_index.rerank_required)
+            runs = {"fp32": [None], "pq": [vectors]}.get(storage, [None, vectors])
+            for vecs in runs:
+                r = bench_storage(storage, args.type, corpus, queries, truth, args.k, tmp,
+                                  vecs, args.rerank_factor)
+                r["n"] = args.n
+                results.append(r)
+                if not args.json:
+                    label = r["storage"] + ("+rerank" if r["rerank"] else "")
+                    print(f"{r['type']:>9} {label:<12} index={r['index_mb']:>9.2f}MB "
+                          f"load={r['load_ms']:>8.2f}ms recall@{args.k}={r['recall_at_k']:.3f} "
+                          f"p50={r['p50_ms']:.3f}ms")
+        if not args.json:
+            print(f"(re-rank rows: {vec_path.stat().st_size / 1e6:.2f} MB, mmapped)")
+        del vectors
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Retrieval benchmark: retriever.build_index + retrieval_engine /
+local_adapter.search_topk on synthetic distilled corpora of growing size.
+Runs offline: vectors come from bench.stub_embedder unless --model minilm
+is given and all-MiniLM-L6-v2 is already in the local HF cache.
+
+For each --sizes N, in a throwaway install:
+- corpus: N topic-clustered prompt/response pairs; queries are noisy
+  rewrites of known prompts (that prompt is the relevant hit)
+- build (subprocess): build_index time, generation bytes per file
+- query (fresh subprocess, so loads are cold): index cold-load ms, then
+  per retrieval mode p50 / p99 ms over distinct queries and recall@k,
+  plus end-to-end search_topk p50
+Extra config keys (e.g. '{"faiss_vector_storage": "int8"}') go through
+--config; the query cache is off unless --config turns it on.
+
+Usage:
+  python3 -m bench.retrieval_bench [--sizes 1000,10000,50000] [--k 3]
+      [--queries 300] [--modes vector,lexical,hybrid] [--model stub|minilm]
+      [--config JSON] [--json] [--out results.json]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import contextlib
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+MODES = ("vector", "lexical", "hybrid")
+_SYLLABLES = ["ka", "lo", "mi", "ren", "tu", "sa", "vor", "el", "dan", "qi",
+              "pha", "ny", "zo", "bri", "ut", "gem", "ax", "ol", "fi", "sha"]
+
+
+# -------------------------------------------------------
+# SYNTHETIC CORPUS
+# -------------------------------------------------------
+def _vocab(n, rng):
+    words = set()
+    while len(words) < n:
+        words.add("".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def make_corpus(n, seed=0):
+    """n unique (prompt, response) pairs, ~50 per topic; returns (pairs, topics)
+    where topics[i] is the topic word list of pair i."""
+    rng = random.Random(seed)
+    vocab = _vocab(8000, rng)
+    topics = [rng.sample(vocab, 30) for _ in range(max(20, n // 50))]
+    pairs, seen, topic_of = [], set(), []
+    while len(pairs) < n:
+        t = rng.randrange(len(topics))
+        words = rng.sample(topics[t], 7) + rng.sample(vocab, 3)
+        prompt = " ".join(words)
+        if prompt in seen:
+            continue
+        seen.add(prompt)
+        resp = ("DIAGNOSIS: " + " ".join(rng.sample(topics[t], 6))
+                + "\nACTION: " + " ".join(rng.sample(topics[t], 6))
+                + "\nMETRIC: " + " ".join(rng.sample(vocab, 4)))
+        pairs.append((prompt, resp))
+        topic_of.append(t)
+    return pairs, [topics[t] for t in topic_of]
+
+
+def make_queries(pairs, topics, nq, seed=1):
+    """(query, relevant prompt): the prompt minus 3 words plus 2 topic words, shuffled."""
+    rng = random.Random(seed)
+    out = []
+    for i in rng.sample(range(len(pairs)), min(nq, len(pairs))):
+        words = pairs[i][0].split()
+        for _ in range(3):
+            words.pop(rng.randrange(len(words)))
+        words += rng.sample(topics[i], 2)
+        rng.shuffle(words)
+        out.append((" ".join(words), pairs[i][0]))
+    return out
+
+
+# -------------------------------------------------------
+# CHILD PROCESSES (one install each, config read at import)
+# -------------------------------------------------------
+def _embedder(model):
+    if model == "minilm":
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")   # cached model only
+        try:
+            from sentence_transformers import SentenceTransformer
+            return SentenceTransformer("all-MiniLM-L6-v2")
+        except Exception as e:
+            raise SystemExit(f"[bench] --model minilm needs sentence-transformers and a "
+                             f"cached all-MiniLM-L6-v2 (no downloads here): {e}")
+    from bench.stub_embedder import StubEmbedder
+    return StubEmbedder()
+
+
+def _pct(xs, p):
+    xs = sorted(xs)
+    return round(xs[min(len(xs) - 1, int(len(xs) * p))], 4) if xs else None
+
+
+def child_build(root, model):
+    import retriever
+    emb = _embedder(model)
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stderr):
+        gen = retriever.build_index(embedder=emb)
+    build_s = time.perf_counter() - t0
+    sizes = {p.name: p.stat().st_size for p in sorted(gen.iterdir())}
+    return {"build_s": round(build_s, 3), "files": sizes,
+            "index_bytes": sum(v for k, v in sizes.items() if k != "vectors.f32")}
+
+
+def child_query(root, model, k, modes):
+    queries = json.loads((root / "queries.json").read_text(encoding="utf-8"))
+    t0 = time.perf_counter()
+    emb = _embedder(model)
+    embedder_ms = (time.perf_counter() - t0) * 1000
+
+    t0 = time.perf_counter()
+    from adapters import retrieval_engine
+    retrieval_engine.set_embedder(emb)
+    with contextlib.redirect_stdout(sys.stderr):
+        loaded = retrieval_engine.warm()
+    out = {"embedder_load_ms": round(embedder_ms, 2),
+           "cold_load_ms": round((time.perf_counter() - t0) * 1000, 2),
+           "loaded": loaded, "modes": {}}
+
+    for mode in modes:
+        lat, hits = [], 0
+        for q, relevant in queries:
+            t = time.perf_counter()
+            recs = retrieval_engine.search(q, k, mode)
+            lat.append((time.perf_counter() - t) * 1000)
+            hits += any(r[0] == relevant for r in recs)
+        out["modes"][mode] = {"p50_ms": _pct(lat, 0.5), "p99_ms": _pct(lat, 0.99),
+                              f"recall_at_{k}": round(hits / len(queries), 4)}
+
+    from adapters import local_adapter
+    lat = []
+    for q, _ in queries:
+        t = time.perf_counter()
+        local_adapter.search_topk(q, k)
+        lat.append((time.perf_counter() - t) * 1000)
+    out["search_topk"] = {"mode": local_adapter.RETRIEVAL_MODE,
+                          "p50_ms": _pct(lat, 0.5), "p99_ms": _pct(lat, 0.99)}
+    return out
+
+
+def _run_child(phase, root, args):
+    cmd = [sys.executable, "-m", "bench.retrieval_bench", "--_child", phase,
+           "--_root", str(root), "--model", args.model, "--k", str(args.k),
+           "--modes", args.modes]
+    env = dict(os.environ, ARCHETYPE_ROOT=str(root), ARCHETYPE_NO_DAEMON="1")
+    res = subprocess.run(cmd, cwd=ROOT, env=env, stdout=subprocess.PIPE, text=True)
+    if res.returncode != 0:
+        raise SystemExit(f"[bench] {phase} step failed (exit {res.returncode})")
+    return json.loads(res.stdout)
+
+
+# -------------------------------------------------------
+# DRIVER
+# -------------------------------------------------------
+def bench_size(n, args, extra_cfg):
+    pairs, topics = make_corpus(n)
+    queries = make_queries(pairs, topics, args.queries)
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "ArcheTYPE"
+        distill_dir = root / "distilled_dataset"
+        distill_dir.mkdir(parents=True)
+        cfg = {"log_dir": str(root / "logs"), "distill_dir": str(distill_dir),
+               "faiss_index": str(root / "faiss.index"), "models": {},
+               "query_cache_size": 0}
+        cfg.update(extra_cfg)
+        (root / "config.json").write_text(json.dumps(cfg), encoding="utf-8")
+        with open(distill_dir / "supervised_pairs.jsonl", "w", encoding="utf-8") as f:
+            for p, r in pairs:
+                f.write(json.dumps({"prompt": p, "response": r}) + "\n")
+        (root / "queries.json").write_text(json.dumps(queries), encoding="utf-8")
+
+        row = {"n": n, "queries": len(queries)}
+        row.update(_run_child("build", root, args))
+        row.update(_run_child("query", root, args))
+    return row
+
+
+def _environment(args, extra_cfg):
+    env = {"python": platform.python_version(), "cpus": os.cpu_count(),
+           "embedder": args.model, "k": args.k, "config": extra_cfg}
+    try:
+        import faiss
+        env["faiss"] = faiss.__version__
+    except ImportError:
+        env["faiss"] = None
+    return env
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default="1000,10000,50000")
+    ap.add_argument("--k", type=int, default=3)
+    ap.add_argument("--queries", type=int, default=300)
+    ap.add_argument("--modes", default=",".join(MODES))
+    ap.add_argument("--model", default="stub", choices=["stub", "minilm"])
+    ap.add_argument("--config", default="{}", help="extra config.json keys (JSON)")
+    ap.add_argument("--json", action="store_true", help="emit JSON only")
+    ap.add_argument("--out", help="also write the JSON results here")
+    ap.add_argument("--_child", choices=["build", "query"], help=argparse.SUPPRESS)
+    ap.add_argument("--_root", help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+
+    if args._child:
+        root = Path(args._root)
+        if args._child == "build":
+            res = child_build(root, args.model)
+        else:
+            res = child_query(root, args.model, args.k, args.modes.split(","))
+        print(json.dumps(res))
+        return res
+
+    extra_cfg = json.loads(args.config)
+    results = {"environment": _environment(args, extra_cfg), "runs": []}
+    for n in (int(s) for s in args.sizes.split(",")):
+        row = bench_size(n, args, extra_cfg)
+        results["runs"].append(row)
+        if not args.json:
+            print(f"n={n:>7} build={row['build_s']:>7.2f}s index={row['index_bytes'] / 1e6:>7.2f}MB "
+                  f"cold_load={row['cold_load_ms']:>7.1f}ms")
+            for mode, m in row["modes"].items():
+                print(f"    {mode:<8} p50={m['p50_ms']:>7.3f}ms p99={m['p99_ms']:>7.3f}ms "
+                      f"recall@{args.k}={m[f'recall_at_{args.k}']:.3f}")
+            s = row["search_topk"]
+            print(f"    search_topk({s['mode']}) p50={s['p50_ms']:.3f}ms p99={s['p99_ms']:.3f}ms")
+
+    if args.out:
+        Path(args.out).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    if args.json:
+        print(json.dumps(results, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+CLI cold-start benchmark.
+Runs each CLI path in a fresh interpreter under `python -X importtime`
+against a throwaway install (HOME and ARCHETYPE_ROOT point at a temp dir,
+so nothing real is touched) and reports:
+- wall time (median of --runs)
+- total import time and the slowest top-level imports
+- which heavy modules (requests, faiss, ...) the path pulled in, and
+  whether the router itself was loaded
+The `arche` path (archetype_client.py) is measured twice: with no daemon
+(in-process fallback) and with archetype_daemon.py running in the same
+throwaway install (one socket round trip).
+
+Command paths must not load heavy modules; --check exits 1 if one does.
+
+Usage:
+  python3 -m bench.startup_bench [--runs 5] [--top 5] [--check] [--json]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+HEAVY = ("requests", "faiss", "sentence_transformers", "torch", "numpy",
+         "psutil", "dotenv")
+
+CLIENT = str(ROOT / "archetype_client.py")
+
+# name -> (argv after the interpreter, must stay light, needs the daemon up)
+PATHS = {
+    "import router":  (["-c", "import router"], True, False),
+    "lock status":    ([str(ROOT / "router.py"), "lock status"], True, False),
+    "flow score":     ([str(ROOT / "router.py"), "flow score"], True, False),
+    "engine status":  ([str(ROOT / "router.py"), "engine status"], True, False),
+    "import local":   (["-c", "import adapters.local_adapter"], False, False),
+    "import online":  (["-c", "import adapters.online_adapter"], False, False),
+    # what `arche <text>` runs: in-process fallback vs one socket round trip
+    "client no daemon": ([CLIENT, "lock status"], True, False),
+    "client daemon":    ([CLIENT, "lock status"], True, True),
+}
+
+
+def make_install(tmp):
+    """Minimal config.json + flow_lock dir under a fake HOME."""
+    home = Path(tmp)
+    root = home / "ArcheTYPE"
+    (root / "flow_lock").mkdir(parents=True)
+    cfg = {
+        "log_dir": str(root / "logs"),
+        "distill_dir": str(root / "distill"),
+        "faiss_index": str(root / "faiss.index"),
+        "models": {"local_fast": str(root / "models/none.gguf")},
+        "online_api_env_var": "ARCHETYPE_BENCH_NO_KEY",
+    }
+    (root / "config.json").write_text(json.dumps(cfg), encoding="utf-8")
+    env = dict(os.environ, HOME=str(home), ARCHETYPE_ROOT=str(root),
+               PYTHONPATH=str(ROOT), PYTHONDONTWRITEBYTECODE="1")
+    env.pop("ARCHETYPE_BENCH_NO_KEY", None)
+    return env
+
+
+def start_daemon(env, timeout=60):
+    """archetype_daemon.py in the throwaway install; returns once it answers."""
+    proc = subprocess.Popen([sys.executable, str(ROOT / "archetype_daemon.py")],
+                            env=env, cwd=str(ROOT), stdout=subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        ping = subprocess.run(
+            [sys.executable, "-c", "import archetype_client as c; "
+             "raise SystemExit(0 if c.daemon_running() else 1)"],
+            env=env, cwd=str(ROOT), capture_output=True)
+        if ping.returncode == 0:
+            return proc
+        if proc.poll() is not None:
+            break
+        time.sleep(0.2)
+    proc.kill()
+    raise SystemExit("[bench] archetype_daemon.py did not come up")
+
+
+def stop_daemon(proc):
+    proc.terminate()   # SIGTERM: the daemon removes its socket
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+def parse_importtime(stderr):
+    """[(module, self_us, cumulative_us, depth)] from -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cum_us, name = line[len("import time:"):].split("|", 2)
+        except ValueError:
+            continue
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cum_us), depth))
+    return rows
+
+
+def run_path(argv, env, runs):
+    walls, last = [], None
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        last = subprocess.run([sys.executable, "-X", "importtime"] + argv,
+                              env=env, cwd=str(ROOT), capture_output=True,
+                              text=True, timeout=300)
+        walls.append((time.perf_counter() - t0) * 1000)
+    rows = parse_importtime(last.stderr)
+    modules = {r[0] for r in rows}
+    return {
+        "ok": last.returncode == 0,
+        "wall_ms": statistics.median(walls),
+        "import_ms": sum(r[1] for r in rows) / 1000,
+        "top": sorted(((r[0], r[2] / 1000) for r in rows if r[3] <= 1),
+                      key=lambda x: -x[1]),
+        "heavy": sorted(h for h in HEAVY if h in modules),
+        "router_loaded": "router" in modules or argv[0].endswith("router.py"),
+        "error": None if last.returncode == 0 else last.stderr.strip().splitlines()[-1:],
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--top", type=int, default=5)
+    ap.add_argument("--paths", default=",".join(PATHS),
+                    help="comma-separated subset of: " + ", ".join(PATHS))
+    ap.add_argument("--check", action="store_true",
+                    help="exit 1 if a command path imports a heavy module")
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+
+    names = args.paths.split(",")
+    results, failed = {}, []
+    with tempfile.TemporaryDirectory() as tmp:
+        env = make_install(tmp)
+        env.pop("ARCHETYPE_NO_DAEMON", None)
+        # daemon-less paths first: nothing is listening on the temp socket yet
+        daemon = None
+        try:
+            for name in sorted(names, key=lambda n: PATHS[n][2]):
+                argv, light, needs_daemon = PATHS[name]
+                if needs_daemon and daemon is None:
+                    daemon = start_daemon(env)
+                r = run_path(argv, env, args.runs)
+                r["top"] = r["top"][:args.top]
+                results[name] = r
+                if light and r["heavy"]:
+                    failed.append(name)
+        finally:
+            if daemon is not None:
+                stop_daemon(daemon)
+    results = {name: results[name] for name in names}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'path':<18} {'wall_ms':>8} {'import_ms':>10} {'router':>7}  heavy")
+        for name, r in results.items():
+            heavy = ",".join(r["heavy"]) or "-"
+            status = "" if r["ok"] else f"  FAILED {r['error']}"
+            router = "yes" if r["router_loaded"] else "no"
+            print(f"{name:<18} {r['wall_ms']:>8.1f} {r['import_ms']:>10.1f} {router:>7}  "
+                  f"{heavy}{status}")
+            for mod, ms in r["top"]:
+                print(f"    {mod:<40} {ms:>8.1f} ms")
+
+    if args.check and failed:
+        print(f"[bench] heavy imports on command paths: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
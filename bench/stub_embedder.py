@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Deterministic stand-in for the MiniLM sentence embedder, so retrieval can
+be built and benchmarked offline without downloading a model.
+Each word gets a fixed pseudo-random unit vector (seeded by a hash of the
+word); a text is the normalised sum of its word vectors. Texts sharing
+words land close together, so recall numbers still mean something.
+Same encode() signature as SentenceTransformer for the parts we use.
+"""
+
+import re
+import hashlib
+from functools import lru_cache
+
+import numpy as np
+
+DIM = 384
+_WORD = re.compile(r"\w+")
+
+
+class StubEmbedder:
+    def __init__(self, dim=DIM):
+        self.dim = dim
+        self._word = lru_cache(maxsize=1 << 17)(self._word_vector)
+
+    def _word_vector(self, word):
+        seed = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(),
+                              "little")
+        v = np.random.default_rng(seed).standard_normal(self.dim).astype("float32")
+        return v / np.linalg.norm(v)
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def encode(self, texts, show_progress_bar=False, convert_to_numpy=True, **kwargs):
+        if isinstance(texts, str):
+            texts = [texts]
+        out = np.zeros((len(texts), self.dim), dtype="float32")
+        for row, text in enumerate(texts):
+            for w in _WORD.findall(text.lower()):
+                out[row] += self._word(w)
+            n = np.linalg.norm(out[row])
+            if n:
+                out[row] /= n
+        return out
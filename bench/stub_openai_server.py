@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Stub OpenAI-compatible chat endpoint with injectable latency and failures,
+for exercising the online adapter (pooling, retries, streaming) offline.
+  POST /openai/v1/chat/completions   (any POST path is accepted)
+
+Usage:
+  python3 -m bench.stub_openai_server [--port 8098] [--latency 0.2]
+      [--fail-rate 0.3] [--fail-status 503] [--retry-after 0] [--drop-rate 0]
+--drop-rate closes the connection after reading a request, without replying.
+then set "online_api_url": "http://127.0.0.1:8098/openai/v1/chat/completions".
+"""
+
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+REPLY = (
+    "DIAGNOSIS: Momentum stalled on setup work.\n"
+    "ACTION: Ship the smallest working slice in 30 minutes.\n"
+    "METRIC: One passing run."
+)
+
+OPTS = {"latency": 0.2, "fail_rate": 0.0, "fail_status": 503, "retry_after": None,
+        "drop_rate": 0.0}
+COUNTS = {"requests": 0, "failures": 0, "drops": 0, "connections": 0}
+_lock = threading.Lock()
+
+
+class Handler(BaseHTTPRequestHandler):
+    # keep-alive, so connection reuse is visible in COUNTS
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with _lock:
+            COUNTS["connections"] += 1
+
+    def _send(self, obj, code=200, extra=None):
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (extra or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        n = int(self.headers.get("Content-Length") or 0)
+        req = json.loads(self.rfile.read(n) or b"{}")
+        with _lock:
+            COUNTS["requests"] += 1
+        time.sleep(OPTS["latency"])
+
+        if random.random() < OPTS["drop_rate"]:
+            with _lock:
+                COUNTS["drops"] += 1
+            self.close_connection = True
+            return
+
+        if random.random() < OPTS["fail_rate"]:
+            with _lock:
+                COUNTS["failures"] += 1
+            extra = {}
+            if OPTS["retry_after"] is not None:
+                extra["Retry-After"] = str(OPTS["retry_after"])
+            return self._send({"error": {"message": "injected failure"}},
+                              OPTS["fail_status"], extra)
+
+        if req.get("stream"):
+            return self._stream()
+        self._send({"choices": [{"message": {"role": "assistant", "content": REPLY}}]})
+
+    def _stream(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for i, word in enumerate(REPLY.split(" ")):
+            delta = {"choices": [{"delta": {"content": word if i == 0 else " " + word}}]}
+            self.wfile.write(f"data: {json.dumps(delta)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(0.005)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port=8098, **opts):
+    """Start in a background thread; returns the server (call .shutdown())."""
+    OPTS.update(opts)
+    srv = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="stub OpenAI-compatible server")
+    ap.add_argument("--port", type=int, default=8098)
+    ap.add_argument("--latency", type=float, default=OPTS["latency"])
+    ap.add_argument("--fail-rate", type=float, default=0.0)
+    ap.add_argument("--fail-status", type=int, default=503)
+    ap.add_argument("--retry-after", type=float, default=None)
+    ap.add_argument("--drop-rate", type=float, default=0.0)
+    args = ap.parse_args(argv)
+    srv = serve(args.port, latency=args.latency, fail_rate=args.fail_rate,
+                fail_status=args.fail_status, retry_after=args.retry_after,
+                drop_rate=args.drop_rate)
+    print(f"stub OpenAI server on http://127.0.0.1:{args.port}")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"[stub] {COUNTS}")
+    except KeyboardInterrupt:
+        srv.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Throughput of router.archetype_respond_many against stub engines.
+The full per-prompt pipeline runs (prepare, logging) in a throwaway
+install; engine choice and the model calls are replaced:
+- online: fixed latency, fully parallel (like an HTTP API)
+- local:  fixed latency per sequence, at most --local-slots at once
+          (llama_parallel = --local-slots, like llama-server's slots)
+
+Reports prompts/sec for each concurrency and checks reply order. Exits
+with status 1 if any reply is a "[router error]".
+
+Usage:
+  python3 -m bench.throughput_bench [--prompts 64] [--concurrency 1,2,4,8,16]
+      [--online-latency 0.2] [--local-latency 0.5] [--local-slots 4] [--json]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+REPLY = "DIAGNOSIS: {}\nACTION: one block.\nMETRIC: one commit."
+
+
+def make_install(tmp):
+    home = Path(tmp)
+    root = home / "ArcheTYPE"
+    (root / "flow_lock").mkdir(parents=True)
+    (root / "soul").mkdir()
+    # apply_ritual needs all three at hours 6, 12 and 22
+    soul = {"rituals": {k: {"phrase": f"{k} ritual."} for k in ("morning", "midday", "night")}}
+    (root / "soul" / "ascetic_soul.json").write_text(json.dumps(soul), encoding="utf-8")
+    cfg = {
+        "log_dir": str(root / "logs"),
+        "distill_dir": str(root / "distill"),
+        "faiss_index": str(root / "faiss.index"),
+        "models": {"local_fast": str(root / "models/none.gguf")},
+        "online_api_env_var": "ARCHETYPE_BENCH_NO_KEY",
+    }
+    (root / "config.json").write_text(json.dumps(cfg), encoding="utf-8")
+    # must be set before router / state_store are imported
+    os.environ.update(HOME=str(home), ARCHETYPE_ROOT=str(root), ARCHETYPE_NO_DAEMON="1")
+
+
+def install_stubs(router, online_latency, local_latency, local_slots):
+    slots = threading.Semaphore(local_slots)
+
+    def online(prompt):
+        time.sleep(online_latency)
+        return REPLY.format(prompt.rsplit("USER:\n", 1)[-1])
+
+    def local(prompt, model_key="local_fast", instructions=""):
+        with slots:
+            time.sleep(local_latency)
+        return REPLY.format(prompt.rsplit("USER:\n", 1)[-1])
+
+    def online_many(prompts, concurrency=4):
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            return list(pool.map(online, prompts))
+
+    # batches go through the real local_adapter.call_local_model_many,
+    # which caps concurrency at llama_parallel
+    from adapters import local_adapter, llama_server
+    local_adapter.call_local_model = local
+    llama_server.PARALLEL = local_slots
+
+    router.call_online_model = online
+    router.call_online_model_many = online_many
+    router.call_local_model = local
+    router.choose_engine = lambda: "online"
+
+
+def run(router, engine, prompts, concurrency):
+    t0 = time.perf_counter()
+    out = router.archetype_respond_many(prompts, concurrency=concurrency,
+                                        force_offline=(engine == "local"), cache_ttl=0)
+    dt = time.perf_counter() - t0
+    errors = [r for r in out if r.startswith("[router error]")]
+    if errors:
+        raise SystemExit(f"[bench] {engine} c={concurrency}: {len(errors)} router errors, "
+                         f"first: {errors[0]}")
+    # a ritual phrase may precede the prompt at hours 6, 12 and 22
+    ordered = all(r.startswith("DIAGNOSIS: ") and r.split("\n", 1)[0].endswith(p)
+                  for p, r in zip(prompts, out))
+    return {"engine": engine, "concurrency": concurrency, "seconds": dt,
+            "prompts_per_s": len(prompts) / dt, "ordered": ordered}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--prompts", type=int, default=64)
+    ap.add_argument("--concurrency", default="1,2,4,8,16")
+    ap.add_argument("--online-latency", type=float, default=0.2)
+    ap.add_argument("--local-latency", type=float, default=0.5)
+    ap.add_argument("--local-slots", type=int, default=4)
+    ap.add_argument("--engines", default="online,local")
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        make_install(tmp)
+        import router
+        install_stubs(router, args.online_latency, args.local_latency, args.local_slots)
+
+        prompts = [f"bench prompt {i}" for i in range(args.prompts)]
+        rows = []
+        for engine in args.engines.split(","):
+            for c in (int(x) for x in args.concurrency.split(",")):
+                rows.append(run(router, engine, prompts, c))
+                r = rows[-1]
+                print(f"[bench] {engine:<6} c={c:<3} {r['prompts_per_s']:8.1f} prompts/s"
+                      + ("" if r["ordered"] else "  ORDER MISMATCH"), file=sys.stderr)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    print(f"{'engine':<7} {'conc':>5} {'prompts/s':>10} {'seconds':>8} ordered")
+    for r in rows:
+        print(f"{r['engine']:<7} {r['concurrency']:>5} {r['prompts_per_s']:>10.1f} "
+              f"{r['seconds']:>8.2f} {r['ordered']}")
+
+
+if __name__ == "__main__":
+    main()
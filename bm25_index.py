@@ -0,0 +1,124 @@
+# bm25_index.py
+"""
+Pure-Python BM25 inverted index over the retrieval records (bm25.bin).
+Doc id == FAISS id == text_store record id, so lexical and vector hits
+can be fused by id (rrf()). Needs neither faiss nor an embedder: it is
+also the degraded mode when those are unavailable.
+
+Layout (little-endian):
+  header   magic "ATBM" | u32 version | u32 docs | u32 postings | f32 avgdl | u32 vocab_len
+  vocab    utf-8 JSON {term: [offset, df]}  (postings of a term are contiguous)
+  doclen   docs x u32        (0 for tombstoned records)
+  ids      postings x u32
+  weights  postings x f32    BM25 term-frequency part, precomputed:
+                             tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl))
+A query then costs one multiply-add per posting of its terms (x idf).
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import heapq
+import struct
+from array import array
+from collections import Counter, defaultdict
+
+MAGIC = b"ATBM"
+VERSION = 1
+HEADER = struct.Struct("<4sIIIfI")
+
+K1 = 1.2
+B = 0.75
+RRF_C = 60
+
+_WORD = re.compile(r"\w+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by do for from has have i if in is it its me my "
+    "no not of on or so that the this to was we what when with you your".split())
+
+
+def tokenize(text):
+    return [w for w in _WORD.findall(text.lower()) if w not in STOPWORDS]
+
+
+def _native(arr):
+    if sys.byteorder == "big":
+        arr.byteswap()
+    return arr
+
+
+def write_bm25(path, records):
+    """records: sequence of (prompt, response) or None (tombstone), by id."""
+    path = str(path)
+    postings = {}
+    doclen = array("I", [0]) * len(records)
+    for i, rec in enumerate(records):
+        if rec is None:
+            continue
+        tf = Counter(tokenize(rec[0] + " " + rec[1]))
+        doclen[i] = sum(tf.values())
+        for term, n in tf.items():
+            postings.setdefault(term, []).append((i, n))
+
+    live = [d for d in doclen if d]
+    avgdl = sum(live) / len(live) if live else 0.0
+    ids, weights, vocab = array("I"), array("f"), {}
+    for term in sorted(postings):
+        plist = postings[term]
+        vocab[term] = [len(ids), len(plist)]
+        ids.extend(p[0] for p in plist)
+        weights.extend(tf * (K1 + 1) / (tf + K1 * (1 - B + B * doclen[i] / avgdl))
+                       for i, tf in plist)
+    blob = json.dumps(vocab, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(records), len(ids), avgdl, len(blob)))
+        f.write(blob)
+        for arr in (doclen, ids, weights):
+            _native(arr).tofile(f)
+    os.replace(tmp, path)
+
+
+class BM25Index:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            magic, version, self.docs, n, self.avgdl, vlen = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path}: not a BM25 index (v{VERSION})")
+            self.vocab = json.loads(f.read(vlen))
+            self.doclen, self.ids, self.weights = array("I"), array("I"), array("f")
+            for arr, count in ((self.doclen, self.docs), (self.ids, n), (self.weights, n)):
+                arr.fromfile(f, count)
+                _native(arr)
+        self.live = sum(1 for d in self.doclen if d)
+
+    def __len__(self):
+        return self.live
+
+    def search(self, text, k=3):
+        """Top-k (id, score), best first."""
+        terms = [t for t in set(tokenize(text)) if t in self.vocab]
+        if not terms or not self.live:
+            return []
+        # terms in more than half the corpus barely move the ranking but
+        # dominate the cost; keep them only if nothing else matched
+        rare = [t for t in terms if self.vocab[t][1] <= self.live // 2]
+        scores = defaultdict(float)
+        for term in rare or terms:
+            off, df = self.vocab[term]
+            idf = math.log(1 + (self.live - df + 0.5) / (df + 0.5))
+            for i, w in zip(self.ids[off:off + df], self.weights[off:off + df]):
+                scores[i] += idf * w
+        return heapq.nlargest(k, scores.items(), key=lambda kv: kv[1])
+
+
+def rrf(rankings, k=3, c=RRF_C):
+    """Reciprocal-rank fusion of id lists (best first). Returns k ids."""
+    fused = {}
+    for ranking in rankings:
+        for rank, i in enumerate(ranking):
+            fused[i] = fused.get(i, 0.0) + 1.0 / (c + rank + 1)
+    return [i for i, _ in heapq.nlargest(k, fused.items(), key=lambda kv: kv[1])]
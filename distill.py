@@ -1,32 +1,175 @@
 # distill.py
-import json, os, glob
+"""
+Builds distill_dir/supervised_pairs.jsonl from online (teacher) replies.
+Incremental by default: distill_state.json keeps a log_store cursor and
+the dataset size it matches, so each run streams only entries logged
+since the last one and appends their pairs. `--full` rebuilds from the
+whole log.
+
+Log chunks are parsed and SimHashed across a process pool
+(distill_workers, default: all cores). Near-duplicate pairs (prompt +
+response within distill_dedup_distance bits, see near_dup.py) are
+dropped so only the first of each cluster is kept; a negative distance
+keeps everything. pair_sigs.bin holds the kept pairs' signatures and
+pair_bands/ their LSH buckets (near_dup.BandStore), so a run looks up
+earlier pairs without loading them all.
+
+Usage:
+  python3 distill.py [--full] [--workers N]
+"""
+import json, os, time, argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-CFG = json.load(open('/home/piyush/ArcheTYPE/config.json'))
+import state_store
+import log_store
+from near_dup import BandStore, NearDupIndex, simhash
+CFG = state_store.config()
 LOGDIR = Path(os.path.expanduser(CFG['log_dir']))
 OUTDIR = Path(os.path.expanduser(CFG['distill_dir']))
 OUTDIR.mkdir(parents=True, exist_ok=True)
+OUT_PATH = OUTDIR / "supervised_pairs.jsonl"
+SIGS_PATH = OUTDIR / "pair_sigs.bin"
+BANDS_DIR = OUTDIR / "pair_bands"
+STATE_PATH = OUTDIR / "distill_state.json"
+
+WORKERS = int(CFG.get("distill_workers") or os.cpu_count() or 1)
+DEDUP_DISTANCE = int(CFG.get("distill_dedup_distance", 4))
+
+
+def load_state():
+    try:
+        with open(STATE_PATH, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_state(state):
+    tmp = STATE_PATH.with_suffix(".tmp")
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, STATE_PATH)
+
+
+def _parse_chunk(chunk):
+    """Worker: teacher pairs of one log chunk as (json line, simhash)."""
+    pairs, scanned = [], 0
+    for line in log_store.chunk_lines(chunk):
+        scanned += 1
+        try:
+            e = json.loads(line)
+            if e.get('engine') != 'online':
+                # keep only teacher examples
+                continue
+            user, resp = e.get('user'), e.get('response')
+        except (ValueError, AttributeError):
+            continue
+        pair = json.dumps({'prompt': user, 'response': resp}, ensure_ascii=False) + "\n"
+        pairs.append((pair.encode('utf-8'), simhash(f"{user or ''}\n{resp or ''}")))
+    return pairs, scanned
+
+
+def _parsed(chunks, workers):
+    """(result of _parse_chunk, cursor) in log order. At most a few chunks
+    per worker are in flight, so memory does not grow with the backlog."""
+    if workers <= 1:
+        for chunk, cur in chunks:
+            yield _parse_chunk(chunk), cur
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk, cur in chunks:
+            pending.append((pool.submit(_parse_chunk, chunk), cur))
+            if len(pending) >= workers * 4:
+                fut, c = pending.popleft()
+                yield fut.result(), c
+        while pending:
+            fut, c = pending.popleft()
+            yield fut.result(), c
+
+
+def _open_incremental(state):
+    """Dataset + signature files trimmed to the last saved state (drops
+    anything a crashed run appended), or None if they do not match it."""
+    n = state['pairs']
+    try:
+        if SIGS_PATH.stat().st_size < n * 8:
+            return None   # no signatures yet (older dataset): rebuild once
+        fh, sh = open(OUT_PATH, 'r+b'), open(SIGS_PATH, 'r+b')
+    except OSError:
+        return None
+    fh.truncate(state['bytes'])
+    fh.seek(state['bytes'])
+    sh.truncate(n * 8)
+    sh.seek(n * 8)
+    bands = BandStore(BANDS_DIR, SIGS_PATH)
+    bands.sync(n)
+    return fh, sh, NearDupIndex(DEDUP_DISTANCE, bands)
+
+
+def build_dataset(full=False, workers=WORKERS):
+    # compress last night's closed segments, then read blocks + open segment
+    log_store.seal()
+    t0 = time.perf_counter()
+    state = None if full else load_state()
+    opened = _open_incremental(state) if state else None
+    full = opened is None
+
+    if full:
+        # build aside, swap in at the end: readers never see a half dataset
+        out_tmp, sigs_tmp = OUT_PATH.with_suffix(".jsonl.tmp"), SIGS_PATH.with_suffix(".bin.tmp")
+        fh, sh, dedup = open(out_tmp, 'wb'), open(sigs_tmp, 'wb'), NearDupIndex(DEDUP_DISTANCE)
+        cursor, total = None, 0
+    else:
+        fh, sh, dedup = opened
+        cursor, total = state['cursor'], state['pairs']
+
+    seen, added, scanned = 0, 0, 0
+    with fh, sh:
+        for (pairs, n), cur in _parsed(log_store.iter_chunks(cursor), workers):
+            cursor = cur
+            scanned += n
+            for line, sig in pairs:
+                seen += 1
+                if dedup.add_if_new(sig):
+                    fh.write(line)
+                    added += 1
+        dedup.sigs.tofile(sh)   # this run's pairs only
+        for f in (fh, sh):
+            f.flush()
+            os.fsync(f.fileno())
+        size = fh.tell()
+    bands = dedup.store or BandStore(BANDS_DIR, SIGS_PATH)
+    if full:
+        bands.clear()
+        os.replace(sigs_tmp, SIGS_PATH)
+        os.replace(out_tmp, OUT_PATH)
+    # this run's pairs become a segment; past the saved state if we crash
+    # before _save_state, so the next run drops it again
+    bands.sync(total + added)
+    bands.close()
+
+    stats = {'entries': scanned, 'online': seen, 'kept': added,
+             'ratio': round(seen / added, 3) if added else None,
+             'seconds': round(time.perf_counter() - t0, 3), 'workers': workers, 'full': full}
+    _save_state({'cursor': cursor, 'pairs': total + added, 'bytes': size,
+                 'updated': int(time.time()), 'last_run': stats})
+    print(f"Saved {added} new pairs ({total + added} total) to {OUT_PATH}"
+          f"{' [full rebuild]' if full else ''}")
+    print(f"  {scanned} entries read, {seen} teacher pairs, "
+          f"{seen - added} near-duplicates dropped"
+          + (f", compression {stats['ratio']:.2f}x" if added else "")
+          + f", {stats['seconds']:.2f}s on {workers} worker(s)")
+    return stats
 
-def build_dataset():
-    files = sorted(LOGDIR.glob("*.jsonl"))
-    pairs = []
-    for f in files:
-        for line in open(f, encoding='utf-8'):
-            try:
-                e = json.loads(line)
-                user = e.get('user')
-                resp = e.get('response')
-                engine = e.get('engine')
-                if engine == 'online':
-                    # keep only teacher examples
-                    pairs.append({'prompt': user, 'response': resp})
-            except:
-                pass
-    # write newline-separated JSON pairs
-    out = OUTDIR / "supervised_pairs.jsonl"
-    with open(out, 'w', encoding='utf-8') as fh:
-        for p in pairs:
-            fh.write(json.dumps(p, ensure_ascii=False) + "\n")
-    print(f"Saved {len(pairs)} pairs to {out}")
 
 if __name__ == '__main__':
-    build_dataset()
+    ap = argparse.ArgumentParser(description="Distill teacher replies into supervised pairs.")
+    ap.add_argument("--full", action="store_true",
+                    help="rebuild the dataset from the whole log instead of appending")
+    ap.add_argument("--workers", type=int, default=WORKERS)
+    args = ap.parse_args()
+    build_dataset(full=args.full, workers=args.workers)
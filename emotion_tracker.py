@@ -0,0 +1,182 @@
+# emotion_tracker.py
+"""
+Rolling emotion signal over agent_state/memory.jsonl for the router's
+state packet.
+- Keeps a byte offset into the file and only reads what was appended
+  since the last update: O(new bytes) per update, O(1) per query.
+- Keyword hits are counted per emotion and decay exponentially with the
+  age of the entry (half-life), so old entries fade out.
+- Offset + counters persist to agent_state/emotion_state.json, so a new
+  process resumes instead of rescanning the file. With no saved state
+  only the last INITIAL_TAIL_BYTES are read.
+- Truncation / rotation (inode change, file shrank) resets the state.
+"""
+
+import os
+import re
+import json
+import math
+import time
+import threading
+from datetime import datetime
+
+import state_store
+
+CFG = state_store.config()
+
+HALF_LIFE_S = float(CFG.get("emotion_half_life_s", 6 * 3600))
+MIN_SCORE = float(CFG.get("emotion_min_score", 0.5))
+INITIAL_TAIL_BYTES = 1 << 20
+
+# checked in this order; the first emotion over MIN_SCORE wins
+KEYWORDS = {
+    "fatigue": ("tired", "exhausted"),
+    "frustration": ("stuck",),
+    "drive": ("win", "locked in"),
+}
+
+_EMOTION_OF = {w: emo for emo, words in KEYWORDS.items() for w in words}
+# one pass per line, whole words only: "win" must not match every
+# "active_window=" observation
+_PATTERN = re.compile(r"\b(" + "|".join(re.escape(w) for w in _EMOTION_OF) + r")\b")
+
+
+# agent_core writes "ts" as the last key; no need to json-parse the entry
+_TS = re.compile(r'"ts":\s*"([^"]+)"')
+
+
+def _entry_time(line, default):
+    m = _TS.search(line)
+    if not m:
+        return default
+    try:
+        return datetime.fromisoformat(m.group(1)).timestamp()
+    except ValueError:
+        return default
+
+
+class EmotionTracker:
+    def __init__(self, path, state_path, half_life_s=HALF_LIFE_S, min_score=MIN_SCORE):
+        self.path = str(path)
+        self.state_path = str(state_path)
+        self.decay = math.log(2) / half_life_s
+        self.min_score = min_score
+        self._lock = threading.Lock()
+        self._state = self._load_state()
+
+    # ---------------------------------------------------
+    # STATE
+    # ---------------------------------------------------
+    @staticmethod
+    def _empty():
+        # scores are stored as of "at" and decayed forward on read
+        return {"inode": None, "offset": 0, "at": 0.0,
+                "scores": {emo: 0.0 for emo in KEYWORDS}}
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                st = json.load(f)
+            if set(st.get("scores", {})) == set(KEYWORDS):
+                return st
+        except (OSError, ValueError):
+            pass
+        return self._empty()
+
+    def _save_state(self):
+        tmp = self.state_path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._state, f)
+            os.replace(tmp, self.state_path)
+        except OSError:
+            pass
+
+    def _decayed(self, now):
+        factor = math.exp(-self.decay * max(0.0, now - self._state["at"]))
+        return {emo: s * factor for emo, s in self._state["scores"].items()}
+
+    # ---------------------------------------------------
+    # UPDATE
+    # ---------------------------------------------------
+    def update(self):
+        """Fold entries appended since the last call into the counters."""
+        with self._lock:
+            try:
+                st = os.stat(self.path)
+            except OSError:
+                return
+            state = self._state
+            start = 0
+            if state["inode"] != st.st_ino or st.st_size < state["offset"]:
+                self._state = state = self._empty()
+                state["inode"] = st.st_ino
+                state["offset"] = max(0, st.st_size - INITIAL_TAIL_BYTES)
+                # starting mid-file → skip the cut-off first line
+                start = None if state["offset"] else 0
+            if st.st_size == state["offset"]:
+                return
+
+            with open(self.path, "rb") as f:
+                f.seek(state["offset"])
+                data = f.read(st.st_size - state["offset"])
+
+            if start is None:
+                start = data.find(b"\n") + 1
+            # a partial last line is left for the next update
+            end = data.rfind(b"\n") + 1
+            if end <= start:
+                return
+
+            now = time.time()
+            scores = self._decayed(now)
+            for line in data[start:end].splitlines():
+                if not line.strip():
+                    continue
+                raw = line.decode("utf-8", "replace")
+                text = raw.lower()
+                words = _PATTERN.findall(text)
+                if not words:
+                    continue
+                weight = math.exp(-self.decay * max(0.0, now - _entry_time(raw, now)))
+                for w in words:
+                    scores[_EMOTION_OF[w]] += weight
+
+            state["scores"], state["at"] = scores, now
+            state["offset"] += end
+            self._save_state()
+
+    # ---------------------------------------------------
+    # QUERY
+    # ---------------------------------------------------
+    def scores(self):
+        with self._lock:
+            return self._decayed(time.time())
+
+    def current(self):
+        """Dominant recent emotion, or "neutral"."""
+        self.update()
+        scores = self.scores()
+        for emo in KEYWORDS:
+            if scores[emo] >= self.min_score:
+                return emo
+        return "neutral"
+
+
+_tracker = None
+
+
+def tracker():
+    global _tracker
+    if _tracker is None:
+        state_dir = state_store.ROOT / "agent_state"
+        _tracker = EmotionTracker(state_dir / "memory.jsonl",
+                                  state_dir / "emotion_state.json")
+    return _tracker
+
+
+def current_emotion():
+    try:
+        return tracker().current()
+    except Exception:
+        return "neutral"
@@ -54,6 +54,12 @@ def try_parse_command(text: str):
     # score dashboard
     if t in ("flow score", "show score"):
         return score_dashboard()
+
+    # online engine reachability + circuit breaker
+    if t in ("engine status", "status engine"):
+        import json
+        import engine_health
+        return json.dumps(engine_health.status(), indent=2)
     
 
     return None
@@ -0,0 +1,161 @@
+# engine_health.py
+"""
+Online-engine health for router.choose_engine.
+- Reachability of the online API host, cached with a TTL and refreshed
+  in the background, so engine choice never waits on a TCP connect
+  (except the very first probe of a process).
+- A circuit breaker over recent online-call outcomes:
+    closed     → calls flow, failures counted in a sliding window
+    open       → calls skipped until reset_timeout passes
+    half_open  → one trial call; success closes, failure re-opens
+  Transitions are printed and kept in history; see status().
+"""
+
+import time
+import socket
+import threading
+from collections import deque
+from urllib.parse import urlparse
+
+import state_store
+
+CFG = state_store.config()
+
+_url = urlparse(CFG.get("online_api_url", "https://api.groq.com/openai/v1/chat/completions"))
+PROBE_HOST = _url.hostname
+PROBE_PORT = _url.port or (443 if _url.scheme == "https" else 80)
+
+REACH_TTL = float(CFG.get("online_reach_ttl_s", 30))
+UNREACH_TTL = float(CFG.get("online_unreach_ttl_s", 5))
+
+
+# -------------------------------------------------------
+# REACHABILITY
+# -------------------------------------------------------
+_reach = {"ok": None, "checked": 0.0}
+_probe_lock = threading.Lock()
+
+
+def _probe():
+    try:
+        socket.create_connection((PROBE_HOST, PROBE_PORT), timeout=1).close()
+        ok = True
+    except OSError:
+        ok = False
+    _reach["ok"], _reach["checked"] = ok, time.monotonic()
+    return ok
+
+
+def _probe_in_background():
+    if not _probe_lock.acquire(blocking=False):
+        return   # a probe is already running
+    def run():
+        try:
+            _probe()
+        finally:
+            _probe_lock.release()
+    threading.Thread(target=run, daemon=True).start()
+
+
+def internet_available():
+    ok = _reach["ok"]
+    if ok is None:
+        with _probe_lock:
+            return _probe() if _reach["ok"] is None else _reach["ok"]
+    ttl = REACH_TTL if ok else UNREACH_TTL
+    if time.monotonic() - _reach["checked"] > ttl:
+        _probe_in_background()   # answer from cache now, refresh for next time
+    return ok
+
+
+def mark_unreachable():
+    _reach["ok"], _reach["checked"] = False, time.monotonic()
+
+
+# -------------------------------------------------------
+# CIRCUIT BREAKER
+# -------------------------------------------------------
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name, failure_threshold=3, window_s=60.0, reset_timeout_s=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.window_s = window_s
+        self.reset_timeout_s = reset_timeout_s
+        self.state = self.CLOSED
+        self._failures = deque()
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._trial_started = 0.0
+        self._lock = threading.Lock()
+        self.history = deque(maxlen=50)
+
+    def _transition(self, new, reason):
+        old, self.state = self.state, new
+        self.history.append({"ts": time.time(), "from": old, "to": new, "reason": reason})
+        print(f"[breaker] {self.name}: {old} → {new} ({reason})")
+
+    def allow(self):
+        """True if a call may go through now. In half_open only one trial
+        call is let through until its outcome is recorded."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout_s:
+                    return False
+                self._transition(self.HALF_OPEN, "reset timeout elapsed")
+            # a trial whose outcome never got recorded must not wedge the breaker
+            if self._trial_in_flight and \
+                    time.monotonic() - self._trial_started < self.reset_timeout_s:
+                return False
+            self._trial_in_flight = True
+            self._trial_started = time.monotonic()
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._trial_in_flight = False
+            self._failures.clear()
+            if self.state != self.CLOSED:
+                self._transition(self.CLOSED, "trial call succeeded")
+
+    def record_failure(self, reason="call failed"):
+        with self._lock:
+            self._trial_in_flight = False
+            now = time.monotonic()
+            if self.state == self.HALF_OPEN:
+                self._opened_at = now
+                self._transition(self.OPEN, f"trial failed: {reason}")
+                return
+            self._failures.append(now)
+            while self._failures and now - self._failures[0] > self.window_s:
+                self._failures.popleft()
+            if self.state == self.CLOSED and len(self._failures) >= self.failure_threshold:
+                self._opened_at = now
+                self._transition(self.OPEN, f"{len(self._failures)} failures in "
+                                            f"{self.window_s:.0f}s, last: {reason}")
+
+    def status(self):
+        with self._lock:
+            st = {"name": self.name, "state": self.state,
+                  "recent_failures": len(self._failures),
+                  "history": list(self.history)}
+            if self.state == self.OPEN:
+                st["retry_in_s"] = max(0.0, self.reset_timeout_s -
+                                       (time.monotonic() - self._opened_at))
+            return st
+
+
+ONLINE = CircuitBreaker(
+    "online",
+    failure_threshold=int(CFG.get("breaker_failure_threshold", 3)),
+    window_s=float(CFG.get("breaker_window_s", 60)),
+    reset_timeout_s=float(CFG.get("breaker_reset_timeout_s", 30)),
+)
+
+
+def status():
+    age = time.monotonic() - _reach["checked"] if _reach["ok"] is not None else None
+    return {"reachable": _reach["ok"], "checked_age_s": age, "breaker": ONLINE.status()}
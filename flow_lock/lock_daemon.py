@@ -1,5 +1,5 @@
 #!/usr/bin/env python3
-import os, sys, time, json, psutil, subprocess
+import os, sys, time, json, threading, subprocess
 from datetime import datetime, date
 
 # Ensure root import
@@ -7,12 +7,13 @@ ROOT = os.path.expanduser("~/ArcheTYPE")
 if ROOT not in sys.path:
     sys.path.insert(0, ROOT)
 
-from router import archetype_respond
+from archetype_client import respond as archetype_respond, intent as run_intent
 
 BASE = os.path.expanduser("~/ArcheTYPE/flow_lock")
 STATE = os.path.join(BASE, "state.json")
 PROFILES_DIR = os.path.join(BASE, "profiles")
 CHECK_INTERVAL = 3
+IDLE_CACHE_TTL = 30 * 60   # same idle correction reused for one idle stretch
 
 # ------------------------------
 # CLEAN LOG: PRINT ONLY
@@ -119,6 +120,7 @@ def enforce(profile):
     whitelist = [x.lower() for x in profile.get("whitelist", [])]
     violations = []
 
+    import psutil   # loaded on first enforcement pass, not at import
     for p in psutil.process_iter(["name", "cmdline", "pid"]):
         name = (p.info["name"] or "").lower()
         cmd = " ".join(p.info["cmdline"] or []).lower()
@@ -166,15 +168,14 @@ def flow_lock():
         # NEW: trigger intents when entering a profile for the first time
         if st.get("current_profile") != last_profile:
             last_profile = st.get("current_profile")
-            try:
-                subprocess.Popen([
-                    "/usr/bin/python3",
-                    os.path.expanduser("~/ArcheTYPE/archetype_intent.py"),
-                    f"prepare {last_profile} mode"
-                ])
-                log(f"Intent triggered for profile {last_profile}")
-            except Exception as e:
-                log(f"[intent error] {e}")
+            # via the resident daemon when up; no interpreter per trigger
+            def trigger(profile=last_profile):
+                try:
+                    run_intent(f"prepare {profile} mode")
+                except Exception as e:
+                    log(f"[intent error] {e}")
+            threading.Thread(target=trigger, daemon=True).start()
+            log(f"Intent triggered for profile {last_profile}")
 
 
         profname = st.get("current_profile", "strict")
@@ -188,7 +189,8 @@ def flow_lock():
         idle_ms = get_idle_ms()
         if idle_ms >= profile.get("idle_limit_minutes", 10) * 60000:
             log("Idle detected.")
-            resp = archetype_respond(f"Idle detected under profile {profname}.")
+            resp = archetype_respond(f"Idle detected under profile {profname}.",
+                                     cache_ttl=IDLE_CACHE_TTL)
             log("Correction: " + resp)
             time.sleep(20)
             continue
@@ -0,0 +1,89 @@
+# index_gen.py
+"""
+Versioned retrieval index generations.
+  distill_dir/index/gen-000042/   faiss.index, faiss.index.meta.json, index_texts.bin,
+                                  bm25.bin
+                                  [vectors.f32 when faiss_rerank is on]
+  distill_dir/index/current  ->   gen-000042
+A generation is written in full, then published by renaming a fresh
+symlink over `current` (atomic), and never modified afterwards. Readers
+resolve `current` once per load and read every file from that directory,
+so they always get a matching index / text map pair, with no downtime.
+The newest index_generations_keep generations are kept (default 3); an
+older one may still be open by a reader, which is fine on POSIX.
+"""
+
+import os
+import shutil
+from pathlib import Path
+
+import state_store
+
+CFG = state_store.config()
+GEN_ROOT = Path(os.path.expanduser(CFG['distill_dir'])) / "index"
+CURRENT = GEN_ROOT / "current"
+KEEP = int(CFG.get("index_generations_keep", 3))
+
+FAISS_NAME = "faiss.index"
+META_NAME = FAISS_NAME + ".meta.json"
+TEXTS_NAME = "index_texts.bin"
+BM25_NAME = "bm25.bin"
+VECTORS_NAME = "vectors.f32"   # fp32 rows for exact re-rank (hard link into the embed store)
+
+
+def current():
+    """Directory of the published generation, or None."""
+    try:
+        target = os.readlink(CURRENT)
+    except OSError:
+        return None
+    gen = GEN_ROOT / target
+    return gen if gen.is_dir() else None
+
+
+def generations():
+    """All generation directories, oldest first."""
+    if not GEN_ROOT.exists():
+        return []
+    return sorted(p for p in GEN_ROOT.glob("gen-*") if p.is_dir() and not p.name.endswith(".tmp"))
+
+
+def new_generation():
+    """Empty staging directory for the next generation (not yet visible)."""
+    GEN_ROOT.mkdir(parents=True, exist_ok=True)
+    gens = generations()
+    n = int(gens[-1].name[4:]) + 1 if gens else 1
+    staging = GEN_ROOT / f"gen-{n:06d}.tmp"
+    if staging.exists():
+        shutil.rmtree(staging)   # left over from a crashed build
+    staging.mkdir()
+    return staging
+
+
+def publish(staging):
+    """fsync the staged files, name the generation and point `current` at it."""
+    for p in staging.iterdir():
+        with open(p, "rb") as f:
+            os.fsync(f.fileno())
+    gen = staging.with_name(staging.name[:-len(".tmp")])
+    os.rename(staging, gen)
+    link = GEN_ROOT / "current.tmp"
+    if os.path.lexists(link):
+        link.unlink()
+    os.symlink(gen.name, link)   # relative: the tree can move
+    os.replace(link, CURRENT)
+    fd = os.open(GEN_ROOT, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    prune()
+    return gen
+
+
+def prune(keep=None):
+    keep = KEEP if keep is None else keep
+    live = current()
+    for gen in generations()[:-max(keep, 1)]:
+        if gen != live:
+            shutil.rmtree(gen, ignore_errors=True)
@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+# log_store.py
+"""
+Compressed, indexed archive of the interaction log.
+- seal() turns every closed segment (logger.py) into one block file in
+  log_dir/blocks/: independent compressed frames of up to FRAME_ENTRIES
+  entries (zstd if the `zstandard` package is installed, zlib otherwise).
+- blocks/index.jsonl has one line per frame:
+    {"src", "file", "off", "len", "codec", "t0", "t1", "n", "engines"}
+  so a query reads only the frames whose time range and engines match.
+- query() / iter_entries() cover the blocks plus the still-open
+  segment(s) and any per-call files that were never migrated. A query
+  with a limit walks the index newest-first (iter_newest) and stops
+  decoding once it has enough entries.
+- iter_chunks(cursor) resumes after a saved position, sealed or not,
+  in chunks that can be parsed in parallel.
+
+Usage:
+  python3 log_store.py seal
+  python3 log_store.py query [--since 7d] [--until 2025-01-31] [--engine online]
+                             [--grep text] [--limit 20] [--json]
+  (arche logs ... runs `query`)
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import fcntl
+import argparse
+from itertools import islice
+from datetime import datetime, timedelta
+
+import logger
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+BLOCK_DIR = logger.LOGDIR / "blocks"
+INDEX_PATH = BLOCK_DIR / "index.jsonl"
+
+FRAME_ENTRIES = 512
+FRAME_BYTES = 4 << 20
+
+
+# -------------------------------------------------------
+# CODECS
+# -------------------------------------------------------
+def _compress(raw):
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=10).compress(raw)
+    return "zlib", zlib.compress(raw, 9)
+
+
+def _decompress(codec, data):
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("block written with zstd; pip install zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"unknown codec {codec}")
+
+
+# -------------------------------------------------------
+# INDEX
+# -------------------------------------------------------
+_index_cache = {"sig": None, "frames": []}
+
+
+def load_index():
+    try:
+        st = os.stat(INDEX_PATH)
+    except OSError:
+        return []
+    sig = (st.st_mtime_ns, st.st_size)
+    if _index_cache["sig"] != sig:
+        frames = []
+        with open(INDEX_PATH, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    frames.append(json.loads(line))
+                except ValueError:
+                    continue   # torn line from an interrupted seal
+        _index_cache.update(sig=sig, frames=frames)
+    return _index_cache["frames"]
+
+
+# -------------------------------------------------------
+# SEAL
+# -------------------------------------------------------
+def _frames(lines):
+    frame, size = [], 0
+    for line in lines:
+        frame.append(line)
+        size += len(line)
+        if len(frame) >= FRAME_ENTRIES or size >= FRAME_BYTES:
+            yield frame
+            frame, size = [], 0
+    if frame:
+        yield frame
+
+
+def _seal_segment(seg):
+    lines = [l if l.endswith(b"\n") else l + b"\n"
+             for l in seg.read_bytes().splitlines() if l.strip()]
+    name = seg.stem.replace("seg-", "blk-", 1) + ".blk"
+    index_lines = []
+    with open(BLOCK_DIR / name, "wb") as out:
+        for frame in _frames(lines):
+            ts, engines = [], set()
+            for l in frame:
+                try:
+                    e = json.loads(l)
+                except ValueError:
+                    continue
+                ts.append(int(e.get("ts") or 0))
+                engines.add(e.get("engine") or "")
+            codec, data = _compress(b"".join(frame))
+            index_lines.append({
+                "src": seg.name, "file": name, "off": out.tell(), "len": len(data),
+                "codec": codec, "t0": min(ts, default=0), "t1": max(ts, default=0),
+                "n": len(frame), "engines": sorted(engines),
+            })
+            out.write(data)
+        out.flush()
+        os.fsync(out.fileno())
+    _append_index(index_lines)
+    return len(lines)
+
+
+def _append_index(rows):
+    """Replace the index with a copy that has `rows` appended: after a
+    crash it lists all of a segment's frames or none, so seal() never
+    unlinks a segment whose records are only partly indexed."""
+    try:
+        old = INDEX_PATH.read_bytes()
+    except FileNotFoundError:
+        old = b""
+    if old and not old.endswith(b"\n"):
+        old += b"\n"   # torn line from an append-mode index (older seals)
+    tmp = INDEX_PATH.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        f.write(old + "".join(json.dumps(row) + "\n" for row in rows).encode("utf-8"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, INDEX_PATH)
+    dfd = os.open(BLOCK_DIR, os.O_RDONLY)
+    try:
+        os.fsync(dfd)   # the rename is durable before the segment goes
+    finally:
+        os.close(dfd)
+
+
+def seal():
+    """Compress every segment except the active one. Returns entries sealed."""
+    segs = logger.segments()
+    if len(segs) < 2:
+        return 0
+    BLOCK_DIR.mkdir(parents=True, exist_ok=True)
+    total = 0
+    with open(logger.LOCK_PATH, "a") as lock:
+        # writers append under the same lock; none can be mid-write to a
+        # segment we remove, and they reopen by name on their next flush
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        done = {row["src"] for row in load_index()}
+        for seg in logger.segments()[:-1]:
+            if seg.name not in done:   # else: indexed before a crash, just remove
+                total += _seal_segment(seg)
+            seg.unlink()
+    return total
+
+
+# -------------------------------------------------------
+# QUERY
+# -------------------------------------------------------
+def _match(e, since, until, engine):
+    ts = int(e.get("ts") or 0)
+    if since is not None and ts < since:
+        return False
+    if until is not None and ts > until:
+        return False
+    if engine and e.get("engine") != engine:
+        return False
+    return True
+
+
+def _parse_lines(raw_lines, since, until, engine, needle):
+    for line in raw_lines:
+        if needle and needle not in line.lower():
+            continue
+        try:
+            e = json.loads(line)
+        except ValueError:
+            continue
+        if _match(e, since, until, engine):
+            yield e
+
+
+def _frame_wanted(fr, since, until, engine):
+    if since is not None and fr["t1"] < since:
+        return False
+    if until is not None and fr["t0"] > until:
+        return False
+    return not engine or engine in fr["engines"]
+
+
+def iter_entries(since=None, until=None, engine=None, contains=None):
+    """Matching entries, oldest first. since/until: unix seconds;
+    contains: case-insensitive substring of the raw entry."""
+    needle = contains.lower().encode("utf-8") if contains else None
+    handles = {}
+    try:
+        for fr in load_index():
+            if not _frame_wanted(fr, since, until, engine):
+                continue
+            f = handles.get(fr["file"])
+            if f is None:
+                f = handles[fr["file"]] = open(BLOCK_DIR / fr["file"], "rb")
+            f.seek(fr["off"])
+            raw = _decompress(fr["codec"], f.read(fr["len"]))
+            if needle and needle not in raw.lower():
+                continue
+            yield from _parse_lines(raw.splitlines(), since, until, engine, needle)
+    finally:
+        for f in handles.values():
+            f.close()
+
+    # not yet sealed: per-call files, then open segments
+    sealed = {fr["src"] for fr in load_index()}
+    for path in logger.legacy_files() + logger.segments():
+        if path.name in sealed:
+            continue
+        with open(path, "rb") as f:
+            yield from _parse_lines(f, since, until, engine, needle)
+
+
+def iter_newest(since=None, until=None, engine=None, contains=None):
+    """Matching entries, newest first. Frames are decoded from the end of
+    the index only as far as the caller reads."""
+    needle = contains.lower().encode("utf-8") if contains else None
+    for name, frames, path in reversed(_sources()):
+        if frames is None:
+            with open(path, "rb") as f:
+                lines = f.readlines()
+            yield from _parse_lines(reversed(lines), since, until, engine, needle)
+            continue
+        with open(BLOCK_DIR / frames[0]["file"], "rb") as f:
+            for fr in reversed(frames):
+                if not _frame_wanted(fr, since, until, engine):
+                    continue
+                f.seek(fr["off"])
+                raw = _decompress(fr["codec"], f.read(fr["len"]))
+                if needle and needle not in raw.lower():
+                    continue
+                yield from _parse_lines(reversed(raw.splitlines()), since, until, engine, needle)
+
+
+# -------------------------------------------------------
+# CURSOR (incremental readers, e.g. distill)
+# -------------------------------------------------------
+def _source_key(name):
+    # per-call <ms>.jsonl and seg-<ms>*.jsonl interleave by start time
+    stem = name.split(".", 1)[0]
+    try:
+        return (int(stem if stem.isdigit() else stem[4:19]), name)
+    except ValueError:
+        return (0, name)
+
+
+def _sources():
+    """[(name, frames, path)] in log order: frames of a sealed source (path
+    None), or the unsealed file (frames None)."""
+    sealed = {}
+    for fr in load_index():
+        sealed.setdefault(fr["src"], []).append(fr)
+    files = {p.name: p for p in logger.legacy_files() + logger.segments()}
+    return [(name, sealed.get(name), None if name in sealed else files[name])
+            for name in sorted(set(sealed) | set(files), key=_source_key)]
+
+
+def chunk_lines(chunk):
+    """Raw JSON lines of a chunk from iter_chunks (safe in a worker process)."""
+    raw = chunk["data"] if chunk["codec"] is None else _decompress(chunk["codec"], chunk["data"])
+    return raw.splitlines()[chunk["skip"]:]
+
+
+def _sealed_chunks(name, frames, skip):
+    n = 0
+    with open(BLOCK_DIR / frames[0]["file"], "rb") as f:
+        for fr in frames:
+            if n + fr["n"] > skip:   # else already consumed: not even read
+                f.seek(fr["off"])
+                yield ({"codec": fr["codec"], "data": f.read(fr["len"]), "skip": max(0, skip - n)},
+                       {"src": name, "n": n + fr["n"], "off": None})
+            n += fr["n"]
+
+
+def _file_chunks(name, path, skip, off, max_lines):
+    # segments may be mid-append: stop at a line without "\n"
+    partial_ok = not name.startswith("seg-")
+    n = 0
+    buf = []
+    with open(path, "rb") as f:
+        if off is not None:
+            f.seek(off)
+            n = skip
+        pos = f.tell()
+        for line in f:
+            if not line.endswith(b"\n"):
+                if not partial_ok:
+                    break
+                line += b"\n"
+            pos += len(line)
+            if not line.strip():
+                continue
+            n += 1
+            if n <= skip:
+                continue
+            buf.append(line)
+            if len(buf) >= max_lines:
+                yield {"codec": None, "data": b"".join(buf), "skip": 0}, \
+                    {"src": name, "n": n, "off": pos}
+                buf = []
+    if buf:
+        yield {"codec": None, "data": b"".join(buf), "skip": 0}, {"src": name, "n": n, "off": pos}
+
+
+def iter_chunks(cursor=None, max_lines=FRAME_ENTRIES):
+    """Yield (chunk, cursor) for everything after `cursor`, oldest first.
+    A chunk is one sealed frame (still compressed) or up to max_lines raw
+    lines of an unsealed file; decode it with chunk_lines(), possibly in
+    another process. A cursor is {"src", "n", "off"}: the source (segment
+    name) and how many of its lines are consumed once this chunk is; it
+    stays valid after that segment is sealed."""
+    cursor = cursor or {}
+    done = _source_key(cursor["src"]) if cursor.get("src") else None
+    for name, frames, path in _sources():
+        key = _source_key(name)
+        if done is not None and key < done:
+            continue
+        skip = cursor.get("n", 0) if key == done else 0
+        if frames is not None:
+            yield from _sealed_chunks(name, frames, skip)
+        else:
+            off = cursor.get("off") if key == done else None
+            yield from _file_chunks(name, path, skip, off, max_lines)
+
+
+def parse_time(text, end=False):
+    """ISO date/datetime, or relative: 90m, 12h, 7d, 2w (ago). Raises
+    ValueError."""
+    if text is None:
+        return None
+    units = {"m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+    if text[-1:] in units and text[:-1].isdigit():
+        return int(time.time() - int(text[:-1]) * units[text[-1]])
+    dt = datetime.fromisoformat(text)
+    if end and len(text) == 10:
+        dt += timedelta(days=1) - timedelta(seconds=1)   # whole day
+    return int(dt.timestamp())
+
+
+def query(since=None, until=None, engine=None, contains=None, limit=20):
+    """The newest `limit` matching entries (oldest first); limit 0 = all.
+    With a limit only the newest frames are decoded."""
+    if not limit:
+        return list(iter_entries(since, until, engine, contains))
+    it = iter_newest(since, until, engine, contains)
+    try:
+        out = list(islice(it, limit))
+    finally:
+        it.close()
+    out.reverse()
+    return out
+
+
+def _print_entry(e):
+    ts = datetime.fromtimestamp(int(e.get("ts") or 0)).isoformat(sep=" ")
+    print(f"── {ts}  [{e.get('engine')}]")
+    print(f"USER: {e.get('user')}")
+    print(f"{(e.get('response') or '').strip()}\n")
+
+
+def _time_arg(end=False):
+    # argparse type=: a bad value becomes a usage error, not a traceback
+    def parse(text):
+        try:
+            return parse_time(text, end)
+        except ValueError:
+            raise argparse.ArgumentTypeError(
+                f"{text!r}: expected an ISO date/time or 90m / 12h / 7d / 2w") from None
+    return parse
+
+
+def main(argv):
+    ap = argparse.ArgumentParser(prog="arche logs")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("seal", help="compress closed segments into indexed blocks")
+    q = sub.add_parser("query", help="search the interaction log")
+    q.add_argument("--since", type=_time_arg(), help="ISO date/time or 90m / 12h / 7d / 2w")
+    q.add_argument("--until", type=_time_arg(end=True))
+    q.add_argument("--engine", choices=["online", "local", "cache"])
+    q.add_argument("--grep", help="case-insensitive substring")
+    q.add_argument("--limit", type=int, default=20, help="newest N (0 = all)")
+    q.add_argument("--json", action="store_true")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "seal":
+        print(f"[log_store] sealed {seal()} entries")
+        return
+
+    t0 = time.perf_counter()
+    rows = query(args.since, args.until, args.engine, args.grep, args.limit)
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+    else:
+        for e in rows:
+            _print_entry(e)
+        print(f"[{len(rows)} entries, {(time.perf_counter() - t0) * 1000:.0f} ms]",
+              file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,13 +1,201 @@
 # logger.py
-import json, os, time
+"""
+Interaction log: append-only JSONL segments under log_dir/segments/.
+- log_interaction() buffers in memory; a background thread flushes every
+  log_flush_s (and at exit), fsyncing at most every log_fsync_s.
+  A crash can lose at most the last flush interval.
+- Any number of processes may write: each flush appends under an
+  exclusive flock on segments/.lock, so lines never interleave.
+- The active segment is the newest seg-<start ms>.jsonl; it rotates past
+  log_segment_bytes or log_segment_age_s.
+- Older installs wrote one <ms>.jsonl per call directly in log_dir;
+  `python3 logger.py migrate` folds those into segments.
+Closed segments are compressed and read back by log_store.py.
+"""
+import json, os, sys, time, fcntl, atexit, threading
 from pathlib import Path
-CFG = json.load(open('/home/piyush/ArcheTYPE/config.json'))
+import state_store
+CFG = state_store.config()
 LOGDIR = Path(os.path.expanduser(CFG['log_dir']))
-LOGDIR.mkdir(parents=True, exist_ok=True)
+SEGMENT_DIR = LOGDIR / "segments"
+LOCK_PATH = SEGMENT_DIR / ".lock"
+
+FLUSH_S = float(CFG.get("log_flush_s", 1.0))
+FSYNC_S = float(CFG.get("log_fsync_s", 5.0))
+SEGMENT_BYTES = int(CFG.get("log_segment_bytes", 64 << 20))
+SEGMENT_AGE_S = float(CFG.get("log_segment_age_s", 24 * 3600))
+BUFFER_MAX = 256   # flush early when this many entries are waiting
+
+
+def _segment_name(start_ms, suffix=""):
+    # fixed width → lexical order == time order
+    return f"seg-{start_ms:015d}{suffix}.jsonl"
+
+
+def _segment_start_ms(path):
+    try:
+        return int(path.name[4:19])
+    except ValueError:
+        return 0
+
+
+def segments():
+    """All segment files, oldest first."""
+    if not SEGMENT_DIR.exists():
+        return []
+    return sorted(SEGMENT_DIR.glob("seg-*.jsonl"))
+
+
+class _SegmentWriter:
+    def __init__(self):
+        self._buf = []
+        self._lock = threading.Lock()      # guards _buf
+        self._io_lock = threading.Lock()   # guards the fd (flush thread vs exit)
+        self._wake = threading.Event()
+        self._fd = None
+        self._fd_path = None
+        self._last_fsync = time.monotonic()
+        self._thread = None
+
+    def append(self, line):
+        with self._lock:
+            self._buf.append(line)
+            n = len(self._buf)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        if n >= BUFFER_MAX:
+            self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(FLUSH_S)
+            self._wake.clear()
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"[logger] flush failed: {e}", file=sys.stderr)
+
+    def _active_segment(self, now_ms):
+        segs = segments()
+        if segs:
+            cur = segs[-1]
+            try:
+                size = cur.stat().st_size
+            except OSError:
+                size = 0
+            if size < SEGMENT_BYTES and \
+                    now_ms - _segment_start_ms(cur) < SEGMENT_AGE_S * 1000:
+                return cur
+        return SEGMENT_DIR / _segment_name(now_ms)
+
+    def flush(self, fsync=False):
+        with self._io_lock:
+            self._flush(fsync)
+
+    def _flush(self, fsync):
+        with self._lock:
+            lines, self._buf = self._buf, []
+        if not lines:
+            return
+        data = "".join(lines).encode("utf-8")
+        SEGMENT_DIR.mkdir(parents=True, exist_ok=True)
+        with open(LOCK_PATH, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            path = self._active_segment(int(time.time() * 1000))
+            if path != self._fd_path or not self._fd_current():
+                self._close_fd()
+                self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                self._fd_path = path
+            os.write(self._fd, data)
+            if fsync or time.monotonic() - self._last_fsync >= FSYNC_S:
+                os.fsync(self._fd)
+                self._last_fsync = time.monotonic()
+
+    def _fd_current(self):
+        # the file we hold open may have been replaced/removed by another process
+        try:
+            return os.fstat(self._fd).st_ino == os.stat(self._fd_path).st_ino
+        except OSError:
+            return False
+
+    def _close_fd(self):
+        if self._fd is not None:
+            os.fsync(self._fd)
+            os.close(self._fd)
+            self._fd = self._fd_path = None
+
+    def close(self):
+        try:
+            with self._io_lock:
+                self._flush(True)
+                self._close_fd()
+        except OSError as e:
+            print(f"[logger] final flush failed: {e}", file=sys.stderr)
+
+
+_writer = _SegmentWriter()
+atexit.register(_writer.close)
+
 
 def log_interaction(entry):
-    ts = int(time.time()*1000)
-    fname = LOGDIR / f"{ts}.jsonl"
-    # append line
-    with open(fname, 'a', encoding='utf-8') as f:
-        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    _writer.append(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+def flush():
+    """Write buffered entries now (fsynced)."""
+    _writer.flush(fsync=True)
+
+
+def legacy_files():
+    # one-file-per-call layout: <ms>.jsonl directly in log_dir
+    return sorted(p for p in LOGDIR.glob("*.jsonl") if p.stem.isdigit())
+
+
+def migrate(delete=False):
+    """Fold per-call <ms>.jsonl files into segments. Moved to
+    log_dir/legacy/ afterwards (or deleted), so re-running is safe."""
+    files = legacy_files()
+    if not files:
+        print("[logger] nothing to migrate")
+        return 0
+    SEGMENT_DIR.mkdir(parents=True, exist_ok=True)
+    legacy = LOGDIR / "legacy"
+    if not delete:
+        legacy.mkdir(exist_ok=True)
+
+    with open(LOCK_PATH, "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        out, out_bytes, done, written = None, 0, [], 0
+        for f in files:
+            data = f.read_bytes()
+            if data and not data.endswith(b"\n"):
+                data += b"\n"
+            if out is None or out_bytes >= SEGMENT_BYTES:
+                if out is not None:
+                    out.flush(); os.fsync(out.fileno()); out.close()
+                # "-m" keeps names distinct from live segments of the same ms
+                out = open(SEGMENT_DIR / _segment_name(int(f.stem), "-m"), "ab")
+                out_bytes = 0
+            out.write(data)
+            out_bytes += len(data)
+            done.append(f)
+            written += 1
+        out.flush(); os.fsync(out.fileno()); out.close()
+
+    # only after the segments are durable
+    for f in done:
+        if delete:
+            f.unlink()
+        else:
+            f.rename(legacy / f.name)
+    print(f"[logger] migrated {written} files into segments"
+          + ("" if delete else f" (originals in {legacy})"))
+    return written
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["migrate"]:
+        migrate(delete="--delete" in sys.argv[2:])
+    else:
+        print("Usage: python3 logger.py migrate [--delete]")
@@ -0,0 +1,246 @@
+# near_dup.py
+"""
+Near-duplicate detection for distilled pairs: 64-bit SimHash over the
+set of words, with an LSH table of 6 bands (4 x 11 + 2 x 10 bits). Two
+signatures within Hamming distance 5 always share at least one band, so
+a lookup only compares against the candidates in those buckets.
+Words rather than shingles: on short replies one changed word moves a
+3-shingle hash ~11 bits but a word hash ~3.
+Digits are folded to "#" so templated prompts ("idle for 12 min" /
+"idle for 14 min") land together.
+Signatures kept by earlier runs are looked up in a BandStore: the band
+buckets persisted as segment files and mmap'd, so opening it does not
+rebuild the table from the whole history.
+"""
+
+import os
+import re
+import sys
+import mmap
+import bisect
+import hashlib
+from functools import lru_cache
+from array import array
+from pathlib import Path
+
+BITS = 64
+BAND_WIDTHS = (11, 11, 11, 11, 10, 10)
+BANDS = len(BAND_WIDTHS)
+LANE = 16   # bits per counter in simhash(): up to 65535 distinct words
+
+_WORD = re.compile(r"\w+")
+_DIGITS = re.compile(r"\d+")
+
+
+@lru_cache(maxsize=1 << 16)
+def _word_lanes(word):
+    # the word's 64-bit hash with bit i moved to bit LANE * i, so adding
+    # these up counts, per bit position, how many words have it set
+    h = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+    return sum(1 << (LANE * i) for i in range(BITS) if h >> i & 1)
+
+
+def simhash(text):
+    words = set(_WORD.findall(_DIGITS.sub("#", text.lower())))
+    if not words:
+        return 0
+    counts = array("H", sum(map(_word_lanes, words)).to_bytes(BITS * LANE // 8, "little"))
+    if sys.byteorder == "big":
+        counts.byteswap()
+    half = len(words) / 2
+    return sum(1 << i for i, c in enumerate(counts) if c > half)
+
+
+def _band_keys(sig):
+    keys = []
+    for width in BAND_WIDTHS:
+        keys.append(sig & ((1 << width) - 1))
+        sig >>= width
+    return keys
+
+
+class NearDupIndex:
+    """Signatures added in this process, in dataset order (.sigs is an
+    array('Q')), on top of an optional BandStore of those kept before."""
+
+    def __init__(self, distance=4, store=None):
+        if distance >= BANDS:
+            raise ValueError(f"distance must be < {BANDS} for {BANDS}-band LSH")
+        self.distance = distance
+        self.store = store
+        self.sigs = array("Q")
+        self._bands = [dict() for _ in range(BANDS)]
+
+    def __len__(self):
+        return len(self.sigs)
+
+    def find(self, sig):
+        """A kept signature within `distance` of sig, or None."""
+        keys = _band_keys(sig)
+        for band, key in zip(self._bands, keys):
+            for other in band.get(key, ()):
+                if (sig ^ other).bit_count() <= self.distance:
+                    return other
+        if self.store is not None:
+            return self.store.find(sig, self.distance, keys)
+        return None
+
+    def add(self, sig):
+        self.sigs.append(sig)
+        for band, key in zip(self._bands, _band_keys(sig)):
+            band.setdefault(key, []).append(sig)
+
+    def add_if_new(self, sig):
+        """Add and return True unless a near-duplicate is already kept."""
+        if self.distance >= 0 and self.find(sig) is not None:
+            return False
+        self.add(sig)
+        return True
+
+
+# -------------------------------------------------------
+# PERSISTED BANDS
+# -------------------------------------------------------
+# Segment file "<first row>-<end row>.seg" (native byte order, like the
+# signature file): for each band, the bucket start offsets (array('I'),
+# 2^width + 1 entries, padded to 8 bytes) then the rows' signatures
+# grouped by bucket (array('Q')).
+MERGE_RATIO = 4   # merge the newest segment into the previous one once it is >= 1/4 its size
+
+
+def _offsets_bytes(width):
+    n = ((1 << width) + 1) * 4
+    return n + (-n % 8)
+
+
+def _write_segment(path, sigs):
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        shift = 0
+        for width in BAND_WIDTHS:
+            mask = (1 << width) - 1
+            keys = [s >> shift & mask for s in sigs]
+            order = sorted(range(len(sigs)), key=keys.__getitem__)
+            grouped = [keys[i] for i in order]
+            offsets = array("I", (bisect.bisect_left(grouped, k) for k in range(mask + 2)))
+            f.write(offsets.tobytes().ljust(_offsets_bytes(width), b"\0"))
+            array("Q", (sigs[i] for i in order)).tofile(f)
+            shift += width
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class _Segment:
+    def __init__(self, path, start, end):
+        self.path, self.start, self.end = path, start, end
+        self._mm = None
+        self._bands = []
+
+    def open(self):
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view, pos, rows = memoryview(self._mm), 0, self.end - self.start
+        for width in BAND_WIDTHS:
+            offsets = view[pos:pos + ((1 << width) + 1) * 4].cast("I")
+            pos += _offsets_bytes(width)
+            self._bands.append((offsets, view[pos:pos + rows * 8].cast("Q")))
+            pos += rows * 8
+        view.release()
+
+    def find(self, sig, distance, keys):
+        for (offsets, sigs), key in zip(self._bands, keys):
+            for other in sigs[offsets[key]:offsets[key + 1]]:
+                if (sig ^ other).bit_count() <= distance:
+                    return other
+        return None
+
+    def close(self):
+        for offsets, sigs in self._bands:
+            offsets.release()
+            sigs.release()
+        self._bands = []
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+
+class BandStore:
+    """LSH bands of the first rows of a signature file (raw array('Q')
+    dump), persisted in `directory` as segments covering consecutive row
+    ranges. sync(rows) adds the rows not covered yet as a new segment and
+    merges it into older ones once it grows to MERGE_RATIO of their size,
+    so each row is rewritten O(log rows) times overall, not once per run.
+    Segments beyond `rows` (left by a crashed run) are dropped and gaps
+    are rebuilt from the signature file."""
+
+    def __init__(self, directory, sigs_path):
+        self.dir = Path(directory)
+        self.sigs_path = Path(sigs_path)
+        self._segs = []
+
+    def _read(self, start, end):
+        sigs = array("Q")
+        with open(self.sigs_path, "rb") as f:
+            f.seek(start * 8)
+            sigs.fromfile(f, end - start)
+        return sigs
+
+    def _build(self, start, end):
+        seg = _Segment(self.dir / f"{start:012d}-{end:012d}.seg", start, end)
+        _write_segment(seg.path, self._read(start, end))
+        return seg
+
+    def _on_disk(self):
+        segs = []
+        for p in self.dir.glob("*.seg"):
+            try:
+                start, end = map(int, p.stem.split("-"))
+            except ValueError:
+                continue
+            segs.append(_Segment(p, start, end))
+        return sorted(segs, key=lambda s: (s.start, -s.end))
+
+    def sync(self, rows):
+        """Make the segments cover exactly rows [0, rows) and open them."""
+        self.close()
+        self.dir.mkdir(parents=True, exist_ok=True)
+        segs, covered = [], 0
+        for seg in self._on_disk():
+            if seg.end > rows or seg.start < covered:
+                # past the dataset, or overlapping (left by an interrupted merge)
+                seg.path.unlink()
+                continue
+            if seg.start > covered:
+                segs.append(self._build(covered, seg.start))
+            segs.append(seg)
+            covered = seg.end
+        if covered < rows:
+            segs.append(self._build(covered, rows))
+        while len(segs) > 1 and (segs[-1].end - segs[-1].start) * MERGE_RATIO >= \
+                segs[-2].end - segs[-2].start:
+            newer, older = segs.pop(), segs.pop()
+            segs.append(self._build(older.start, newer.end))
+            older.path.unlink()
+            newer.path.unlink()
+        for seg in segs:
+            seg.open()
+        self._segs = segs
+
+    def find(self, sig, distance, keys=None):
+        keys = keys or _band_keys(sig)
+        for seg in self._segs:
+            other = seg.find(sig, distance, keys)
+            if other is not None:
+                return other
+        return None
+
+    def clear(self):
+        self.close()
+        for seg in self._on_disk():
+            seg.path.unlink()
+
+    def close(self):
+        for seg in self._segs:
+            seg.close()
+        self._segs = []
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# pipeline.py
+"""
+Nightly pipeline: distill -> index.
+- One run at a time: an exclusive fcntl lock on distill_dir/pipeline.lock
+  (released by the kernel if the process dies; no stale lockfiles).
+- Each stage is skipped when the fingerprint of its inputs (path, size,
+  mtime of every input file) matches the last successful run and its
+  output is still the one that run produced. pipeline_state.json keeps
+  those fingerprints plus the last timings.
+- distill's inputs are the sealed log blocks and its cursor state, never
+  the active segment that every router call appends to: entries logged
+  since the last seal wait for the next one.
+- The index stage publishes a new generation (index_gen.py); readers
+  switch to it atomically.
+
+Usage:
+  python3 pipeline.py [--force] [--full] [--compact] [--stages distill,index]
+"""
+
+import os
+import sys
+import json
+import time
+import fcntl
+import hashlib
+import argparse
+from pathlib import Path
+
+import state_store
+import index_gen
+
+CFG = state_store.config()
+OUTDIR = Path(os.path.expanduser(CFG['distill_dir']))
+LOGDIR = Path(os.path.expanduser(CFG['log_dir']))
+LOCK_PATH = OUTDIR / "pipeline.lock"
+STATE_PATH = OUTDIR / "pipeline_state.json"
+PAIRS_PATH = OUTDIR / "supervised_pairs.jsonl"
+
+
+# -------------------------------------------------------
+# FINGERPRINTS
+# -------------------------------------------------------
+def _files(paths):
+    for p in paths:
+        p = Path(p)
+        if p.is_dir():
+            yield from sorted(f for f in p.rglob("*") if f.is_file() and f.name != ".lock")
+        elif p.exists():
+            yield p
+
+
+def fingerprint(paths):
+    h = hashlib.sha1()
+    for f in _files(paths):
+        try:
+            st = f.stat()
+        except OSError:
+            continue
+        h.update(f"{f}\0{st.st_size}\0{st.st_mtime_ns}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+def _current_generation():
+    gen = index_gen.current()
+    return gen.name if gen else None
+
+
+# -------------------------------------------------------
+# STAGES
+# -------------------------------------------------------
+def _seal_logs():
+    # closed segments → blocks before fingerprinting, so the fingerprint
+    # does not change just because distill sealed them
+    import log_store
+    log_store.seal()
+
+
+def _distill_inputs():
+    return [LOGDIR / "blocks", OUTDIR / "distill_state.json", state_store.CONFIG_PATH] \
+        + [p for p in LOGDIR.glob("*.jsonl") if p.stem.isdigit()]
+
+
+def _run_distill(args):
+    import distill
+    stats = distill.build_dataset(full=args.full)
+    return f"{stats['kept']} new pairs, {stats['online'] - stats['kept']} near-duplicates dropped"
+
+
+def _run_index(args):
+    if not PAIRS_PATH.exists() or PAIRS_PATH.stat().st_size == 0:
+        return "no distilled pairs, index unchanged"
+    import retriever
+    gen = retriever.build_index(compact=args.compact)
+    if gen is None:
+        # no generation to point at: fail so the stage is retried next run
+        raise RuntimeError("build_index published no generation (no valid pairs?)")
+    return f"live generation {gen.name}"
+
+
+STAGES = [
+    {"name": "distill", "prepare": _seal_logs, "inputs": _distill_inputs,
+     "output": lambda: fingerprint([PAIRS_PATH]), "run": _run_distill},
+    {"name": "index", "inputs": lambda: [PAIRS_PATH, state_store.CONFIG_PATH],
+     "output": _current_generation, "run": _run_index},
+]
+
+
+# -------------------------------------------------------
+# RUNNER
+# -------------------------------------------------------
+def load_state():
+    try:
+        with open(STATE_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(state):
+    tmp = STATE_PATH.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, STATE_PATH)
+
+
+def run(args):
+    """Run the selected stages in order. Returns 0 / 1 (a stage failed)."""
+    state = load_state()
+    wanted = set(args.stages.split(",")) if args.stages else None
+    force = args.force or args.full or args.compact
+    t_all = time.perf_counter()
+    for stage in STAGES:
+        name = stage["name"]
+        if wanted is not None and name not in wanted:
+            continue
+        t0 = time.perf_counter()
+        prev = state.get(name, {})
+        if "prepare" in stage:
+            stage["prepare"]()
+        inputs = fingerprint(stage["inputs"]())
+        if not force and prev.get("inputs") == inputs and prev.get("output") == stage["output"]():
+            print(f"[pipeline] {name:<8} skipped  (inputs unchanged)")
+            continue
+        try:
+            note = stage["run"](args)
+        except Exception as e:
+            print(f"[pipeline] {name:<8} FAILED after {time.perf_counter() - t0:.2f}s: {e!r}")
+            return 1
+        seconds = time.perf_counter() - t0
+        # inputs as the run left them, so distill's own cursor update and
+        # seal do not count as a change next time
+        state[name] = {"inputs": fingerprint(stage["inputs"]()), "output": stage["output"](),
+                       "seconds": round(seconds, 3), "finished": int(time.time())}
+        _save_state(state)
+        print(f"[pipeline] {name:<8} ran      {seconds:8.2f}s  {note}")
+    print(f"[pipeline] done in {time.perf_counter() - t_all:.2f}s")
+    return 0
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Nightly distill + index pipeline.")
+    ap.add_argument("--force", action="store_true", help="run stages even if inputs are unchanged")
+    ap.add_argument("--full", action="store_true", help="full distill rebuild (implies --force)")
+    ap.add_argument("--compact", action="store_true",
+                    help="drop tombstoned rows while indexing (implies --force)")
+    ap.add_argument("--stages", help="comma-separated subset of: "
+                    + ",".join(s["name"] for s in STAGES))
+    args = ap.parse_args(argv)
+
+    OUTDIR.mkdir(parents=True, exist_ok=True)
+    with open(LOCK_PATH, "a") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            print("[pipeline] another run is active, skipping")
+            return 0
+        print(f"=== pipeline start {time.strftime('%Y-%m-%dT%H:%M:%S')} ===")
+        return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
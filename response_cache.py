@@ -0,0 +1,92 @@
+# response_cache.py
+"""
+Response cache in front of the engine call in router.archetype_respond.
+- Keyed by the caller-built key (normalized text + bucketed state).
+- Per-entry TTL chosen by the caller; LRU eviction past maxsize.
+- Concurrent identical requests collapse into one generation: the first
+  caller computes, the rest wait for its result.
+"""
+
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+import state_store
+
+CFG = state_store.config()
+
+MAXSIZE = int(CFG.get("response_cache_size", 256))
+
+_lru = OrderedDict()    # key -> (expires_at, value)
+_inflight = {}          # key -> {"event", "value"}
+_lock = threading.Lock()
+_stats = {"hits": 0, "joined": 0, "misses": 0, "evictions": 0}
+
+
+def make_key(*parts):
+    return hashlib.sha1("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+
+def get(key):
+    with _lock:
+        item = _lru.get(key)
+        if item is None:
+            return None
+        if item[0] < time.monotonic():
+            del _lru[key]
+            return None
+        _lru.move_to_end(key)
+        _stats["hits"] += 1
+        return item[1]
+
+
+def put(key, value, ttl):
+    with _lock:
+        _lru[key] = (time.monotonic() + ttl, value)
+        _lru.move_to_end(key)
+        while len(_lru) > MAXSIZE:
+            _lru.popitem(last=False)
+            _stats["evictions"] += 1
+
+
+def get_or_compute(key, ttl, compute, cacheable=lambda v: True):
+    """Returns (value, source), source in "hit" | "joined" | "computed".
+    Only the "computed" caller ran `compute`."""
+    value = get(key)
+    if value is not None:
+        return value, "hit"
+
+    with _lock:
+        flight = _inflight.get(key)
+        leader = flight is None
+        if leader:
+            flight = _inflight[key] = {"event": threading.Event(), "value": None}
+        else:
+            _stats["joined"] += 1
+
+    if not leader:
+        flight["event"].wait()
+        if flight["value"] is not None:
+            return flight["value"], "joined"
+        # leader failed → compute our own
+        return compute(), "computed"
+
+    try:
+        _stats["misses"] += 1
+        value = compute()
+        if value is not None and cacheable(value):
+            flight["value"] = value
+            put(key, value, ttl)
+        return value, "computed"
+    finally:
+        with _lock:
+            _inflight.pop(key, None)
+        flight["event"].set()
+
+
+def stats():
+    with _lock:
+        st = dict(_stats)
+        st["size"] = len(_lru)
+    return st
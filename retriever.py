@@ -1,27 +1,175 @@
 #!/usr/bin/env python3
 
 import os
+import sys
 import json
+import shutil
+import hashlib
 import faiss
 import numpy as np
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
+
+import ann_index
+import index_gen
+import state_store
+from text_store import write_text_store
+from bm25_index import write_bm25
 
 # Load config
-CFG = json.load(open('/home/piyush/ArcheTYPE/config.json'))
+CFG = state_store.config()
 OUTDIR = Path(os.path.expanduser(CFG['distill_dir']))
+# Pre-generation location; only read, to seed the first generation.
 FAISS_PATH = Path(os.path.expanduser(CFG['faiss_index']))
+INDEX_META_PATH = FAISS_PATH.with_name(FAISS_PATH.name + ".meta.json")
 
-def build_index():
-    # Ensure distill directory exists
-    OUTDIR.mkdir(parents=True, exist_ok=True)
+# "auto" | "flat" | "ivf_flat" | "ivf_pq" | "hnsw"; per-type param overrides
+INDEX_TYPE = CFG.get("faiss_index_type", "auto")
+INDEX_PARAMS = CFG.get("faiss_index_params", {})
+# "fp32" | "fp16" | "int8" | "pq" (see ann_index); lossy storage can
+# re-rank its top rerank_factor * k hits exactly against the fp32 rows
+# (always, for pq)
+STORAGE = CFG.get("faiss_vector_storage", "fp32")
+RERANK = bool(CFG.get("faiss_rerank", False))
+RERANK_FACTOR = int(CFG.get("faiss_rerank_factor", 4))
 
-    pairs_file = OUTDIR / "supervised_pairs.jsonl"
-    if not pairs_file.exists():
-        print("No supervised_pairs.jsonl found — nothing to index.")
+EMBED_MODEL = "all-MiniLM-L6-v2"
+
+# Content-addressed embedding store (append-only, row id == FAISS id):
+#   keys.txt     one sha1(text) per row
+#   texts.jsonl  one [prompt, response] per row
+#   vectors.f32  raw float32 rows
+#   meta.json    {model, dim, rows, dead}  — written last, it is the commit point
+STORE_DIR = OUTDIR / "embed_store"
+
+
+# -------------------------------------------------------
+# EMBEDDING STORE
+# -------------------------------------------------------
+def text_key(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _read_lines(path, n):
+    out = []
+    if path.exists():
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if len(out) >= n:
+                    break
+                out.append(line.rstrip("\n"))
+    return out
+
+
+def _truncate_to(path, n_lines):
+    """Drop anything past the committed rows (crash mid-append)."""
+    if not path.exists():
         return
+    with open(path, "r+b") as f:
+        pos = 0
+        for _ in range(n_lines):
+            line = f.readline()
+            if not line:
+                break
+            pos += len(line)
+        f.truncate(pos)
+
+
+def load_store(store_dir=STORE_DIR, model_name=EMBED_MODEL):
+    meta_path = store_dir / "meta.json"
+    empty = {"model": model_name, "dim": None, "rows": 0, "dead": [],
+             "keys": [], "texts": []}
+    try:
+        meta = json.load(open(meta_path, "r", encoding="utf-8"))
+    except:
+        return empty
+    if meta.get("model") != model_name:
+        print(f"[retriever] Store built with {meta.get('model')}, starting fresh.")
+        return empty
+
+    rows = meta["rows"]
+    _truncate_to(store_dir / "keys.txt", rows)
+    _truncate_to(store_dir / "texts.jsonl", rows)
+    vec_path = store_dir / "vectors.f32"
+    if vec_path.exists() and meta["dim"]:
+        with open(vec_path, "r+b") as f:
+            f.truncate(rows * meta["dim"] * 4)
+
+    meta["keys"] = _read_lines(store_dir / "keys.txt", rows)
+    meta["texts"] = [_as_record(json.loads(t))
+                     for t in _read_lines(store_dir / "texts.jsonl", rows)]
+    if len(meta["keys"]) != rows or len(meta["texts"]) != rows:
+        print("[retriever] Store files inconsistent, starting fresh.")
+        return empty
+    return meta
+
+
+def _as_record(t):
+    # stores written before the binary text map kept the joined string
+    if isinstance(t, str):
+        p, _, r = t.partition(" -> ")
+        return [p, r]
+    return t
+
+
+def load_vectors(store, store_dir=STORE_DIR):
+    if not store["rows"]:
+        return np.zeros((0, store["dim"] or 0), dtype="float32")
+    v = np.fromfile(store_dir / "vectors.f32", dtype="float32")
+    return v.reshape(store["rows"], store["dim"])
+
+
+def _append_rows(store, keys, texts, vectors, store_dir=STORE_DIR):
+    store_dir.mkdir(parents=True, exist_ok=True)
+    with open(store_dir / "keys.txt", "a", encoding="utf-8") as f:
+        f.writelines(k + "\n" for k in keys)
+    with open(store_dir / "texts.jsonl", "a", encoding="utf-8") as f:
+        f.writelines(json.dumps(t, ensure_ascii=False) + "\n" for t in texts)
+    with open(store_dir / "vectors.f32", "ab") as f:
+        f.write(np.ascontiguousarray(vectors, dtype="float32").tobytes())
+    store["keys"].extend(keys)
+    store["texts"].extend(texts)
+    store["rows"] += len(keys)
+    store["dim"] = int(vectors.shape[1])
+
+
+def _commit_store(store, store_dir=STORE_DIR):
+    meta = {k: store[k] for k in ("model", "dim", "rows", "dead")}
+    tmp = store_dir / "meta.json.tmp"
+    json.dump(meta, open(tmp, "w", encoding="utf-8"))
+    os.replace(tmp, store_dir / "meta.json")
+
+
+def compact_store(store, store_dir=STORE_DIR):
+    """Rewrite the store without tombstoned rows. Row ids change."""
+    dead = set(store["dead"])
+    live = [i for i in range(store["rows"]) if i not in dead]
+    vectors = load_vectors(store, store_dir)[live] if store["rows"] else None
+
+    for name in ("keys.txt", "texts.jsonl", "vectors.f32"):
+        p = store_dir / name
+        if p.exists():
+            p.unlink()
+    keys = [store["keys"][i] for i in live]
+    texts = [store["texts"][i] for i in live]
+    store.update(keys=[], texts=[], rows=0, dead=[])
+    if live:
+        _append_rows(store, keys, texts, vectors, store_dir)
+    _commit_store(store, store_dir)
+    print(f"[retriever] Compacted store: dropped {len(dead)} tombstoned rows.")
+    return store
+
+
+# -------------------------------------------------------
+# BUILD
+# -------------------------------------------------------
+def embed_text(record):
+    return record[0] + " -> " + record[1]
+
 
-    texts = []
+def read_pairs(pairs_file):
+    """Ordered {key: [prompt, response]} from supervised_pairs.jsonl.
+    The key hashes the same 'prompt -> response' text that gets embedded."""
+    pairs = {}
     with open(pairs_file, 'r', encoding='utf-8') as f:
         for line in f:
             try:
@@ -29,50 +177,173 @@ def build_index():
                 prompt = obj.get("prompt", "").strip()
                 resp = obj.get("response", "").strip()
                 if prompt and resp:
-                    texts.append(prompt + " -> " + resp)
+                    rec = [prompt, resp]
+                    pairs[text_key(embed_text(rec))] = rec
             except:
                 continue
+    return pairs
 
-    if len(texts) == 0:
-        print("No valid pairs found — skipping FAISS index build.")
-        return
 
-    print(f"[retriever] Loaded {len(texts)} distilled examples.")
+def _write_index(index, path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    faiss.write_index(index, str(tmp))
+    os.replace(tmp, path)
+
+
+def _write_json(obj, path):
+    tmp = path.with_name(path.name + ".tmp")
+    json.dump(obj, open(tmp, "w", encoding="utf-8"), indent=2)
+    os.replace(tmp, path)
+
+
+def load_index_meta(path=None):
+    try:
+        return json.load(open(path or INDEX_META_PATH, "r", encoding="utf-8"))
+    except:
+        return None
+
 
-    # Load embedding model
+def _records(store):
+    # Tombstoned rows stay as empty slots so FAISS ids keep lining up.
+    dead = set(store["dead"])
+    return [None if i in dead else t for i, t in enumerate(store["texts"])]
+
+
+def _link_vectors(dst):
+    # The store only ever appends to vectors.f32 (compaction writes a new
+    # file), so the generation's first ntotal rows never change under it.
+    src = STORE_DIR / "vectors.f32"
     try:
-        model = SentenceTransformer("all-MiniLM-L6-v2")
-    except Exception as e:
-        print("[retriever] ERROR loading embedding model:", e)
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)   # other filesystem
+
+
+def build_index(compact=False, embedder=None):
+    """Index supervised_pairs.jsonl and publish it as a new generation.
+    Returns that generation (or the unchanged live one), None when there
+    are no pairs; RuntimeError if the embedder fails or nothing is indexable."""
+    # Ensure distill directory exists
+    OUTDIR.mkdir(parents=True, exist_ok=True)
+
+    pairs_file = OUTDIR / "supervised_pairs.jsonl"
+    if not pairs_file.exists():
+        print("No supervised_pairs.jsonl found — nothing to index.")
+        return
+
+    pairs = read_pairs(pairs_file)
+    if len(pairs) == 0:
+        print("No valid pairs found — skipping FAISS index build.")
         return
 
-    # Encode all pairs
-    print("[retriever] Encoding embeddings...")
-    embeddings = model.encode(
-        texts,
-        show_progress_bar=True,
-        convert_to_numpy=True
-    )
+    print(f"[retriever] Loaded {len(pairs)} distilled examples.")
+
+    store = load_store()
+    dead = set(store["dead"])
+    live_rows = {k: i for i, k in enumerate(store["keys"]) if i not in dead}
+
+    # Tombstone pairs that disappeared from the dataset
+    removed = [i for k, i in live_rows.items() if k not in pairs]
+    store["dead"] = sorted(dead.union(removed))
+
+    new_keys = [k for k in pairs if k not in live_rows]
+    print(f"[retriever] {len(new_keys)} new, {len(removed)} removed, "
+          f"{len(live_rows) - len(removed)} cached.")
 
-    # Build FAISS index
-    dim = embeddings.shape[1]
-    index = faiss.IndexFlatL2(dim)
-    index.add(embeddings)
+    rebuild = compact and bool(store["dead"])
+    if rebuild:
+        compact_store(store)
 
-    # Save FAISS index
-    FAISS_PATH.parent.mkdir(parents=True, exist_ok=True)
-    faiss.write_index(index, str(FAISS_PATH))
+    live_gen = index_gen.current()
+    if live_gen and not new_keys and not removed and not rebuild:
+        meta = load_index_meta(live_gen / index_gen.META_NAME) or {}
+        rerank = RERANK or ann_index.rerank_required(meta)
+        if meta.get("ntotal") == store["rows"] and meta.get("rerank", False) == rerank and \
+                (live_gen / index_gen.BM25_NAME).exists() and \
+                not ann_index.needs_rebuild(meta, store["rows"], INDEX_TYPE, STORAGE):
+            print(f"[retriever] Nothing changed, {live_gen.name} stays live.")
+            return live_gen
 
-    # Save index_texts.json
-    out_texts = OUTDIR / "index_texts.json"
-    json.dump(texts, open(out_texts, "w", encoding="utf-8"), ensure_ascii=False, indent=2)
+    new_texts = [pairs[k] for k in new_keys]
+    embeddings = None
+    if new_keys:
+        # Load embedding model
+        try:
+            if embedder is None:
+                from sentence_transformers import SentenceTransformer
+                embedder = SentenceTransformer(EMBED_MODEL)
+        except Exception as e:
+            raise RuntimeError(f"cannot load embedding model {EMBED_MODEL}: {e}") from e
 
-    print(f"[retriever] FAISS index built! {len(texts)} entries")
-    print(f"[retriever] Saved to {FAISS_PATH}")
-    print(f"[retriever] Saved text map to {out_texts}")
+        # Encode only new pairs
+        print("[retriever] Encoding embeddings...")
+        embeddings = embedder.encode(
+            [embed_text(t) for t in new_texts],
+            show_progress_bar=True,
+            convert_to_numpy=True
+        ).astype("float32")
+
+    rows_before = store["rows"]
+    if new_keys:
+        _append_rows(store, new_keys, new_texts, embeddings)
+
+    if not store["rows"]:
+        raise RuntimeError("nothing to index: the embedding store is empty")
+
+    # Existing index is reusable only if it matches the store row-for-row
+    # and its type/training still suits the corpus size.
+    prev_index = live_gen / index_gen.FAISS_NAME if live_gen else FAISS_PATH
+    index, meta = None, load_index_meta(live_gen / index_gen.META_NAME if live_gen else None)
+    if prev_index.exists() and not rebuild and \
+            not ann_index.needs_rebuild(meta, store["rows"], INDEX_TYPE, STORAGE):
+        try:
+            index = faiss.read_index(str(prev_index))
+            if index.ntotal != rows_before:
+                index = None
+        except Exception:
+            index = None
+
+    if index is not None:
+        if embeddings is not None:
+            index.add(embeddings)
+    else:
+        print("[retriever] Building index from stored vectors (no re-encode)...")
+        index, meta = ann_index.build(load_vectors(store), INDEX_TYPE, INDEX_PARAMS, STORAGE)
+        print(f"[retriever] Index type: {meta['type']} ({meta['storage']}) {meta['params']}")
+    meta["ntotal"] = index.ntotal
+    meta["rerank"] = RERANK or ann_index.rerank_required(meta)
+    meta["rerank_factor"] = RERANK_FACTOR
+
+    # Stage FAISS index + text map as a new generation, commit the store,
+    # then publish (readers switch to the whole generation at once)
+    staging = index_gen.new_generation()
+    _write_index(index, staging / index_gen.FAISS_NAME)
+    _write_json(meta, staging / index_gen.META_NAME)
+    records = _records(store)
+    write_text_store(staging / index_gen.TEXTS_NAME, records)
+    write_bm25(staging / index_gen.BM25_NAME, records)
+    if meta["rerank"]:
+        _link_vectors(staging / index_gen.VECTORS_NAME)
+    STORE_DIR.mkdir(parents=True, exist_ok=True)
+    _commit_store(store)
+    gen = index_gen.publish(staging)
+    for legacy in (OUTDIR / "index_texts.json", OUTDIR / "index_texts.bin"):
+        if legacy.exists():
+            legacy.unlink()
+
+    live = store["rows"] - len(store["dead"])
+    print(f"[retriever] FAISS index built! {live} live entries "
+          f"({len(store['dead'])} tombstoned)")
+    print(f"[retriever] Published {gen}")
+    return gen
 
 def main():
-    build_index()
+    try:
+        build_index(compact="--compact" in sys.argv[1:])
+    except RuntimeError as e:
+        print(f"[retriever] ERROR: {e}")
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -4,33 +4,91 @@
 import os
 import json
 import time
-import socket
-from dotenv import load_dotenv
-from pathlib import Path
+import queue
+import threading
 from datetime import datetime
 
-from adapters.online_adapter import call_online_model
-from adapters.local_adapter import call_local_model
-from logger import log_interaction
 from engine.comand_mode import try_parse_command
+import engine_health
+import emotion_tracker
+import response_cache
+import state_store
 
-load_dotenv()
-
-ROOT = Path("/home/piyush/ArcheTYPE")
-CFG = json.load(open(ROOT / "config.json"))
+ROOT = state_store.ROOT
+CFG = state_store.config()
 
 SOUL_PATH = ROOT / "soul/ascetic_soul.json"
 FLOW_STATE_PATH = ROOT / "flow_lock/state.json"
 
+# Default reply reuse window; daemons pass their own cache_ttl
+RESPONSE_CACHE_TTL = float(CFG.get("response_cache_ttl", 0))
+
+# Hedged mode: if online has no first token after HEDGE_DELAY_S, race local
+HEDGE_DEFAULT = bool(CFG.get("hedge_engines", False))
+HEDGE_DELAY_S = float(CFG.get("hedge_delay_s", 1.5))
+
+
+# -------------------------------------------------------
+# LAZY IMPORTS
+# Command mode ("lock status", "flow score", ...) never reaches an engine;
+# the adapters (requests, faiss, ...), logger and dotenv load on first use.
+# -------------------------------------------------------
+def call_online_model(*args, **kwargs):
+    from adapters.online_adapter import call_online_model
+    return call_online_model(*args, **kwargs)
+
+
+def stream_online_model(*args, **kwargs):
+    from adapters.online_adapter import stream_online_model
+    return stream_online_model(*args, **kwargs)
+
+
+def call_online_model_many(*args, **kwargs):
+    from adapters.online_adapter import call_online_model_many
+    return call_online_model_many(*args, **kwargs)
+
+
+def call_local_model(*args, **kwargs):
+    from adapters.local_adapter import call_local_model
+    return call_local_model(*args, **kwargs)
+
+
+def stream_local_model(*args, **kwargs):
+    from adapters.local_adapter import stream_local_model
+    return stream_local_model(*args, **kwargs)
+
+
+def call_local_model_many(*args, **kwargs):
+    from adapters.local_adapter import call_local_model_many
+    return call_local_model_many(*args, **kwargs)
+
+
+def log_interaction(entry):
+    from logger import log_interaction
+    return log_interaction(entry)
+
+
+def normalize_query(text):
+    from adapters.query_cache import normalize_query
+    return normalize_query(text)
+
+
+_dotenv_loaded = False
+
+
+def _load_dotenv():
+    global _dotenv_loaded
+    if not _dotenv_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _dotenv_loaded = True
+
 
 # -------------------------------------------------------
 # LOAD SOUL
 # -------------------------------------------------------
 def load_soul():
-    try:
-        return json.load(open(SOUL_PATH, "r", encoding="utf-8"))
-    except:
-        return {}
+    return state_store.load_json(SOUL_PATH, {})
 
 def compute_tone_intensity(state):
     """
@@ -123,10 +181,8 @@ def apply_ritual(user_text, soul):
 # BUILD ADAPTIVE USER STATE PACKET
 # -------------------------------------------------------
 def load_flow_state():
-    try:
-        return json.load(open(FLOW_STATE_PATH))
-    except:
-        return {}
+    # cached; one version per request inside state_store.snapshot()
+    return state_store.load_json(FLOW_STATE_PATH, {})
 
 
 def compute_streak(flow):
@@ -141,18 +197,8 @@ def compute_streak(flow):
 
 
 def detect_emotion_from_history():
-    # crude heuristic; we upgrade later
-    try:
-        mem = open(ROOT / "agent_state/memory.jsonl").read().lower()
-        if "tired" in mem or "exhausted" in mem:
-            return "fatigue"
-        if "stuck" in mem:
-            return "frustration"
-        if "win" in mem or "locked in" in mem:
-            return "drive"
-    except:
-        pass
-    return "neutral"
+    # decayed keyword counters over memory.jsonl, updated from a saved offset
+    return emotion_tracker.current_emotion()
 
 
 def build_user_state_packet():
@@ -176,24 +222,55 @@ def build_user_state_packet():
 # NETWORK CHECK
 # -------------------------------------------------------
 def _internet_available():
-    try:
-        socket.create_connection(("api.groq.com", 443), timeout=1)
-        return True
-    except:
-        return False
+    # cached with a TTL, refreshed in the background
+    return engine_health.internet_available()
 
 
 def choose_engine():
-    api_key = os.getenv(CFG.get("online_api_env_var", ""))
+    _load_dotenv()
+    api_key = os.getenv(state_store.config().get("online_api_env_var", ""))
     if not api_key:
         return "local"
-    return "online" if _internet_available() else "local"
+    if not _internet_available():
+        return "local"
+    # breaker open → don't send requests to a dead endpoint
+    return "online" if engine_health.ONLINE.allow() else "local"
+
+
+def _online_failed(resp):
+    return resp is None or resp.startswith(("[online adapter error]", "[online adapter]"))
+
+
+def _record_online(ok, reason=""):
+    if ok:
+        engine_health.ONLINE.record_success()
+    else:
+        engine_health.ONLINE.record_failure(reason[:200])
 
 
 # -------------------------------------------------------
 # MAIN RESPONSE PIPELINE
 # -------------------------------------------------------
-def archetype_respond(user_text, force_offline=False, local_model="local_fast"):
+# Fixed across calls → part of the local engine's cached prompt prefix
+INSTRUCTIONS = (
+    "INSTRUCTIONS:\n"
+    "- Use an ascetic, precise tone scaled by flow_score, xp, and streak.\n"
+    "- If emotion='fatigue' → stabilizing tone.\n"
+    "- If emotion='frustration' → clarifying tone.\n"
+    "- If streak='apex' → aggressive tone.\n"
+    "- Give DIAGNOSIS / ACTION / METRIC.\n"
+)
+
+
+def _prepare(user_text, local_model):
+    """Steps 1-4. Returns a finished reply (command mode) as a str, or the
+    request dict the engines need. Soul and flow state come from one
+    snapshot, so tone and packet agree even if state.json changes mid-call."""
+    with state_store.snapshot():
+        return _prepare_request(user_text, local_model)
+
+
+def _prepare_request(user_text, local_model):
 
     # Step 1: Command mode
     cmd = try_parse_command(user_text)
@@ -216,48 +293,369 @@ def archetype_respond(user_text, force_offline=False, local_model="local_fast"):
     packet = build_user_state_packet()
 
     # Build final LLM input
+    state_block = "SYSTEM_USER_STATE:\n" + json.dumps(packet, indent=2)
     adaptive_prompt = (
-        "SYSTEM_USER_STATE:\n" +
-        json.dumps(packet, indent=2) +
-        "\n\n"
-        "INSTRUCTIONS:\n"
-        "- Use an ascetic, precise tone scaled by flow_score, xp, and streak.\n"
-        "- If emotion='fatigue' → stabilizing tone.\n"
-        "- If emotion='frustration' → clarifying tone.\n"
-        "- If streak='apex' → aggressive tone.\n"
-        "- Give DIAGNOSIS / ACTION / METRIC.\n" + tone_block +"\n"
+        state_block + "\n\n" + INSTRUCTIONS + tone_block + "\n"
         "\nUSER:\n" +
         user_text
     )
+    # Local engine: INSTRUCTIONS moves into the cached prompt prefix
+    local_prompt = state_block + tone_block + "\n\nUSER:\n" + user_text
 
-    # Step 5: Engine selection
-    engine = "local" if force_offline else choose_engine()
-    timestamp = int(time.time())
+    return {
+        "user": user_text,
+        "packet": packet,
+        "adaptive_prompt": adaptive_prompt,
+        "local_prompt": local_prompt,
+        "local_model": local_model,
+        "ts": int(time.time()),
+    }
+
+
+def _log(req, engine, resp, hedge=None):
+    # Step 7: Logging
+    entry = {
+        "ts": req["ts"],
+        "engine": engine,
+        "user": req["user"],
+        "adaptive_packet": req["packet"],
+        "response": resp
+    }
+    if hedge:
+        entry["hedge"] = hedge
+    log_interaction(entry)
+
+
+def _cache_key(req, force_offline):
+    """Normalized user text + coarse state + engine selection. Raw scores/
+    timestamps change every call; the tone band, profile and streak are
+    what shape a reply. force_offline / local_model keep online and
+    per-model replies apart."""
+    p = req["packet"]
+    intensity = compute_tone_intensity(
+        {"total_xp": p["xp"], "daily_score": p["flow_score"], "streak": p["streak"]})
+    band = "low" if intensity < 0.25 else "mid" if intensity < 0.55 else "high"
+    return response_cache.make_key(
+        normalize_query(req["user"]), band, p["profile"], p["streak"],
+        p["emotion"], p["locked_in"], bool(force_offline), req["local_model"])
+
+
+def _cacheable(resp):
+    return bool(resp) and "[local adapter" not in resp and "[online adapter" not in resp
+
+
+def _valid_reply(resp):
+    up = resp.upper() if resp else ""
+    return _cacheable(resp) and all(k in up for k in ("DIAGNOSIS", "ACTION", "METRIC"))
+
+
+def _race_engine(engine, req, local_model, events, cancel):
+    """Drain one engine's stream on a worker thread, reporting
+    ("first" | "done" | "error", engine, value, elapsed) to `events`."""
+    t0 = time.monotonic()
+    parts = []
+    gen = None
+    try:
+        if engine == "online":
+            gen = stream_online_model(req["adaptive_prompt"])
+        else:
+            gen = stream_local_model(req["local_prompt"], model_key=local_model,
+                                     instructions=INSTRUCTIONS)
+        for piece in gen:
+            if cancel.is_set():
+                return
+            if not parts:
+                events.put(("first", engine, None, time.monotonic() - t0))
+            parts.append(piece)
+        events.put(("done", engine, "".join(parts).strip(), time.monotonic() - t0))
+    except Exception as e:
+        events.put(("error", engine, str(e), time.monotonic() - t0))
+    finally:
+        # loser: stops llama-run / drops the HTTP stream. A blocked read
+        # ends at its next token, since another thread can't interrupt it.
+        if gen is not None:
+            gen.close()
+
+
+def _generate_hedged(req, local_model):
+    """Online first; local joins if online is silent for HEDGE_DELAY_S or
+    fails. First valid DIAGNOSIS/ACTION/METRIC reply wins, the other is
+    cancelled. Returns (engine, resp, hedge_info)."""
+    events = queue.Queue()
+    cancel = {"online": threading.Event(), "local": threading.Event()}
+    t0 = time.monotonic()
+    started, first_ms, total_ms, fallback = {}, {}, {}, {}
+
+    def start(engine):
+        started[engine] = round((time.monotonic() - t0) * 1000, 1)
+        threading.Thread(target=_race_engine, daemon=True,
+                         args=(engine, req, local_model, events, cancel[engine])).start()
+
+    start("online")
+    winner = None
+    while len(total_ms) < len(started):
+        waiting = "local" not in started and "online" not in first_ms
+        timeout = max(0.0, HEDGE_DELAY_S - (time.monotonic() - t0)) if waiting else None
+        try:
+            kind, engine, value, elapsed = events.get(timeout=timeout)
+        except queue.Empty:
+            start("local")
+            continue
+        ms = round(elapsed * 1000, 1)
+        if kind == "first":
+            first_ms[engine] = ms
+            continue
+        total_ms[engine] = ms
+        if engine == "online":
+            ok = kind == "done" and not _online_failed(value)
+            _record_online(ok, "" if ok else str(value))
+        if kind == "done" and _valid_reply(value):
+            winner, resp = engine, value
+            break
+        if kind == "done" and _cacheable(value):
+            fallback.setdefault(engine, value)
+        elif kind == "error":
+            print(f"[router] hedge: {engine} failed ({value})")
+        if "local" not in started:
+            start("local")
+
+    if winner is None:
+        # nobody produced the full format: any clean reply, else local's error
+        winner = next(iter(fallback), "local")
+        resp = fallback.get(winner) or "[local adapter error] no reply from either engine"
+    loser = "local" if winner == "online" else "online"
+    cancel[loser].set()
+
+    now_ms = round((time.monotonic() - t0) * 1000, 1)
+    info = {
+        "delay_s": HEDGE_DELAY_S,
+        "hedged": "local" in started,
+        "winner": winner,
+        "started_ms": started,
+        "first_token_ms": first_ms,
+        "total_ms": total_ms,
+    }
+    if loser in total_ms:
+        info["loser_failed"] = True          # finished first, but no usable reply
+    elif loser in started:
+        # how long the loser had been running when it was cancelled
+        info["loser_cancelled_ms"] = round(now_ms - started[loser], 1)
+    if not info["hedged"]:
+        detail = "hedge not fired"
+    elif "loser_cancelled_ms" in info:
+        detail = f"hedge fired at {started['local']} ms, {loser} cancelled after " \
+                 f"{info['loser_cancelled_ms']} ms"
+    else:
+        detail = f"hedge fired at {started['local']} ms, {loser} failed"
+    print(f"[router] hedge: {winner} won ({detail})")
+    return winner, resp, info
+
+
+def _generate(req, force_offline, local_model, hedge=False, engine=None):
+    # Step 5: Engine selection (batches pass the one they already made:
+    # choose_engine takes the breaker's half-open trial slot)
+    if engine is None:
+        engine = "local" if force_offline else choose_engine()
+
+    if engine == "online" and hedge:
+        engine, resp, info = _generate_hedged(req, local_model)
+        _log(req, engine, resp, hedge=info)
+        return resp
 
     # Step 6: Model call
     if engine == "online":
         try:
-            resp = call_online_model(adaptive_prompt)
-        except Exception:
+            resp = call_online_model(req["adaptive_prompt"])
+        except Exception as e:
+            resp, err = None, str(e)
+        if _online_failed(resp):
+            _record_online(False, resp or err)
             print("[router] Online failed → offline fallback.")
-            resp = call_local_model(adaptive_prompt, model_key=local_model)
+            resp = call_local_model(req["local_prompt"], model_key=local_model,
+                                    instructions=INSTRUCTIONS)
             engine = "local"
+        else:
+            _record_online(True)
     else:
-        resp = call_local_model(adaptive_prompt, model_key=local_model)
+        resp = call_local_model(req["local_prompt"], model_key=local_model,
+                                instructions=INSTRUCTIONS)
 
-    # Step 7: Logging
-    log_interaction({
-        "ts": timestamp,
-        "engine": engine,
-        "user": user_text,
-        "adaptive_packet": packet,
-        "response": resp
-    })
+    _log(req, engine, resp)
+    return resp
 
+
+def archetype_respond(user_text, force_offline=False, local_model="local_fast",
+                      cache_ttl=None, hedge=None):
+    """cache_ttl: seconds a reply may be reused for the same normalized
+    text + state bucket (None → config default, 0 → no caching).
+    hedge: race local against a slow online call (None → config default)."""
+
+    req = _prepare(user_text, local_model)
+    if isinstance(req, str):
+        return req
+
+    hedge = HEDGE_DEFAULT if hedge is None else hedge
+    ttl = RESPONSE_CACHE_TTL if cache_ttl is None else cache_ttl
+    if ttl <= 0:
+        return _generate(req, force_offline, local_model, hedge)
+
+    resp, source = response_cache.get_or_compute(
+        _cache_key(req, force_offline), ttl,
+        lambda: _generate(req, force_offline, local_model, hedge),
+        cacheable=_cacheable)
+    if source != "computed":
+        _log(req, "cache", resp)
     return resp
 
 
+def _generate_many(reqs, engine, local_model, concurrency):
+    """Batch counterpart of _generate (no hedging): online through
+    call_online_model_many, failures and local through
+    call_local_model_many. Logs each reply; returns them in order."""
+    resps = [None] * len(reqs)
+    engines = ["local"] * len(reqs)
+    if engine == "online":
+        replies = call_online_model_many([r["adaptive_prompt"] for r in reqs], concurrency)
+        for j, resp in enumerate(replies):
+            ok = not _online_failed(resp)
+            _record_online(ok, "" if ok else str(resp))
+            if ok:
+                resps[j], engines[j] = resp, "online"
+    retry = [j for j, resp in enumerate(resps) if resp is None]
+    if retry:
+        if engine == "online":
+            print(f"[router] Online failed for {len(retry)}/{len(reqs)} → offline fallback.")
+        local = call_local_model_many([reqs[j]["local_prompt"] for j in retry],
+                                      model_key=local_model, instructions=INSTRUCTIONS,
+                                      concurrency=concurrency)
+        for j, resp in zip(retry, local):
+            resps[j] = resp
+    for req, eng, resp in zip(reqs, engines, resps):
+        _log(req, eng, resp)
+    return resps
+
+
+def archetype_respond_many(prompts, concurrency=4, force_offline=False,
+                           local_model="local_fast", cache_ttl=None, hedge=None):
+    """archetype_respond over many prompts; replies come back in prompt order.
+    Each prompt is prepared, answered from the reply cache if possible, and
+    logged on its own; the rest go to the engine as one batch: online
+    through the pooled HTTP session with at most `concurrency` in flight,
+    local over llama-server's parallel slots (llama_parallel). Hedged
+    batches race each prompt separately, `concurrency` at a time."""
+    prompts = list(prompts)
+    hedge = HEDGE_DEFAULT if hedge is None else hedge
+    ttl = RESPONSE_CACHE_TTL if cache_ttl is None else cache_ttl
+
+    out = [None] * len(prompts)
+    pending = []   # (index, req, cache key)
+    for i, text in enumerate(prompts):
+        try:
+            req = _prepare(text, local_model)
+            if isinstance(req, str):
+                out[i] = req
+                continue
+            key = _cache_key(req, force_offline) if ttl > 0 else None
+            cached = response_cache.get(key) if key else None
+        except Exception as e:
+            # one bad prompt must not lose the rest of the batch
+            out[i] = f"[router error] {e}"
+            continue
+        if cached is not None:
+            _log(req, "cache", cached)
+            out[i] = cached
+        else:
+            pending.append((i, req, key))
+    if not pending:
+        return out
+
+    reqs = [req for _, req, _ in pending]
+    try:
+        # one engine decision (and breaker check) for the whole batch
+        engine = "local" if force_offline else choose_engine()
+        if hedge and engine == "online":
+            resps = _fan_out(lambda r: _generate(r, False, local_model, True, engine),
+                             reqs, concurrency)
+        else:
+            resps = _generate_many(reqs, engine, local_model, concurrency)
+    except Exception as e:
+        resps = [f"[router error] {e}"] * len(reqs)
+
+    for (i, _, key), resp in zip(pending, resps):
+        out[i] = resp
+        if key and _cacheable(resp):
+            response_cache.put(key, resp, ttl)
+    return out
+
+
+def _fan_out(fn, items, concurrency):
+    def one(item):
+        try:
+            return fn(item)
+        except Exception as e:
+            return f"[router error] {e}"
+
+    if concurrency <= 1 or len(items) <= 1:
+        return [one(x) for x in items]
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(items)),
+                            thread_name_prefix="respond") as pool:
+        return list(pool.map(one, items))
+
+
+def archetype_respond_stream(user_text, force_offline=False, local_model="local_fast",
+                             cache_ttl=None):
+    """Generator variant of archetype_respond: yields reply text as the
+    engine produces it. The full reply is logged once the stream ends."""
+
+    req = _prepare(user_text, local_model)
+    if isinstance(req, str):
+        yield req
+        return
+
+    ttl = RESPONSE_CACHE_TTL if cache_ttl is None else cache_ttl
+    key = _cache_key(req, force_offline) if ttl > 0 else None
+    if key:
+        cached = response_cache.get(key)
+        if cached is not None:
+            _log(req, "cache", cached)
+            yield cached
+            return
+
+    engine = "local" if force_offline else choose_engine()
+    parts = []
+
+    if engine == "online":
+        try:
+            for piece in stream_online_model(req["adaptive_prompt"]):
+                parts.append(piece)
+                yield piece
+            _record_online(True)
+        except Exception as e:
+            _record_online(False, str(e))
+            if parts:
+                # tokens already shown; nothing sensible to fall back to
+                parts.append(f"\n[online adapter error] {e}")
+                yield parts[-1]
+            else:
+                print("[router] Online failed → offline fallback.")
+                engine = "local"
+
+    if engine == "local":
+        for piece in stream_local_model(req["local_prompt"], model_key=local_model,
+                                        instructions=INSTRUCTIONS):
+            parts.append(piece)
+            yield piece
+
+    resp = "".join(parts).strip()
+    _log(req, engine, resp)
+    if key and _cacheable(resp):
+        response_cache.put(key, resp, ttl)
+
+
 if __name__ == "__main__":
     import sys
     t = " ".join(sys.argv[1:]) if len(sys.argv) > 1 else input("You: ")
-    print(archetype_respond(t))
+    for piece in archetype_respond_stream(t):
+        print(piece, end="", flush=True)
+    print()
@@ -0,0 +1,94 @@
+# state_store.py
+"""
+Shared in-memory cache of the JSON files every module reads
+(config.json, flow_lock/state.json, soul, ...).
+- Each file is parsed once and re-read only when its mtime/size changes;
+  stat() itself is throttled to once per STAT_INTERVAL per file.
+- A half-written file keeps serving the last good parse.
+- `with snapshot():` pins every file read inside the block to one
+  version, so a single request sees consistent state.
+Returned objects are shared: treat them as read-only.
+"""
+
+import os
+import json
+import time
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+
+ROOT = Path(os.environ.get("ARCHETYPE_ROOT", "/home/piyush/ArcheTYPE"))
+CONFIG_PATH = ROOT / "config.json"
+
+STAT_INTERVAL = 1.0
+
+_cache = {}     # path -> {"sig", "value", "checked"}
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def _signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _load(path, default):
+    now = time.monotonic()
+    entry = _cache.get(path)
+    if entry is not None and now - entry["checked"] < STAT_INTERVAL:
+        return entry["value"]
+
+    sig = _signature(path)
+    if entry is not None and sig == entry["sig"]:
+        entry["checked"] = now
+        return entry["value"]
+
+    with _lock:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            # missing → default; mid-write → keep the last good parse
+            value = entry["value"] if entry is not None and sig is not None else default
+        _cache[path] = {"sig": sig, "value": value, "checked": now}
+    return value
+
+
+def load_json(path, default=None):
+    """Parsed JSON at `path` (cached; see module docstring)."""
+    path = str(path)
+    snap = getattr(_local, "snap", None)
+    if snap is not None:
+        if path not in snap:
+            snap[path] = _load(path, default)
+        return snap[path]
+    return _load(path, default)
+
+
+def config():
+    return load_json(CONFIG_PATH, {})
+
+
+@contextmanager
+def snapshot():
+    """Every load_json() in this thread returns the same object per path
+    until the outermost block exits."""
+    outer = getattr(_local, "snap", None)
+    if outer is None:
+        _local.snap = {}
+    try:
+        yield
+    finally:
+        if outer is None:
+            _local.snap = None
+
+
+def invalidate(path=None):
+    with _lock:
+        if path is None:
+            _cache.clear()
+        else:
+            _cache.pop(str(path), None)
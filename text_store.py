@@ -0,0 +1,104 @@
+# text_store.py
+"""
+Memory-mapped record store for the retrieval text map (index_texts.bin).
+Record id == FAISS id. Each record is a (prompt, response) pair; looking
+one up only touches its offset-table slot and its own bytes.
+
+Layout (little-endian):
+  header  magic "ATXS" | u32 version | u64 count | u64 dead
+  table   count x (u64 offset | u32 prompt_len | u32 response_len)
+  data    utf-8 prompt bytes + response bytes, back to back
+Tombstoned records have offset == DEAD.
+"""
+
+import os
+import mmap
+import struct
+
+MAGIC = b"ATXS"
+VERSION = 1
+HEADER = struct.Struct("<4sIQQ")
+SLOT = struct.Struct("<QII")
+DEAD = 0xFFFFFFFFFFFFFFFF
+
+
+def write_text_store(path, records):
+    """records: sequence of (prompt, response) or None (tombstone).
+    Written to a temp file and renamed into place."""
+    path = str(path)
+    tmp = path + ".tmp"
+    n = len(records)
+    data_start = HEADER.size + n * SLOT.size
+    table = bytearray(n * SLOT.size)
+    dead = 0
+
+    with open(tmp, "wb") as f:
+        f.write(b"\0" * data_start)
+        pos = data_start
+        for i, rec in enumerate(records):
+            if rec is None:
+                SLOT.pack_into(table, i * SLOT.size, DEAD, 0, 0)
+                dead += 1
+                continue
+            p = rec[0].encode("utf-8")
+            r = rec[1].encode("utf-8")
+            f.write(p)
+            f.write(r)
+            SLOT.pack_into(table, i * SLOT.size, pos, len(p), len(r))
+            pos += len(p) + len(r)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, n, dead))
+        f.write(table)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class TextStore:
+    """Read-only view over index_texts.bin. The mapping is released when
+    the object is garbage-collected, so a hot-swapped store stays valid for
+    queries still holding it."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        if len(self._mm) < HEADER.size:
+            raise ValueError(f"{path}: truncated text store")
+        magic, version, self.count, self.dead = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path}: not a text store (v{VERSION})")
+        if len(self._mm) < HEADER.size + self.count * SLOT.size:
+            raise ValueError(f"{path}: truncated offset table")
+
+    def __len__(self):
+        return self.count
+
+    def get(self, i):
+        """(prompt, response) for record i, or None if out of range/tombstoned."""
+        if not 0 <= i < self.count:
+            return None
+        off, plen, rlen = SLOT.unpack_from(self._mm, HEADER.size + i * SLOT.size)
+        if off == DEAD:
+            return None
+        raw = self._mm[off:off + plen + rlen]
+        return raw[:plen].decode("utf-8"), raw[plen:].decode("utf-8")
+
+    def lookup(self, ids):
+        out = []
+        for i in ids:
+            rec = self.get(int(i))
+            if rec is not None:
+                out.append(rec)
+        return out
+
+    def recent(self, k):
+        """Last k live records, newest first."""
+        out = []
+        i = self.count - 1
+        while i >= 0 and len(out) < k:
+            rec = self.get(i)
+            if rec is not None:
+                out.append(rec)
+            i -= 1
+        return out